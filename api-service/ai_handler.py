@@ -1,17 +1,176 @@
 from dotenv import load_dotenv
+from collections import OrderedDict
 from typing import List, Dict, Optional
-import requests
+import asyncio
+import hashlib
+import httpx
+import json
 import os
+import re
+import time
+
+from catalogue import CatalogueIndex
+from drug_matcher import tokenize
+from intents import fallback_reply
+from metrics import CACHE_LOOKUPS, CHAT_STAGE_SECONDS
+from provider_health import ProviderHealth
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 load_dotenv()
 
+# Prompt echoes the model sometimes puts in its reply
+RESPONSE_ARTIFACTS = [
+    "YOUR RESPONSE (be helpful, check inventory, and be conversational):",
+    "CUSTOMER'S CURRENT MESSAGE:",
+    "CUSTOMER:",
+    "Assistant:",
+    "Response:",
+    "AI:"
+]
+
+# End of a sentence in a streamed reply ("₦1,200.50" is not one)
+SENTENCE_END = re.compile(r"[.!?](?=\s)|\n")
+
+def estimate_tokens(text: str) -> int:
+    """Rough Llama token count (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+class StreamingCleaner:
+    """
+    Applies the _clean_response artifact and newline rules while a reply streams in
+    The last few characters stay pending until they can no longer be the
+    start of an artifact, so `text` only ever holds final, cleaned output.
+    """
+    
+    def __init__(self):
+        self.text = ""
+        self.pending = ""
+        self.hold = max(len(artifact) for artifact in RESPONSE_ARTIFACTS) - 1
+    
+    def feed(self, delta: str) -> str:
+        self.pending += delta
+        for artifact in RESPONSE_ARTIFACTS:
+            self.pending = self.pending.replace(artifact, "")
+        while "\n\n\n" in self.pending:
+            self.pending = self.pending.replace("\n\n\n", "\n\n")
+        
+        cut = len(self.pending) - self.hold
+        # Never commit trailing newlines, so a newline run can't straddle the boundary
+        while cut > 0 and self.pending[cut - 1] == "\n":
+            cut -= 1
+        if cut > 0:
+            self.text += self.pending[:cut]
+            self.pending = self.pending[cut:]
+        return self.text
+    
+    def truncate(self, length: int):
+        self.text = self.text[:length]
+        self.pending = ""
+    
+    def finish(self) -> str:
+        self.text += self.pending
+        self.pending = ""
+        return self.text
+
+class ResponseCache:
+    """
+    LRU + TTL cache of provider replies
+    Keys already include the stock/price lines the prompt showed, so a
+    stock or price change produces a new key and the old reply ages out.
+    """
+    
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, reply)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @staticmethod
+    def make_key(is_admin: bool, message: str, context: str) -> bytes:
+        """Normalized message plus everything else the prompt contained"""
+        normalized = " ".join(tokenize(message))
+        background = context[:len(context) - len(message)]
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{int(is_admin)}\x00{normalized}\x00{background}".encode())
+        return digest.digest()
+    
+    def get(self, key: bytes) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        expires_at, reply = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return reply
+    
+    def put(self, key: bytes, reply: str):
+        self._entries[key] = (time.monotonic() + self.ttl, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
 class MetaAIHandler:
     """
     AI Handler optimized for Groq API with Meta Llama 3.1
     Fast, friendly, and concise responses
     """
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        # Shared keep-alive HTTP client (created lazily so it binds to the running loop)
+        self._http_client = http_client
+        self.http_pool_size = int(os.getenv("LLM_POOL_SIZE", "20"))
+        self.http_keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+        self.http2 = HTTP2_AVAILABLE and os.getenv("LLM_HTTP2", "1") != "0"
+        self.connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+        self.groq_read_timeout = float(os.getenv("GROQ_READ_TIMEOUT", "20"))
+        self.hf_read_timeout = float(os.getenv("HF_READ_TIMEOUT", "30"))
+        
+        # Streaming replies: stop at the first sentence end past the soft limit,
+        # and never let a WhatsApp reply grow past the hard limit
+        self.stream_responses = os.getenv("GROQ_STREAM", "1") != "0"
+        self.reply_soft_chars = int(os.getenv("REPLY_SOFT_CHARS", "600"))
+        self.reply_max_chars = int(os.getenv("REPLY_MAX_CHARS", "1000"))
+        self.stream_stats = {"streamed": 0, "cut_early": 0}
+        
+        # Provider scheduling: circuit breakers, hedged backups and a hard reply deadline
+        self.providers = {
+            "groq": ProviderHealth("groq", default_hedge_delay=2.0),
+            "huggingface": ProviderHealth("huggingface", default_hedge_delay=5.0),
+        }
+        self.reply_deadline = float(os.getenv("REPLY_DEADLINE", "8"))
+        self.scheduler_stats = {"hedged": 0, "deadline_fallbacks": 0}
+        
         # Groq API (Primary - Fast & Reliable)
         self.GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
         self.GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -22,6 +181,24 @@ class MetaAIHandler:
         self.hf_api_url = "https://api-inference.huggingface.co/models/meta-llama/Llama-3.1-8B-Instruct"
         self.hf_token = os.getenv("HF_TOKEN")
         
+        # Prompt size control: inventory lines are picked by relevance within this budget
+        self.inventory_token_budget = int(os.getenv("INVENTORY_TOKEN_BUDGET", "250"))
+        self.default_inventory_rows = 8
+        
+        # Cache of provider replies for repeated questions
+        self.response_cache = ResponseCache(
+            max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+        )
+        
+        # Prompt size metrics (baseline = the old first-12-rows context)
+        self.prompt_stats = {
+            "prompts": 0,
+            "prompt_tokens": 0,
+            "baseline_prompt_tokens": 0,
+            "provider_prompt_tokens": 0,
+        }
+        
         # System prompt - Concise and friendly
         self.system_prompt = """You are Ejide Pharmacy's AI assistant. Be friendly, helpful, and concise.
 
@@ -53,42 +230,159 @@ Account Number: 9876543210
 
 Remember: Be helpful, friendly, and professional. Keep responses natural and conversational."""
     
-    def generate_response(self, message: str, customer_history: Dict, 
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Pooled keep-alive client shared by all provider calls"""
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.http_pool_size,
+                    max_keepalive_connections=self.http_pool_size,
+                    keepalive_expiry=self.http_keepalive_expiry
+                ),
+                timeout=self._timeout(self.groq_read_timeout)
+            )
+        return self._http_client
+    
+    def _timeout(self, read: float) -> httpx.Timeout:
+        """Short connect timeout, provider-specific read timeout"""
+        return httpx.Timeout(connect=self.connect_timeout, read=read, write=10.0, pool=5.0)
+    
+    async def aclose(self):
+        """Close the shared HTTP client"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+    
+    async def generate_response(self, message: str, customer_history: Dict, 
                          inventory: List[Dict], cart: List[Dict] = None,
-                         is_admin: bool = False) -> str:
-        """Generate AI response"""
+                         is_admin: bool = False, catalogue: Optional[CatalogueIndex] = None) -> str:
+        """Generate AI response
+        
+        catalogue is the inventory snapshot's CatalogueIndex, so its indexes
+        survive stock/price changes; built from `inventory` when not given.
+        """
+        catalogue = catalogue or CatalogueIndex(inventory)
         
         # Build context
-        context = self._build_context(message, customer_history, inventory, cart, is_admin)
+        with CHAT_STAGE_SECONDS.labels("build_context").time():
+            context = self._build_context(message, customer_history, inventory, cart, is_admin,
+                                          catalogue)
+        
+        # Repeated question with the same stock/prices: reuse the earlier reply
+        cache_key = ResponseCache.make_key(is_admin, message, context)
+        cached = self.response_cache.get(cache_key)
+        CACHE_LOOKUPS.labels("response", "miss" if cached is None else "hit").inc()
+        if cached is not None:
+            return cached
+        
+        # Groq first, HuggingFace as failover/hedge, all within the reply deadline
+        with CHAT_STAGE_SECONDS.labels("llm").time():
+            response = await self._schedule_providers(context)
+        if response:
+            self.response_cache.put(cache_key, response)
+            return response
         
-        # Try Groq first (primary)
+        # Final fallback to rule-based
+        with CHAT_STAGE_SECONDS.labels("fallback").time():
+            return self._fallback_response(message, inventory, cart, catalogue)
+    
+    async def _schedule_providers(self, context: str) -> Optional[str]:
+        """
+        Run providers in priority order and return the first good reply
+        A provider whose circuit is open is skipped. The next provider starts
+        as soon as the current one fails, or as a hedge once it runs past its
+        p95 latency. When the deadline passes everything still in flight is
+        cancelled and None is returned so the caller can answer by rules.
+        """
+        pending = []
         if self.use_groq and self.GROQ_API_KEY:
-            response = self._generate_groq_response(context)
-            if response:
-                return response
-        
-        # Fallback to HuggingFace if enabled
+            pending.append(("groq", self._generate_groq_response))
         if self.use_huggingface and self.hf_token:
-            response = self._generate_huggingface(context)
-            if response:
-                return response
+            pending.append(("huggingface", self._generate_huggingface))
         
-        # Final fallback to rule-based
-        return self._fallback_response(context)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.reply_deadline
+        running = {}  # task -> (provider name, start time)
+        
+        def launch_next() -> bool:
+            while pending:
+                name, call = pending.pop(0)
+                if self.providers[name].available():
+                    running[asyncio.ensure_future(call(context))] = (name, loop.time())
+                    return True
+                print(f"⚡ {name} circuit open, skipping")
+            return False
+        
+        launch_next()
+        winner = None
+        
+        try:
+            while running and winner is None:
+                now = loop.time()
+                if now >= deadline:
+                    break
+                
+                wait_for = deadline - now
+                hedge_at = None
+                if pending:
+                    # Hedge once the newest call runs past its provider's p95
+                    name, started = max(running.values(), key=lambda entry: entry[1])
+                    hedge_at = started + self.providers[name].hedge_delay()
+                    wait_for = min(wait_for, max(0.0, hedge_at - now))
+                
+                done, _ = await asyncio.wait(running, timeout=wait_for,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                
+                failed = False
+                for task in done:
+                    name, started = running.pop(task)
+                    health = self.providers[name]
+                    result = task.result()  # provider calls record their own failures
+                    if result:
+                        # A second success in the same batch still counts for its provider
+                        health.record_success(loop.time() - started)
+                        if winner is None:
+                            winner = result
+                    else:
+                        failed = True
+                    # Failed calls already re-opened a half-open breaker; never leave a trial stuck
+                    health.breaker.release_trial()
+                
+                if winner is None:
+                    if failed:
+                        launch_next()
+                    elif not done and hedge_at is not None and loop.time() >= hedge_at:
+                        if launch_next():
+                            self.scheduler_stats["hedged"] += 1
+        finally:
+            timed_out = winner is None and bool(running)
+            for task, (name, started) in running.items():
+                task.cancel()
+                if timed_out:
+                    self.providers[name].record_failure("timeout")
+                else:
+                    self.providers[name].record_cancelled()
+            if timed_out:
+                self.scheduler_stats["deadline_fallbacks"] += 1
+                print(f"⏱️ Reply deadline ({self.reply_deadline}s) passed, using fallback")
+        
+        return winner
     
     def _build_context(self, message: str, customer_history: Dict, 
                       inventory: List[Dict], cart: List[Dict] = None,
-                      is_admin: bool = False) -> str:
+                      is_admin: bool = False, catalogue: Optional[CatalogueIndex] = None) -> str:
         """Build optimized context for AI"""
         
         context_parts = []
         
-        # Add inventory (top 12 items for quick reference)
-        if inventory:
-            inv_text = "INVENTORY:\n"
-            for item in inventory[:12]:
-                inv_text += f"- {item['drug_name'].title()}: {item['quantity']} units @ ₦{item['price']:,.0f}\n"
-            context_parts.append(inv_text)
+        # Add inventory lines relevant to this message
+        inventory_text = ""
+        inventory_lines = self._select_inventory(message, inventory, catalogue)
+        if inventory_lines:
+            inventory_text = "INVENTORY:\n" + "".join(inventory_lines)
+            context_parts.append(inventory_text)
         
         # Add cart if exists
         if cart:
@@ -113,9 +407,72 @@ Remember: Be helpful, friendly, and professional. Keep responses natural and con
         # Add customer message
         context_parts.append(f"CUSTOMER: {message}")
         
-        return "\n\n".join(context_parts)
+        context = "\n\n".join(context_parts)
+        self._record_prompt_size(context, inventory_text, inventory)
+        return context
     
-    def _generate_groq_response(self, context: str) -> Optional[str]:
+    @staticmethod
+    def _inventory_line(item: Dict) -> str:
+        return f"- {item['drug_name'].title()}: {item['quantity']} units @ ₦{item['price']:,.0f}\n"
+    
+    def _select_inventory(self, message: str, inventory: List[Dict],
+                          catalogue: Optional[CatalogueIndex] = None) -> List[str]:
+        """Inventory lines for the prompt, most relevant first, within the token budget"""
+        if not inventory:
+            return []
+        
+        scores = (catalogue or CatalogueIndex(inventory)).score(message)
+        if scores:
+            ranked = sorted(
+                scores,
+                key=lambda pos: (-scores[pos], inventory[pos]['quantity'] <= 0, pos)
+            )
+            candidates = (inventory[pos] for pos in ranked)
+            max_rows = len(ranked)
+        else:
+            # Nothing specific asked: show a few in-stock items
+            candidates = (item for item in inventory if item['quantity'] > 0)
+            max_rows = self.default_inventory_rows
+        
+        lines = []
+        used = 0
+        for item in candidates:
+            if len(lines) >= max_rows:
+                break
+            line = self._inventory_line(item)
+            cost = estimate_tokens(line)
+            if used + cost > self.inventory_token_budget:
+                break
+            lines.append(line)
+            used += cost
+        return lines
+    
+    def _record_prompt_size(self, context: str, inventory_text: str, inventory: List[Dict]):
+        """Track prompt tokens against what the old first-12-rows context would cost"""
+        baseline_text = ""
+        if inventory:
+            baseline_text = "INVENTORY:\n" + "".join(self._inventory_line(item) for item in inventory[:12])
+        
+        prompt_tokens = estimate_tokens(self.system_prompt) + estimate_tokens(context)
+        stats = self.prompt_stats
+        stats["prompts"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["baseline_prompt_tokens"] += (prompt_tokens - estimate_tokens(inventory_text)
+                                            + estimate_tokens(baseline_text))
+    
+    def get_stats(self) -> Dict:
+        """Prompt size and response cache metrics"""
+        stats = dict(self.prompt_stats)
+        prompts = stats["prompts"] or 1
+        stats["avg_prompt_tokens"] = round(stats["prompt_tokens"] / prompts, 1)
+        stats["avg_baseline_prompt_tokens"] = round(stats["baseline_prompt_tokens"] / prompts, 1)
+        stats["response_cache"] = self.response_cache.stats()
+        stats["streaming"] = dict(self.stream_stats)
+        stats["providers"] = {name: health.stats() for name, health in self.providers.items()}
+        stats["scheduler"] = dict(self.scheduler_stats)
+        return stats
+    
+    async def _generate_groq_response(self, context: str) -> Optional[str]:
         """Generate response using Groq API (Fast!)"""
         
         if not self.GROQ_API_KEY:
@@ -136,56 +493,140 @@ Remember: Be helpful, friendly, and professional. Keep responses natural and con
             "temperature": 0.7,
             "max_tokens": 400,  # Increased for natural responses
             "top_p": 0.9,
-            "stream": False
+            "stream": self.stream_responses
         }
         
         try:
-            response = requests.post(
+            async with self.http_client.stream(
+                "POST",
                 self.GROQ_API_URL, 
                 headers=headers, 
                 json=payload, 
-                timeout=20
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if "choices" in data and len(data["choices"]) > 0:
-                    ai_response = data["choices"][0]["message"]["content"].strip()
-                    cleaned = self._clean_response(ai_response)
-                    print(f"✅ Groq AI response generated")
-                    return cleaned
+                timeout=self._timeout(self.groq_read_timeout)
+            ) as response:
+                
+                if response.status_code != 200:
+                    await response.aread()
+                    return self._groq_error(response)
+                
+                content_type = response.headers.get("content-type", "")
+                if content_type.startswith("text/event-stream"):
+                    ai_response = await self._read_groq_stream(response)
                 else:
-                    print("⚠️ Groq returned empty response")
-                    return None
-            
-            elif response.status_code == 401:
-                print("❌ Groq API: Invalid API key")
-                return None
+                    await response.aread()
+                    ai_response = self._read_groq_json(response.json())
             
-            elif response.status_code == 429:
-                print("⚠️ Groq API: Rate limit exceeded")
+            if not ai_response:
+                print("⚠️ Groq returned empty response")
+                self.providers["groq"].record_failure("empty")
                 return None
             
-            else:
-                print(f"⚠️ Groq API error {response.status_code}")
-                try:
-                    error_detail = response.json()
-                    print(f"   Details: {error_detail}")
-                except:
-                    print(f"   Response: {response.text[:200]}")
-                return None
+            cleaned = self._clean_response(ai_response)
+            print(f"✅ Groq AI response generated")
+            return cleaned
         
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             print("⚠️ Groq API timeout")
+            self.providers["groq"].record_failure("timeout")
             return None
-        except requests.exceptions.ConnectionError:
+        except httpx.ConnectError:
             print("⚠️ Groq API connection error - check internet")
+            self.providers["groq"].record_failure("error")
             return None
         except Exception as e:
             print(f"⚠️ Groq API error: {e}")
+            self.providers["groq"].record_failure("error")
             return None
     
-    def _generate_huggingface(self, context: str) -> Optional[str]:
+    def _read_groq_json(self, data: Dict) -> Optional[str]:
+        """Reply text from a non-streamed completion"""
+        usage = data.get("usage") or {}
+        self.prompt_stats["provider_prompt_tokens"] += usage.get("prompt_tokens", 0)
+        if "choices" in data and len(data["choices"]) > 0:
+            return data["choices"][0]["message"]["content"].strip()
+        return None
+    
+    async def _read_groq_stream(self, response: httpx.Response) -> str:
+        """Read SSE deltas, cleaning as they arrive and stopping once the reply is complete"""
+        self.stream_stats["streamed"] += 1
+        cleaner = StreamingCleaner()
+        
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            
+            chunk = json.loads(data)
+            usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or {}
+            self.prompt_stats["provider_prompt_tokens"] += usage.get("prompt_tokens", 0)
+            
+            choice = chunk["choices"][0] if chunk.get("choices") else {}
+            delta = (choice.get("delta") or {}).get("content") or ""
+            if delta:
+                cut = self._reply_cutoff(cleaner.feed(delta))
+                if cut is not None:
+                    # Leaving the stream context closes it, so generation stops here
+                    cleaner.truncate(cut)
+                    self.stream_stats["cut_early"] += 1
+                    break
+            
+            if choice.get("finish_reason"):
+                break
+        
+        return cleaner.finish().strip()
+    
+    def _reply_cutoff(self, text: str) -> Optional[int]:
+        """Where to end a streamed reply, or None to keep reading"""
+        if len(text) >= self.reply_max_chars:
+            boundaries = [m.end() for m in SENTENCE_END.finditer(text, 0, self.reply_max_chars)]
+            if boundaries and boundaries[-1] >= self.reply_soft_chars // 2:
+                return boundaries[-1]
+            # No sentence to end on: at least do not stop mid-word
+            space = text.rfind(" ", 0, self.reply_max_chars + 1)
+            return space if space > 0 else self.reply_max_chars
+        
+        if len(text) >= self.reply_soft_chars:
+            boundary = SENTENCE_END.search(text, self.reply_soft_chars)
+            if boundary:
+                return boundary.end()
+        
+        return None
+    
+    def _groq_error(self, response: httpx.Response) -> None:
+        """Log a failed Groq call and feed it to the circuit breaker"""
+        if response.status_code == 401:
+            print("❌ Groq API: Invalid API key")
+            self.providers["groq"].record_failure("error")
+        
+        elif response.status_code == 429:
+            print("⚠️ Groq API: Rate limit exceeded")
+            self.providers["groq"].record_failure("rate_limited", self._retry_after(response))
+        
+        elif response.status_code in (502, 503, 504):
+            print(f"⚠️ Groq API unavailable ({response.status_code})")
+            self.providers["groq"].record_failure("unavailable")
+        
+        else:
+            self.providers["groq"].record_failure("error")
+            print(f"⚠️ Groq API error {response.status_code}")
+            try:
+                error_detail = response.json()
+                print(f"   Details: {error_detail}")
+            except:
+                print(f"   Response: {response.text[:200]}")
+        return None
+    
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float:
+        """Seconds to back off after a 429 (Retry-After header, else 30s)"""
+        try:
+            return float(response.headers.get("retry-after", 30))
+        except ValueError:
+            return 30.0
+    
+    async def _generate_huggingface(self, context: str) -> Optional[str]:
         """HuggingFace backup (slower but free)"""
         
         if not self.hf_token:
@@ -209,190 +650,68 @@ Remember: Be helpful, friendly, and professional. Keep responses natural and con
             }
         }
         
+        health = self.providers["huggingface"]
         try:
-            response = requests.post(
+            response = await self.http_client.post(
                 self.hf_api_url,
                 headers=headers,
                 json=payload,
-                timeout=30
+                timeout=self._timeout(self.hf_read_timeout)
             )
             
             if response.status_code == 200:
                 result = response.json()
                 
+                generated_text = ""
                 if isinstance(result, list) and len(result) > 0:
                     generated_text = result[0].get('generated_text', '')
-                    if generated_text:
-                        cleaned = self._clean_response(generated_text)
-                        print(f"✅ HuggingFace response generated")
-                        return cleaned
-                elif isinstance(result, dict) and 'generated_text' in result:
-                    cleaned = self._clean_response(result['generated_text'])
-                    print(f"✅ HuggingFace response generated")
-                    return cleaned
+                elif isinstance(result, dict):
+                    generated_text = result.get('generated_text', '')
                 
-                return None
+                if not generated_text:
+                    print("⚠️ HuggingFace returned empty response")
+                    health.record_failure("empty")
+                    return None
+                
+                cleaned = self._clean_response(generated_text)
+                print(f"✅ HuggingFace response generated")
+                return cleaned
             
             elif response.status_code == 503:
                 print("⚠️ HuggingFace model loading (20-60s wait)")
+                health.record_failure("unavailable")
+                return None
+            
+            elif response.status_code == 429:
+                print("⚠️ HuggingFace: Rate limit exceeded")
+                health.record_failure("rate_limited", self._retry_after(response))
                 return None
             
             else:
                 print(f"⚠️ HuggingFace error: {response.status_code}")
+                health.record_failure("error")
                 return None
         
+        except httpx.TimeoutException:
+            print("⚠️ HuggingFace timeout")
+            health.record_failure("timeout")
+            return None
         except Exception as e:
             print(f"⚠️ HuggingFace error: {e}")
+            health.record_failure("error")
             return None
     
-    def _fallback_response(self, context: str) -> str:
+    def _fallback_response(self, message: str, inventory: List[Dict], cart: List[Dict] = None,
+                           catalogue: Optional[CatalogueIndex] = None) -> str:
         """Smart rule-based fallback (always works!)"""
-        
-        # Extract customer message
-        try:
-            if "CUSTOMER:" in context:
-                message = context.split("CUSTOMER:")[-1].strip().lower()
-            else:
-                message = context.lower()
-        except:
-            message = context.lower()
-        
-        # Extract inventory
-        inventory_section = ""
-        if "INVENTORY:" in context:
-            try:
-                inventory_section = context.split("INVENTORY:")[1].split("\n\n")[0]
-            except:
-                pass
-        
         print(f"💡 Fallback response: '{message[:40]}...'")
-        
-        # Greetings
-        greetings = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening", "greetings", "hola"]
-        if any(word in message for word in greetings):
-            return ("Hello! Welcome to Ejide Pharmacy! 😊\n\n"
-                   "I can help you:\n"
-                   "• Find medications and check prices\n"
-                   "• Add items to cart: 'I want [qty] [drug]'\n"
-                   "• Answer general pharmacy questions\n\n"
-                   "What are you looking for today?")
-        
-        # Specific drug queries
-        common_drugs = {
-            "paracetamol": "fever and pain",
-            "ibuprofen": "pain and inflammation",
-            "amoxicillin": "bacterial infections",
-            "chloroquine": "malaria",
-            "artemether": "malaria",
-            "coartem": "malaria",
-            "vitamin": "health supplements",
-            "cough": "cough and cold"
-        }
-        
-        for drug, purpose in common_drugs.items():
-            if drug in message:
-                # Search inventory
-                for line in inventory_section.split("\n"):
-                    if drug in line.lower() and line.strip():
-                        drug_info = line.strip('- ')
-                        return (f"Yes! We have {drug.title()} 💊\n\n"
-                               f"{drug_info}\n\n"
-                               f"Used for {purpose}. To order:\n"
-                               f"Reply: 'I want [quantity] {drug}'")
-                
-                # Not in stock
-                return (f"Sorry, {drug.title()} is currently out of stock. 😔\n\n"
-                       f"We have other options for {purpose}. "
-                       f"Would you like recommendations?")
-        
-        # Condition-based queries
-        conditions = {
-            "malaria": ["chloroquine", "artemether", "coartem"],
-            "fever": ["paracetamol", "ibuprofen"],
-            "pain": ["paracetamol", "ibuprofen"],
-            "headache": ["paracetamol", "ibuprofen"],
-            "cold": ["cough syrup", "vitamin c"],
-            "cough": ["cough syrup"]
-        }
-        
-        for condition, suggested_drugs in conditions.items():
-            if condition in message:
-                available = []
-                for drug in suggested_drugs:
-                    for line in inventory_section.split("\n"):
-                        if drug in line.lower() and line.strip():
-                            available.append(line.strip('- '))
-                
-                if available:
-                    response = f"For {condition}, we have:\n\n"
-                    for i, drug_info in enumerate(available, 1):
-                        response += f"{i}. {drug_info}\n"
-                    response += f"\nTo order, say: 'I want [qty] [drug name]' 🛒"
-                    return response
-        
-        # Price queries
-        if any(word in message for word in ["price", "cost", "how much", "expensive"]):
-            return ("I can check prices for you! 💰\n\n"
-                   "Which medication? Just ask:\n"
-                   "'How much is paracetamol?'")
-        
-        # Stock/availability queries
-        if any(word in message for word in ["available", "in stock", "have", "sell", "stock"]):
-            return ("Let me check our inventory! 📦\n\n"
-                   "What medication do you need?\n"
-                   "You can ask about specific drugs or conditions.")
-        
-        # Cart queries
-        if any(word in message for word in ["cart", "basket", "added", "items"]):
-            if "CUSTOMER'S CART:" in context:
-                return ("Your cart is ready! 🛒\n\n"
-                       "To add more: 'I want [qty] [drug]'\n"
-                       "To checkout: Reply 'checkout'")
-            else:
-                return ("Your cart is empty. 🛒\n\n"
-                       "To add items, say:\n"
-                       "'I want 2 paracetamol'\n"
-                       "'Add 3 ibuprofen'")
-        
-        # Checkout queries
-        if any(word in message for word in ["checkout", "pay", "payment", "order", "buy now"]):
-            if "CUSTOMER'S CART:" in context:
-                return ("Great! To complete your order:\n"
-                       "Reply 'checkout' and I'll send payment details.")
-            else:
-                return ("Your cart is empty. Add items first! 🛒\n\n"
-                       "Example: 'I want 2 paracetamol'")
-        
-        # Medical advice (redirect)
-        if any(word in message for word in ["sick", "ill", "symptom", "diagnose", "what should i take", "treatment"]):
-            return ("I understand you're not feeling well. 🏥\n\n"
-                   "I can show you available medications, but for medical advice, "
-                   "please consult our pharmacist or a doctor.\n\n"
-                   "Visit us or call to speak with a professional. Your health matters! 😊")
-        
-        # Default helpful response
-        return ("I'm here to help! 🏥\n\n"
-               "You can:\n"
-               "• Ask about medications: 'Do you have paracetamol?'\n"
-               "• Check prices: 'How much is ibuprofen?'\n"
-               "• Add to cart: 'I want 2 paracetamol'\n"
-               "• Ask about conditions: 'What do you have for malaria?'\n\n"
-               "What would you like to know?")
+        return fallback_reply(message, inventory, cart, catalogue)
     
     def _clean_response(self, response: str) -> str:
         """Clean AI response"""
         
         # Remove common AI artifacts
-        artifacts = [
-            "YOUR RESPONSE (be helpful, check inventory, and be conversational):",
-            "CUSTOMER'S CURRENT MESSAGE:",
-            "CUSTOMER:",
-            "Assistant:",
-            "Response:",
-            "AI:"
-        ]
-        
-        for artifact in artifacts:
+        for artifact in RESPONSE_ARTIFACTS:
             response = response.replace(artifact, "")
         
         # Trim whitespace
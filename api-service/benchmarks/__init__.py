@@ -0,0 +1,8 @@
+"""
+Performance benchmarks for the Ejide Pharmacy API
+Run from the api-service directory, e.g.:
+    python -m benchmarks.bench_indexes
+    python -m benchmarks.bench_fallback
+    python -m benchmarks.fixtures bench.db
+    python -m benchmarks.bench_api --fixture bench.db --compare baseline.json
+"""
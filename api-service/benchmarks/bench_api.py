@@ -0,0 +1,240 @@
+"""
+End-to-end API benchmark against a synthetic fixture
+Drives /chat, checkout, /upload-inventory, the reminder feed and the admin
+reports through the ASGI app in-process, with the LLM replaced by a local
+stub that answers after a fixed delay. Prints throughput and latency
+percentiles per scenario; --save writes them as a baseline and --compare
+flags scenarios that got slower than a saved baseline.
+
+    python -m benchmarks.fixtures bench.db
+    python -m benchmarks.bench_api --fixture bench.db --save benchmarks/baseline.json
+    python -m benchmarks.bench_api --fixture bench.db --compare benchmarks/baseline.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import httpx
+
+import main
+from ai_handler import MetaAIHandler
+from benchmarks.fixtures import BASES, CUSTOMER_MESSAGES, customer_phones, generate
+from database import Database
+
+
+def stub_llm(delay: float):
+    """MockTransport handler standing in for Groq"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "Yes, we have that in stock 💊 Reply 'add 1' to order."}}]
+        })
+    return handler
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Scenario:
+    """`count` calls of `step(client, i)` with at most `concurrency` in flight"""
+
+    def __init__(self, name: str, step: Callable, count: int, concurrency: int,
+                 prepare: Callable = None):
+        self.name = name
+        self.step = step
+        self.count = count
+        self.concurrency = concurrency
+        self.prepare = prepare
+
+    async def run(self, client: httpx.AsyncClient) -> Dict:
+        if self.prepare:
+            self.prepare(self.count)
+        gate = asyncio.Semaphore(self.concurrency)
+        latencies = []
+
+        async def one(i: int):
+            async with gate:
+                start = time.perf_counter()
+                response = await self.step(client, i)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(self.count)))
+        elapsed = time.perf_counter() - start
+
+        return {
+            "requests": len(latencies),
+            "throughput": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        }
+
+
+def build_scenarios(db: Database, phones: List[str], scale: float) -> List[Scenario]:
+    rng = random.Random(7)
+    spoken = [base for base, *_ in BASES] + ["paracetamol", "coartem", "vitamin c"]
+    popular = [row['drug_name'] for row in db.get_inventory()[:50]]
+
+    def n(count: int) -> int:
+        return max(1, int(count * scale))
+
+    def chat(message: str, phone: str, is_admin: bool = False):
+        return {"phone_number": phone, "message": message, "is_admin": is_admin, "timestamp": ""}
+
+    async def customer_chat(client, i):
+        message = rng.choice(CUSTOMER_MESSAGES[:8]).format(drug=rng.choice(spoken))
+        return await client.post("/chat", json=chat(message, rng.choice(phones)))
+
+    checkout_phones = [f"2349{i:09d}" for i in range(n(200))]
+
+    def fill_carts(count: int):
+        for phone in checkout_phones[:count]:
+            for drug in rng.sample(popular, 2):
+                db.add_to_cart(phone, drug, 1)
+
+    async def checkout(client, i):
+        return await client.post("/chat", json=chat("checkout", checkout_phones[i]))
+
+    price_list = io.StringIO()
+    price_list.write("drug_name,quantity,price,category,description,dosage_days,dosage_frequency\n")
+    for row in db.get_inventory():
+        price_list.write(f"{row['drug_name']},{row['quantity'] + 100},{row['price'] * 1.05:.2f},"
+                         f"{row['category']},\"{row['description']}\",{row['dosage_days']},"
+                         f"{row['dosage_frequency']}\n")
+    price_list = price_list.getvalue().encode()
+
+    async def upload(client, i):
+        files = {"file": ("price-list.csv", price_list, "text/csv")}
+        return await client.post("/upload-inventory", files=files)
+
+    cursor = {"next": None}
+
+    async def reminder_page(client, i):
+        # One sender walking the feed: fetch a page, acknowledge all of it
+        params = {"limit": 100}
+        if cursor["next"]:
+            params["cursor"] = cursor["next"]
+        response = await client.get("/medication-reminders", params=params)
+        page = response.json()
+        cursor["next"] = page["next_cursor"]
+        ack_ids = [reminder["ack_id"] for reminder in page["reminders"]]
+        if ack_ids:
+            ack = await client.post("/medication-reminders/ack", json={"ack_ids": ack_ids})
+            ack.raise_for_status()
+        return response
+
+    def admin(command: str):
+        async def step(client, i):
+            return await client.post("/chat", json=chat(command, "2340000000000", is_admin=True))
+        return step
+
+    return [
+        Scenario("chat", customer_chat, n(500), 50),
+        Scenario("checkout", checkout, n(200), 20, prepare=fill_carts),
+        Scenario("upload-inventory", upload, n(5), 1),
+        Scenario("medication-reminders", reminder_page, n(20), 1),
+        Scenario("admin: analytics", admin("analytics"), n(100), 5),
+        Scenario("admin: inventory report", admin("inventory report"), n(100), 5),
+        Scenario("admin: weekly report", admin("weekly report"), n(100), 5),
+    ]
+
+
+async def run_all(scenarios: List[Scenario]) -> Dict[str, Dict]:
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for scenario in scenarios:
+            results[scenario.name] = await scenario.run(client)
+            print(f"   {scenario.name} done", flush=True)
+    await main.ai_handler.aclose()
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Scenarios whose p95 rose or throughput fell by more than `tolerance`"""
+    regressions = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+        if now["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput']}/s -> {now['throughput']}/s")
+    return regressions
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixture", help="fixture from benchmarks.fixtures (copied, never modified)")
+    parser.add_argument("--conversations", type=int, default=2_000_000,
+                        help="size of the fixture generated when --fixture is not given")
+    parser.add_argument("--purchases", type=int, default=300_000)
+    parser.add_argument("--customers", type=int, default=50_000)
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="stub LLM reply delay in seconds")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every scenario's request count")
+    parser.add_argument("--save", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pharmacy.db")
+        if args.fixture:
+            shutil.copyfile(args.fixture, path)
+        else:
+            print(f"🧪 Generating fixture ({args.conversations:,} conversations, {args.purchases:,} purchases)...")
+            generate(path, conversations=args.conversations, purchases=args.purchases,
+                     customers=args.customers)
+
+        main.db = Database(path)
+        main.db.initialize()
+        main.ai_handler = MetaAIHandler(
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(stub_llm(args.llm_delay)))
+        )
+        main.ai_handler.GROQ_API_KEY = "bench-key"
+
+        print(f"🚀 Running scenarios (stub LLM delay {args.llm_delay * 1000:.0f}ms)...")
+        results = asyncio.run(run_all(build_scenarios(main.db, customer_phones(args.customers), args.scale)))
+        main.db.close()
+
+    print("\n" + "=" * 76)
+    print(f"{'scenario':<26}{'requests':>9}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    print("=" * 76)
+    for name, r in results.items():
+        print(f"{name:<26}{r['requests']:>9}{r['throughput']:>10.1f}"
+              f"{r['p50_ms']:>8.1f}ms{r['p95_ms']:>8.1f}ms{r['p99_ms']:>8.1f}ms")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"llm_delay": args.llm_delay, "scenarios": results}, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["scenarios"], args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   • {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main_()
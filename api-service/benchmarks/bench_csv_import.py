@@ -0,0 +1,66 @@
+"""
+Throughput of the streaming CSV inventory import
+Writes a supplier price list to a local file and imports it twice: once
+into an empty catalogue (all inserts) and once more (all updates).
+
+    python -m benchmarks.bench_csv_import [--rows 200000]
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+from database import Database
+from inventory_import import import_inventory
+
+CATEGORIES = ["fever/pain", "antibiotic", "malaria", "supplement", "cold/flu", "allergy"]
+
+
+def write_csv(path: str, rows: int, bad_every: int = 1000):
+    rng = random.Random(42)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["drug_name", "quantity", "price", "category", "description",
+                         "dosage_days", "dosage_frequency"])
+        for i in range(rows):
+            quantity = "lots" if bad_every and i % bad_every == 0 else rng.randint(0, 500)
+            category = rng.choice(CATEGORIES)
+            writer.writerow([f"drug {i:07d}", quantity, rng.randint(100, 5000), category,
+                             f"{category} treatment", rng.randint(0, 7), "Twice daily"])
+
+
+def run_import(db: Database, path: str, label: str):
+    start = time.perf_counter()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        report = import_inventory(db, f)
+    elapsed = time.perf_counter() - start
+    total = report.imported + report.error_count
+    print(f"{label:<10}{report.imported:>10,} ok{report.error_count:>7,} bad"
+          f"{elapsed:>9.2f}s{total / elapsed:>12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "supplier.csv")
+        write_csv(path, args.rows)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"🧪 {args.rows:,} rows ({size_mb:.1f} MB), 1 in 1000 invalid, target 100,000 rows/s")
+        
+        db = Database(os.path.join(tmp, "bench.db"))
+        db.initialize()
+        print("=" * 52)
+        run_import(db, path, "insert")
+        run_import(db, path, "update")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
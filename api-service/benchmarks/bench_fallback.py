@@ -0,0 +1,104 @@
+"""
+Rule-based fallback latency: keyword cascade over prompt text vs the compiled intent engine
+Times classification and the full reply for a mix of customer messages
+against a fixture-sized catalogue. The baseline re-parses the prompt
+context and runs substring loops, like _fallback_response used to.
+
+    python -m benchmarks.bench_fallback [--skus 5000]
+"""
+
+import argparse
+import random
+import time
+
+from ai_handler import MetaAIHandler
+from benchmarks.fixtures import BASES, CUSTOMER_MESSAGES, catalogue
+from catalogue import CatalogueIndex
+from intents import DRUG_PURPOSES, INTENT_WORDS, classify, fallback_reply
+
+GREETINGS = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening", "greetings", "hola"]
+# What the cascade suggested per condition before replies came from categories
+CONDITION_DRUGS = {
+    "malaria": ["chloroquine", "artemether", "coartem"],
+    "fever": ["paracetamol", "ibuprofen"],
+    "pain": ["paracetamol", "ibuprofen"],
+    "headache": ["paracetamol", "ibuprofen"],
+    "cold": ["cough syrup", "vitamin c"],
+    "cough": ["cough syrup"],
+}
+
+
+def legacy_reply(context: str) -> str:
+    """The pre-intent-engine cascade, kept here as the baseline (reply text shortened)"""
+    message = context.split("CUSTOMER:")[-1].strip().lower() if "CUSTOMER:" in context else context.lower()
+    inventory_section = ""
+    if "INVENTORY:" in context:
+        inventory_section = context.split("INVENTORY:")[1].split("\n\n")[0]
+
+    if any(word in message for word in GREETINGS):
+        return "greeting"
+    for drug, purpose in DRUG_PURPOSES.items():
+        if drug in message:
+            for line in inventory_section.split("\n"):
+                if drug in line.lower() and line.strip():
+                    return f"Yes! We have {drug.title()} {line.strip('- ')} {purpose}"
+            return f"Sorry, {drug.title()} {purpose}"
+    for condition, suggested_drugs in CONDITION_DRUGS.items():
+        if condition in message:
+            available = []
+            for drug in suggested_drugs:
+                for line in inventory_section.split("\n"):
+                    if drug in line.lower() and line.strip():
+                        available.append(line.strip('- '))
+            if available:
+                return f"For {condition}: " + ", ".join(available)
+    for intent, words in INTENT_WORDS.items():
+        if any(word in message for word in words):
+            return intent
+    return "default"
+
+
+def per_call_us(func, args_list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in args_list:
+            func(*args)
+    return (time.perf_counter() - start) / (repeat * len(args_list)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    columns = ("drug_name", "quantity", "price", "category", "description", "dosage_days", "dosage_frequency")
+    inventory = sorted((dict(zip(columns, row)) for row in catalogue(args.skus, rng)),
+                       key=lambda item: item['drug_name'])
+    cart = [{"drug_name": inventory[0]['drug_name'], "quantity": 1, "price": inventory[0]['price']}]
+    spoken = [base for base, *_ in BASES] + ["coartem", "vitamin c"]
+    messages = [rng.choice(CUSTOMER_MESSAGES).format(drug=rng.choice(spoken)) for _ in range(200)]
+
+    start = time.perf_counter()
+    index = CatalogueIndex(inventory)
+    index.for_condition("malaria")  # builds the postings
+    build_ms = (time.perf_counter() - start) * 1000
+
+    handler = MetaAIHandler()
+    contexts = [(handler._build_context(message, {}, inventory, cart, catalogue=index),)
+                for message in messages]
+
+    legacy = per_call_us(legacy_reply, contexts, args.repeat)
+    classify_us = per_call_us(classify, [(message,) for message in messages], args.repeat)
+    reply_us = per_call_us(fallback_reply, [(message, inventory, cart, index) for message in messages], args.repeat)
+
+    print(f"📦 {len(inventory):,} SKUs, {len(messages)} messages; catalogue index built once in {build_ms:.1f}ms")
+    print("=" * 60)
+    print(f"{'legacy cascade over prompt text':<40}{legacy:>12.1f}µs")
+    print(f"{'classify (one regex pass)':<40}{classify_us:>12.1f}µs")
+    print(f"{'classify + reply':<40}{reply_us:>12.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
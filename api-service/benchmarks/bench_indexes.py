@@ -0,0 +1,128 @@
+"""
+Query timings for the hot read paths with and without the migration indexes
+Builds a throwaway database with 1M conversation rows, times the queries on
+the bare schema, then upgrades it in place with Database.migrate() and
+times them again. Customer history is timed on the uncached load, not
+through the session cache. The weekly report and analytics read rollup
+tables instead; benchmarks.bench_weekly_report covers those.
+
+    python -m benchmarks.bench_indexes [--conversations 1000000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database import Database, MIGRATIONS
+
+CUSTOMERS = 20000
+DRUGS = ["paracetamol", "amoxicillin", "chloroquine", "artemether",
+         "coartem", "vitamin c", "ibuprofen", "cough syrup"]
+
+
+def seed(db: Database, conversations: int, purchases: int):
+    """Fill the database with synthetic rows spread over the last 90 days"""
+    rng = random.Random(42)
+    now = datetime.now()
+    
+    def stamp():
+        return (now - timedelta(seconds=rng.randint(0, 90 * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+    
+    conn = db.get_connection()
+    conn.executemany(
+        "INSERT INTO conversations (phone_number, message, is_admin, timestamp) VALUES (?, ?, 0, ?)",
+        ((f"234{rng.randrange(CUSTOMERS):010d}", "Do you have paracetamol?", stamp())
+         for _ in range(conversations))
+    )
+    conn.executemany("""
+        INSERT INTO purchases (phone_number, drug_name, quantity, amount, dosage_days,
+                               dosage_frequency, treatment_end_date, completed, purchase_date)
+        VALUES (?, ?, ?, ?, ?, 'Once daily', ?, ?, ?)
+    """, (
+        (f"234{rng.randrange(CUSTOMERS):010d}", rng.choice(DRUGS), 1, 500.0, 5,
+         (now + timedelta(days=rng.randint(-90, 5))).date(), int(rng.random() < 0.9), stamp())
+        for _ in range(purchases)
+    ))
+    # The insert trigger queues every purchase for today; spread the open ones
+    # over the coming days the way a running pharmacy's queue looks
+    conn.execute("DELETE FROM reminder_schedule WHERE purchase_id IN (SELECT id FROM purchases WHERE completed = 1)")
+    conn.executemany(
+        "UPDATE reminder_schedule SET next_due_at = ? WHERE purchase_id = ?",
+        (((now + timedelta(days=rng.randint(-1, 10))).date().isoformat(), purchase_id)
+         for purchase_id, in conn.execute("SELECT purchase_id FROM reminder_schedule").fetchall())
+    )
+    conn.commit()
+    db.release_connection(conn)
+
+
+def drop_indexes(db: Database):
+    """Strip the migration indexes and reset the schema version"""
+    conn = db.get_connection()
+    for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall():
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    db.release_connection(conn)
+
+
+def time_queries(db: Database, repeat: int = 20) -> dict:
+    """Median milliseconds per call for each hot query"""
+    rng = random.Random(7)
+    phones = [f"234{rng.randrange(CUSTOMERS):010d}" for _ in range(repeat)]
+    cases = {
+        # The query behind a session cache miss; the cache would make the second pass all hits
+        "load_customer_session": lambda i: db._load_session(phones[i]),
+        # One page of the reminder feed, as the WhatsApp service reads it
+        "get_due_reminders": lambda i: db.get_due_reminders(limit=100),
+    }
+    
+    results = {}
+    for name, case in cases.items():
+        runs = repeat if name == "load_customer_session" else max(3, repeat // 5)
+        samples = []
+        for i in range(runs):
+            start = time.perf_counter()
+            case(i)
+            samples.append((time.perf_counter() - start) * 1000)
+        results[name] = sorted(samples)[len(samples) // 2]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=1_000_000)
+    parser.add_argument("--purchases", type=int, default=200_000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        db.initialize()
+        drop_indexes(db)
+        
+        print(f"🧪 Seeding {args.conversations:,} conversations, {args.purchases:,} purchases...")
+        start = time.perf_counter()
+        seed(db, args.conversations, args.purchases)
+        print(f"   done in {time.perf_counter() - start:.1f}s")
+        
+        before = time_queries(db)
+        
+        start = time.perf_counter()
+        version = db.migrate()
+        print(f"🔧 Migrated to schema v{version} (of {len(MIGRATIONS)}) in {time.perf_counter() - start:.1f}s")
+        
+        after = time_queries(db)
+        db.close()
+    
+    print("\n" + "=" * 62)
+    print(f"{'query':<28}{'no indexes':>12}{'indexed':>12}{'speedup':>10}")
+    print("=" * 62)
+    for name in before:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<28}{before[name]:>10.2f}ms{after[name]:>10.2f}ms{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
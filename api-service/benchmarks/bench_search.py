@@ -0,0 +1,98 @@
+"""
+Inventory search latency: LIKE '%q%' scan vs the FTS5 index
+Builds a 50k-item catalogue and times both paths over the same queries,
+including misspellings the LIKE path can never find.
+
+    python -m benchmarks.bench_search [--items 50000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from database import Database
+
+STEMS = ["paracet", "ibupro", "amoxi", "chloro", "arteme", "cipro", "metro", "azithro",
+         "lorata", "cetiri", "omepra", "metfor", "amlodi", "losar", "diclo", "predni"]
+ENDINGS = ["amol", "fen", "cillin", "quine", "ther", "floxacin", "nidazole", "mycin",
+           "dine", "zine", "zole", "min", "pine", "tan", "fenac", "solone"]
+CATEGORIES = ["fever/pain", "antibiotic", "malaria", "supplement", "pain", "cold/flu",
+              "allergy", "diabetes", "hypertension", "stomach"]
+FORMS = ["tablets", "syrup", "capsules", "suspension", "injection", "cream"]
+
+QUERIES = ["paracetamol", "malaria", "syrup", "amoxicillin capsules", "allergy",
+           "paracetmol", "amoxcillin", "ibuprofin", "antibiotc"]
+
+
+def seed(db: Database, items: int):
+    rng = random.Random(42)
+    rows = []
+    for i in range(items):
+        name = f"{rng.choice(STEMS)}{rng.choice(ENDINGS)} {rng.choice(FORMS)} {i}"
+        category = rng.choice(CATEGORIES)
+        rows.append((name, rng.randint(0, 500), rng.randint(100, 5000), category,
+                     f"{category.title()} treatment, {rng.choice(FORMS)}", 5, "Twice daily"))
+    conn = db.get_connection()
+    conn.executemany("""
+        INSERT INTO inventory (drug_name, quantity, price, category, description, dosage_days, dosage_frequency)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    db.release_connection(conn)
+    db.inventory_cache.invalidate()
+
+
+def like_search(db: Database, query: str):
+    """The pre-FTS implementation, kept here as the baseline"""
+    conn = db.get_connection()
+    rows = conn.execute("""
+        SELECT drug_name, quantity, price, category, description, dosage_days, dosage_frequency
+        FROM inventory
+        WHERE drug_name LIKE ? OR category LIKE ? OR description LIKE ?
+    """, (f"%{query}%", f"%{query}%", f"%{query}%")).fetchall()
+    db.release_connection(conn)
+    return rows
+
+
+def time_search(search, query: str, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = search(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2], len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        db.initialize()
+        print(f"🧪 Seeding {args.items:,} inventory items...")
+        seed(db, args.items)
+        
+        start = time.perf_counter()
+        db.search_inventory("warmup")
+        print(f"   spelling index built in {(time.perf_counter() - start) * 1000:.0f}ms")
+        
+        print("\n" + "=" * 72)
+        print(f"{'query':<24}{'LIKE':>12}{'hits':>7}{'FTS5':>12}{'hits':>7}{'speedup':>10}")
+        print("=" * 72)
+        for query in QUERIES:
+            like_ms, like_hits = time_search(lambda q: like_search(db, q), query, args.repeat)
+            fts_ms, fts_hits = time_search(lambda q: db.search_inventory(q, limit=20), query, args.repeat)
+            print(f"{query:<24}{like_ms:>10.2f}ms{like_hits:>7}{fts_ms:>10.2f}ms{fts_hits:>7}"
+                  f"{like_ms / fts_ms:>9.1f}x")
+        db.close()
+    
+    print("\nFTS5 returns the top 20 by BM25; LIKE returns every match unranked.")
+
+
+if __name__ == "__main__":
+    main()
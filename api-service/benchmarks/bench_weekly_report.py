@@ -0,0 +1,119 @@
+"""
+Weekly report generation over a synthetic year of trading
+Seeds a year of purchases and conversations (rollups are filled by the
+same triggers production writes use), then times the old five raw-table
+queries plus Python low-stock filter against the rollup-backed report.
+
+    python -m benchmarks.bench_weekly_report [--conversations 1000000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import main
+from database import Database
+
+CUSTOMERS = 50000
+
+# get_weekly_stats before the rollups, one scan of the raw tables each
+LEGACY_QUERIES = [
+    "SELECT COUNT(*) FROM purchases WHERE purchase_date >= datetime('now', '-7 days')",
+    "SELECT COUNT(DISTINCT phone_number) FROM purchases WHERE purchase_date >= datetime('now', '-7 days')",
+    """SELECT drug_name, COUNT(*) as count FROM purchases WHERE purchase_date >= datetime('now', '-7 days')
+       GROUP BY drug_name ORDER BY count DESC LIMIT 1""",
+    "SELECT COUNT(*) FROM conversations WHERE timestamp >= datetime('now', '-7 days')",
+    "SELECT SUM(amount) FROM purchases WHERE purchase_date >= datetime('now', '-7 days')",
+]
+
+
+def seed(db: Database, skus: int, conversations: int, purchases: int):
+    """A year of rows spread evenly, with a catalogue of `skus` drugs"""
+    rng = random.Random(42)
+    now = datetime.now()
+    drugs = [f"drug {i:05d}" for i in range(skus)]
+    
+    def stamp():
+        return (now - timedelta(seconds=rng.randint(0, 365 * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+    
+    conn = db.get_connection()
+    conn.executemany(
+        "INSERT INTO inventory (drug_name, quantity, price, category) VALUES (?, ?, ?, 'general')",
+        ((name, rng.randint(0, 500), rng.randint(100, 5000)) for name in drugs)
+    )
+    conn.executemany(
+        "INSERT INTO conversations (phone_number, message, is_admin, timestamp) VALUES (?, ?, 0, ?)",
+        ((f"234{rng.randrange(CUSTOMERS):010d}", "Do you have paracetamol?", stamp())
+         for _ in range(conversations))
+    )
+    conn.executemany("""
+        INSERT INTO purchases (phone_number, drug_name, quantity, amount, dosage_days,
+                               dosage_frequency, completed, purchase_date)
+        VALUES (?, ?, 1, ?, 3, 'Once daily', 1, ?)
+    """, (
+        (f"234{rng.randrange(CUSTOMERS):010d}", rng.choice(drugs), rng.randint(100, 5000), stamp())
+        for _ in range(purchases)
+    ))
+    # Nothing in the synthetic history is due a reminder
+    conn.execute("DELETE FROM reminder_schedule")
+    conn.commit()
+    db.release_connection(conn)
+
+
+def legacy_report(db: Database):
+    conn = db.get_connection()
+    for sql in LEGACY_QUERIES:
+        conn.execute(sql).fetchall()
+    db.release_connection(conn)
+    low_stock = [i for i in db.get_inventory() if i['quantity'] < 20]
+    return low_stock[:3]
+
+
+def median_ms(func, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--conversations", type=int, default=1_000_000)
+    parser.add_argument("--purchases", type=int, default=300_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        db.initialize()
+        
+        print(f"🧪 Seeding a year: {args.skus:,} SKUs, {args.conversations:,} conversations, "
+              f"{args.purchases:,} purchases...")
+        start = time.perf_counter()
+        seed(db, args.skus, args.conversations, args.purchases)
+        db.migrate()  # refreshes planner statistics
+        db.inventory_cache.invalidate()
+        print(f"   done in {time.perf_counter() - start:.1f}s")
+        
+        main.db = db
+        results = {
+            "legacy (raw tables)": median_ms(lambda: legacy_report(db), max(3, args.runs // 4)),
+            "get_weekly_stats": median_ms(db.get_weekly_stats, args.runs),
+            "generate_weekly_report": median_ms(main.generate_weekly_report, args.runs),
+        }
+        print(main.generate_weekly_report()["reply"])
+        db.close()
+    
+    print("=" * 44)
+    for name, ms in results.items():
+        print(f"{name:<30}{ms:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    main_()
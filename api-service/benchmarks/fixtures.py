@@ -0,0 +1,220 @@
+"""
+Synthetic pharmacy.db fixtures
+Builds a realistic database: a catalogue of thousands of SKUs on top of
+the seeded drugs, a year of customer conversations and purchases, and the
+reminders still due from recent treatments. Rows go through the same
+triggers production writes use, so rollups and the search index are real.
+
+    python -m benchmarks.fixtures bench.db [--conversations 2000000]
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+from database import Database
+
+# (base name, category, description, dosage_days, dosage_frequency)
+BASES = [
+    ("paracetamol", "fever/pain", "fever and pain relief", 3, "3 times daily"),
+    ("ibuprofen", "pain", "anti-inflammatory pain relief", 5, "3 times daily"),
+    ("diclofenac", "pain", "joint and muscle pain", 5, "Twice daily"),
+    ("aspirin", "pain", "pain relief and blood thinner", 7, "Once daily"),
+    ("amoxicillin", "antibiotic", "bacterial infection treatment", 7, "2 times daily"),
+    ("ciprofloxacin", "antibiotic", "urinary and gut infections", 5, "Twice daily"),
+    ("azithromycin", "antibiotic", "chest and throat infections", 3, "Once daily"),
+    ("metronidazole", "antibiotic", "gut and dental infections", 7, "3 times daily"),
+    ("doxycycline", "antibiotic", "broad spectrum infections", 7, "Once daily"),
+    ("chloroquine", "malaria", "malaria treatment", 3, "Once daily"),
+    ("artemether", "malaria", "severe malaria treatment", 3, "Twice daily"),
+    ("lumefantrine", "malaria", "combination antimalarial", 3, "Twice daily"),
+    ("quinine", "malaria", "resistant malaria treatment", 7, "3 times daily"),
+    ("vitamin c", "supplement", "immune system booster", 30, "Once daily"),
+    ("vitamin b complex", "supplement", "energy and nerve support", 30, "Once daily"),
+    ("folic acid", "supplement", "pregnancy and blood support", 30, "Once daily"),
+    ("ferrous sulphate", "supplement", "iron for anaemia", 30, "Once daily"),
+    ("zinc", "supplement", "immune and diarrhoea support", 14, "Once daily"),
+    ("loratadine", "allergy", "hay fever and itching", 7, "Once daily"),
+    ("cetirizine", "allergy", "allergic rhinitis relief", 7, "Once daily"),
+    ("chlorpheniramine", "allergy", "allergy and cold symptoms", 5, "3 times daily"),
+    ("dextromethorphan", "cold/flu", "dry cough relief", 5, "3 times daily"),
+    ("guaifenesin", "cold/flu", "chesty cough expectorant", 5, "3 times daily"),
+    ("pseudoephedrine", "cold/flu", "blocked nose relief", 3, "Twice daily"),
+    ("omeprazole", "digestive", "ulcer and heartburn", 14, "Once daily"),
+    ("loperamide", "digestive", "diarrhoea relief", 2, "After each loose stool"),
+    ("oral rehydration salts", "digestive", "dehydration from diarrhoea", 3, "After each loose stool"),
+    ("metformin", "diabetes", "type 2 diabetes control", 30, "Twice daily"),
+    ("amlodipine", "blood pressure", "high blood pressure control", 30, "Once daily"),
+    ("lisinopril", "blood pressure", "high blood pressure and heart", 30, "Once daily"),
+    ("salbutamol", "asthma", "asthma reliever", 0, "As needed"),
+    ("hydrocortisone", "skin", "eczema and rashes", 7, "Twice daily"),
+    ("clotrimazole", "skin", "fungal skin infections", 14, "Twice daily"),
+    ("albendazole", "deworming", "intestinal worms", 1, "Once"),
+    ("mebendazole", "deworming", "intestinal worms", 3, "Twice daily"),
+]
+FORMS = ["tablets", "capsules", "syrup", "suspension", "injection", "cream"]
+STRENGTHS = ["50mg", "100mg", "125mg", "250mg", "400mg", "500mg", "1g", "5ml"]
+PACKS = [10, 20, 30]
+
+CUSTOMER_MESSAGES = [
+    "Do you have {drug}?",
+    "How much is {drug}?",
+    "add 2 {drug}",
+    "I need something for malaria",
+    "what do you have for cough and catarrh",
+    "I have fever and headache",
+    "price of {drug} please",
+    "is {drug} in stock",
+    "checkout",
+    "hello",
+    "thank you",
+    "took it",
+]
+
+
+def catalogue(skus: int, rng: random.Random) -> Iterator[Tuple]:
+    """Up to `skus` inventory tuples in bulk_upsert_inventory column order"""
+    count = 0
+    for base, category, description, days, frequency in BASES:
+        for form in FORMS:
+            for strength in STRENGTHS:
+                for pack in PACKS:
+                    if count >= skus:
+                        return
+                    count += 1
+                    yield (f"{base} {strength} {form} x{pack}", rng.randint(0, 400),
+                           rng.randint(2, 120) * 50.0, category,
+                           f"{description}, {strength} {form}", days, frequency)
+
+
+def customer_phones(customers: int) -> List[str]:
+    return [f"234{800000000 + i:010d}" for i in range(customers)]
+
+
+def generate(path: str, skus: int = 5000, conversations: int = 2_000_000,
+             purchases: int = 300_000, customers: int = 50_000, days: int = 365,
+             seed: int = 42, verbose: bool = True) -> Dict:
+    """Create a fixture database at `path` and return its row counts"""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    phones = customer_phones(customers)
+
+    def log(message: str):
+        if verbose:
+            print(message, flush=True)
+
+    def stamp() -> datetime:
+        # Busier in the daytime, like real WhatsApp traffic
+        day = now - timedelta(days=rng.randrange(days))
+        hour = min(23, max(0, int(rng.gauss(14, 4))))
+        moment = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+        return min(moment, now)
+
+    db = Database(path)
+    db.initialize()
+
+    start = time.perf_counter()
+    db.bulk_upsert_inventory(catalogue(skus, rng))
+    names = [row['drug_name'] for row in db.get_inventory()]
+    info = {row['drug_name']: row for row in db.get_inventory()}
+    log(f"   {len(names):,} SKUs in {time.perf_counter() - start:.1f}s")
+
+    # A base word customers would actually type, e.g. "paracetamol"
+    spoken = [base for base, *_ in BASES]
+
+    start = time.perf_counter()
+    conn = db.get_connection()
+    batch = 50_000
+    for offset in range(0, conversations, batch):
+        conn.executemany(
+            "INSERT INTO conversations (phone_number, message, is_admin, timestamp) VALUES (?, ?, 0, ?)",
+            [(rng.choice(phones), rng.choice(CUSTOMER_MESSAGES).format(drug=rng.choice(spoken)),
+              stamp().strftime("%Y-%m-%d %H:%M:%S"))
+             for _ in range(min(batch, conversations - offset))]
+        )
+        conn.commit()
+    log(f"   {conversations:,} conversations in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    # A few popular lines sell far more than the long tail
+    weights = [1.0 / (rank + 1) for rank in range(len(names))]
+    rng.shuffle(weights)
+    for offset in range(0, purchases, batch):
+        rows = []
+        for drug in rng.choices(names, weights, k=min(batch, purchases - offset)):
+            bought = stamp()
+            quantity = rng.choice((1, 1, 1, 2, 3))
+            dosage_days = info[drug]['dosage_days'] or 0
+            end = (bought + timedelta(days=dosage_days)).date() if dosage_days else None
+            rows.append((rng.choice(phones), drug, quantity, quantity * info[drug]['price'],
+                         dosage_days, info[drug]['dosage_frequency'], end,
+                         int(end is not None and end < now.date() and rng.random() < 0.8),
+                         bought.strftime("%Y-%m-%d %H:%M:%S")))
+        conn.executemany("""
+            INSERT INTO purchases (phone_number, drug_name, quantity, amount, dosage_days,
+                                   dosage_frequency, treatment_end_date, completed, purchase_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+
+    # The insert trigger queued every purchase from today; keep only
+    # treatments still inside their reminder window, with their real end date
+    conn.execute("""
+        UPDATE reminder_schedule SET end_date = (
+            SELECT COALESCE(treatment_end_date, date(purchase_date, 'localtime'))
+            FROM purchases WHERE id = purchase_id
+        )
+    """)
+    conn.execute("""
+        UPDATE reminder_schedule SET reminder_type = CASE
+            WHEN end_date >= next_due_at THEN 'daily'
+            WHEN date(end_date, '+1 day') >= next_due_at THEN 'completion'
+            ELSE 'checkup' END
+    """)
+    conn.execute("""
+        DELETE FROM reminder_schedule
+        WHERE date(end_date, '+3 days') < date('now', 'localtime')
+        OR purchase_id IN (SELECT id FROM purchases WHERE completed = 1)
+    """)
+    conn.commit()
+    log(f"   {purchases:,} purchases in {time.perf_counter() - start:.1f}s")
+
+    counts = {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("inventory", "conversations", "purchases", "reminder_schedule")
+    }
+    db.release_connection(conn)
+
+    db.migrate()  # refreshes planner statistics for the new data
+    db.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--conversations", type=int, default=2_000_000)
+    parser.add_argument("--purchases", type=int, default=300_000)
+    parser.add_argument("--customers", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"🧪 Generating {args.path}...")
+    start = time.perf_counter()
+    counts = generate(args.path, args.skus, args.conversations, args.purchases,
+                      args.customers, args.days, args.seed)
+    size_mb = os.path.getsize(args.path) / 1e6
+    print(f"✅ {size_mb:.0f} MB in {time.perf_counter() - start:.1f}s: "
+          + ", ".join(f"{count:,} {table}" for table, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
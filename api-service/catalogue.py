@@ -0,0 +1,170 @@
+import threading
+from functools import cached_property
+from typing import Dict, List
+
+from drug_matcher import FILLER_WORDS, MIN_PARTIAL_LENGTH, STOP_WORDS, DrugMatcher, SpellingIndex, tokenize
+
+# Conditions customers mention, with the inventory category words that treat them
+# (checked in this order when a message names several)
+CONDITIONS = {
+    "malaria": ["malaria"],
+    "fever": ["fever", "pain"],
+    "pain": ["pain"],
+    "headache": ["pain", "fever"],
+    "cold": ["cold", "flu", "supplement"],
+    "cough": ["cold", "flu"],
+    "ache": ["pain"],
+    "catarrh": ["cold", "flu"],
+    "flu": ["flu", "cold"],
+    "infection": ["antibiotic"],
+    "bacterial": ["antibiotic"],
+    "immune": ["supplement"],
+    "allergy": ["allergy"],
+    "rash": ["allergy"],
+    "stomach": ["stomach", "digestive"],
+    "diarrhea": ["stomach", "digestive"],
+    "ulcer": ["stomach", "digestive"],
+    "sugar": ["diabetes"],
+    "pressure": ["hypertension"],
+}
+
+class CatalogueIndex:
+    """
+    Everything derived from the catalogue's drug names, categories and descriptions
+    One per inventory snapshot, shared with every later snapshot that only
+    changed stock or prices, so positions index into any of their rows.
+    Search spelling, prompt relevance, cart parsing and the rule-based
+    replies all read from here. Each part is built on first use; build()
+    does them all at once, for callers that must not stall on first use.
+    """
+
+    # Relevance weight of a match in each text column
+    FIELD_WEIGHTS = (("drug_name", 3), ("category", 2), ("description", 1))
+
+    def __init__(self, rows):
+        self.names = tuple(row['drug_name'] for row in rows)
+        self._rows = rows  # only the text columns are read
+        self._containing: Dict[str, List[int]] = {}
+        self._for_condition: Dict[str, List[int]] = {}
+        self._build_lock = threading.Lock()
+        self.built = False
+
+    @cached_property
+    def postings(self) -> Dict[str, Dict[str, List[int]]]:
+        """column -> token -> row positions"""
+        postings = {}
+        for field, _ in self.FIELD_WEIGHTS:
+            column = postings[field] = {}
+            for position, row in enumerate(self._rows):
+                for token in dict.fromkeys(tokenize(row.get(field) or "")):
+                    column.setdefault(token, []).append(position)
+        return postings
+
+    @cached_property
+    def by_name(self) -> Dict[str, int]:
+        """Position of each drug name, as normalised tokens"""
+        by_name = {}
+        for position, name in enumerate(self.names):
+            by_name.setdefault(" ".join(tokenize(name)), position)
+        return by_name
+
+    @cached_property
+    def matcher(self) -> DrugMatcher:
+        """(quantity, drug) extraction for cart requests"""
+        return DrugMatcher(self.names)
+
+    @cached_property
+    def spelling(self) -> SpellingIndex:
+        """Typo correction over every word in the catalogue"""
+        vocabulary = set()
+        for column in self.postings.values():
+            vocabulary.update(column)
+        return SpellingIndex(vocabulary)
+
+    def build(self) -> "CatalogueIndex":
+        """Build every lazy part now; concurrent callers wait for one build"""
+        if not self.built:
+            with self._build_lock:
+                if not self.built:
+                    for part in ("postings", "by_name", "spelling", "matcher"):
+                        getattr(self, part)
+                    self.built = True
+        return self
+
+    def containing(self, word: str) -> List[int]:
+        """Positions whose drug name contains word ("vitamin" -> "vitamin c")"""
+        positions = self._containing.get(word)
+        if positions is None:
+            positions = [i for i, name in enumerate(self.names) if word in name.lower()]
+            self._containing[word] = positions
+        return positions
+
+    def for_condition(self, condition: str) -> List[int]:
+        """Positions of rows in the categories that treat a condition, best category first"""
+        positions = self._for_condition.get(condition)
+        if positions is None:
+            categories = self.postings["category"]
+            found = {}
+            for category in CONDITIONS.get(condition, ()):
+                found.update(dict.fromkeys(categories.get(category, ())))
+            positions = self._for_condition[condition] = list(found)
+        return positions
+
+    def products(self, message: str) -> List[int]:
+        """
+        Positions of the catalogue rows a message names, in message order
+        Each run of consecutive name tokens is one product phrase: an exact
+        name picks that row, otherwise every row containing all its tokens.
+        Runs made only of form words, strengths or lone letters ("tablets",
+        "500mg", the "c" of "vitamin c") are too vague to count.
+        """
+        by_token = self.postings["drug_name"]
+        phrases, run = [], []
+        for token in tokenize(message) + [""]:
+            if token in by_token and token not in STOP_WORDS:
+                run.append(token)
+                continue
+            if " ".join(run) in self.by_name or any(
+                    len(word) >= MIN_PARTIAL_LENGTH and word not in FILLER_WORDS
+                    and not any(c.isdigit() for c in word) for word in run):
+                phrases.append(run)
+            run = []
+
+        found = []
+        for phrase in phrases:
+            exact = self.by_name.get(" ".join(phrase))
+            if exact is not None:
+                matches = [exact]
+            else:
+                matches = set(by_token[phrase[0]])
+                for token in phrase[1:]:
+                    matches.intersection_update(by_token[token])
+                matches = sorted(matches)
+            found.extend(position for position in matches if position not in found)
+        return found
+
+    def score(self, message: str) -> Dict[int, int]:
+        """Relevance score per row position for the rows the message touches"""
+        terms = []
+        for word in tokenize(message):
+            if word in STOP_WORDS:
+                continue
+            terms.append(word)
+            if word not in self.spelling.terms:
+                terms.extend(self.spelling.corrections(word))
+
+        scores = {}
+        for field, weight in self.FIELD_WEIGHTS:
+            column = self.postings[field]
+            for term in terms:
+                for position in column.get(term, ()):
+                    scores[position] = scores.get(position, 0) + weight
+
+        # Symptoms count as a category match for the categories that treat them
+        category_weight = dict(self.FIELD_WEIGHTS)["category"]
+        for term in terms:
+            for category in CONDITIONS.get(term, ()):
+                for position in self.postings["category"].get(category, ()):
+                    scores[position] = scores.get(position, 0) + category_weight
+
+        return scores
@@ -1,22 +1,946 @@
+import atexit
+import os
 import sqlite3
+import uuid
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from functools import wraps
 from typing import List, Dict, Optional
 import json
 
+from catalogue import CatalogueIndex
+from drug_matcher import STOP_WORDS, tokenize
+from metrics import CACHE_LOOKUPS, CONVERSATIONS_ARCHIVED, DB_QUERY_SECONDS
+
+def timed_query(func):
+    """Record each call's duration in pharmacy_db_query_seconds"""
+    histogram = DB_QUERY_SECONDS.labels(func.__name__.lstrip("_"))
+    
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    return wrapper
+
+class ConnectionPool:
+    """
+    Long-lived SQLite connections, one per thread
+    Each connection is opened once, tuned for concurrent readers/writers
+    (WAL + synchronous=NORMAL) and keeps its own prepared statement cache.
+    """
+    
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+        "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped I/O
+        "PRAGMA temp_store=MEMORY",
+    )
+    
+    def __init__(self, db_path: str, cached_statements: int = 256):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+    
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=5.0,
+            check_same_thread=False,  # only ever used by the thread that opened it
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+    
+    def acquire(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        elif conn.in_transaction:
+            # A previous caller failed mid-transaction; start clean
+            conn.rollback()
+        return conn
+    
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool without closing it"""
+        if conn.in_transaction:
+            conn.rollback()
+    
+    def close_all(self):
+        """Close every pooled connection (shutdown only)"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+class InventorySnapshot:
+    """Immutable, versioned view of the inventory table keyed by drug name"""
+    
+    __slots__ = ("version", "rows", "by_name", "catalogue")
+    
+    # Columns a patch may change while the catalogue index stays valid
+    STOCK_FIELDS = ("quantity", "price")
+    
+    def __init__(self, version: int, rows, catalogue: CatalogueIndex = None):
+        self.version = version
+        self.rows = tuple(rows)  # ordered by drug_name, treat as read-only
+        self.by_name = {row['drug_name']: row for row in self.rows}
+        # Shared between snapshots that differ only in stock or price, so
+        # search, prompt and matcher indexes survive those patches
+        self.catalogue = catalogue if catalogue is not None else CatalogueIndex(self.rows)
+    
+    @property
+    def names(self) -> tuple:
+        return self.catalogue.names
+    
+    def get(self, drug_name: str) -> Optional[Dict]:
+        return self.by_name.get(drug_name.lower())
+
+class InventoryCache:
+    """
+    In-process inventory snapshot with write-through invalidation
+    Readers grab the current snapshot without locking. Writers commit first
+    and then invalidate or patch under the lock, so a concurrent reload can
+    never install data older than the last commit.
+    """
+    
+    def __init__(self, load_all, load_some):
+        self._load_all = load_all    # () -> all rows ordered by drug_name
+        self._load_some = load_some  # (names) -> rows for those drug names
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def snapshot(self) -> InventorySnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = InventorySnapshot(self._version, self._load_all())
+            return self._snapshot
+    
+    def invalidate(self):
+        """Drop the snapshot; the next reader reloads it"""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+    
+    def patch(self, drug_names: List[str]):
+        """Re-read the given drugs and swap in a new snapshot"""
+        with self._lock:
+            self._version += 1
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            
+            fresh = {row['drug_name']: row for row in self._load_some(drug_names)}
+            if any(name not in snapshot.by_name or name not in fresh for name in drug_names):
+                # Added or removed rows change the ordering; reload lazily instead
+                self._snapshot = None
+                return
+            
+            rows = [fresh.get(row['drug_name'], row) for row in snapshot.rows]
+            # Category, description or dosage edits must rebuild the catalogue index
+            stock_only = all(
+                {k: v for k, v in fresh[name].items() if k not in InventorySnapshot.STOCK_FIELDS}
+                == {k: v for k, v in snapshot.by_name[name].items() if k not in InventorySnapshot.STOCK_FIELDS}
+                for name in drug_names
+            )
+            self._snapshot = InventorySnapshot(self._version, rows, snapshot.catalogue if stock_only else None)
+
+class ConversationLog:
+    """
+    Write-behind buffer for conversation rows
+    append() only queues the row. A background thread commits the queue in
+    one transaction once it holds `batch_size` rows or the oldest row has
+    waited `flush_interval` seconds. Queued and in-flight rows stay visible
+    through pending() until their batch has committed.
+    """
+    
+    def __init__(self, write, batch_size: int = 500, flush_interval: float = 0.05):
+        self._write = write  # (rows) -> None, commits them in one transaction
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one batch at a time, in order
+        self._buffer = []
+        self._in_flight = []
+        self._thread = None
+        self._closed = False
+    
+    def append(self, row: tuple):
+        """Queue (phone_number, message, is_admin, timestamp)"""
+        with self._cond:
+            if not self._closed:
+                self._buffer.append(row)
+                if self._thread is None:
+                    self._start()
+                if len(self._buffer) == 1 or len(self._buffer) >= self.batch_size:
+                    self._cond.notify()
+                return
+        # After close() there is no flusher left; write straight through
+        self._write([row])
+    
+    def pending(self, phone_number: str) -> List[tuple]:
+        """Rows for this phone that are not committed yet, oldest first"""
+        with self._cond:
+            return [row for row in self._in_flight + self._buffer if row[0] == phone_number]
+    
+    def flush(self) -> int:
+        """Commit everything queued so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._cond:
+                rows, self._buffer = self._buffer, []
+                self._in_flight = rows
+            if not rows:
+                return 0
+            try:
+                self._write(rows)
+            except BaseException:
+                with self._cond:
+                    self._buffer[:0] = rows  # keep them for the next attempt
+                raise
+            finally:
+                with self._cond:
+                    self._in_flight = []
+            return len(rows)
+    
+    def close(self):
+        """Stop the flusher and durably write whatever is still queued"""
+        with self._cond:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+            atexit.unregister(self.close)
+        self.flush()
+    
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+        self._thread.start()
+        # Scripts that never call close() still get their rows written
+        atexit.register(self.close)
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)  # let the batch fill up
+                if self._closed:
+                    return  # close() does the final flush
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"⚠️ Conversation log flush failed, retrying: {e}")
+                time.sleep(self.flush_interval)
+
+class CustomerSession:
+    """A customer's recent messages and purchases (newest first) and cart lines"""
+    
+    __slots__ = ("conversations", "purchases", "cart", "expires_at")
+    
+    HISTORY_MESSAGES = 10
+    HISTORY_PURCHASES = 5
+    
+    def __init__(self, conversations: List[Dict], purchases: List[Dict], cart: List[List]):
+        self.conversations = conversations
+        self.purchases = purchases
+        self.cart = cart  # [drug_name, quantity] in the order items were added
+        self.expires_at = 0.0
+    
+    def add_message(self, message: str, timestamp: str):
+        self.conversations.insert(0, {"message": message, "timestamp": timestamp})
+        del self.conversations[self.HISTORY_MESSAGES:]
+    
+    def add_purchases(self, purchases: List[Dict]):
+        self.purchases[:0] = purchases[::-1]
+        del self.purchases[self.HISTORY_PURCHASES:]
+    
+    def add_to_cart(self, drug_name: str, quantity: int):
+        for line in self.cart:
+            if line[0] == drug_name:
+                line[1] += quantity
+                return
+        self.cart.append([drug_name, quantity])
+
+class SessionCache:
+    """
+    Bounded LRU of CustomerSessions with idle expiry
+    Writers commit first and then apply the same change to a cached session
+    (write-through). A load that overlaps a write for the same phone is
+    returned to its caller but not cached, so the cache never holds data
+    older than the last commit. Hold `lock` while copying out of a session.
+    """
+    
+    def __init__(self, max_size: int = 10000, idle_ttl: float = 600.0):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.lock = threading.Lock()
+        self._sessions = OrderedDict()  # phone_number -> CustomerSession
+        self._loads = {}  # phone_number -> [changed flag] per load in progress
+    
+    def get(self, phone_number: str) -> Optional[CustomerSession]:
+        now = time.monotonic()
+        with self.lock:
+            session = self._sessions.get(phone_number)
+            if session is not None and session.expires_at < now:
+                del self._sessions[phone_number]
+                session = None
+            if session is not None:
+                session.expires_at = now + self.idle_ttl
+                self._sessions.move_to_end(phone_number)
+        CACHE_LOOKUPS.labels("session", "miss" if session is None else "hit").inc()
+        return session
+    
+    def begin_load(self, phone_number: str) -> List[bool]:
+        marker = [False]
+        with self.lock:
+            self._loads.setdefault(phone_number, []).append(marker)
+        return marker
+    
+    def finish_load(self, phone_number: str, marker: List[bool], session: CustomerSession):
+        with self.lock:
+            loads = self._loads[phone_number]
+            loads.remove(marker)
+            if not loads:
+                del self._loads[phone_number]
+            if marker[0]:
+                return  # written to while loading
+            session.expires_at = time.monotonic() + self.idle_ttl
+            self._sessions[phone_number] = session
+            self._sessions.move_to_end(phone_number)
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+    
+    def update(self, phone_number: str, change):
+        """Apply change(session) to the cached session, if any, after a committed write"""
+        with self.lock:
+            for marker in self._loads.get(phone_number, ()):
+                marker[0] = True
+            session = self._sessions.get(phone_number)
+            if session is not None:
+                change(session)
+    
+    def discard(self, phone_numbers):
+        with self.lock:
+            for phone_number in phone_numbers:
+                for marker in self._loads.get(phone_number, ()):
+                    marker[0] = True
+                self._sessions.pop(phone_number, None)
+    
+    def clear(self):
+        with self.lock:
+            for loads in self._loads.values():
+                for marker in loads:
+                    marker[0] = True
+            self._sessions.clear()
+    
+    def __len__(self):
+        return len(self._sessions)
+
+class CacheSync:
+    """
+    Cross-process invalidation for the inventory snapshot and customer sessions
+    Every Database write records the keys it changed in cache_journal, inside
+    its own transaction and tagged with the writer's origin. A background
+    thread polls PRAGMA data_version, which only moves when another
+    connection commits, and applies other origins' journal rows to the local
+    caches. Rows older than `retention` are pruned; a reader that finds it
+    missed pruned rows drops its caches entirely.
+    """
+    
+    def __init__(self, db, interval: float = 0.05, retention: float = 300.0):
+        self.db = db
+        self.interval = interval
+        self.retention = retention
+        self.last_id = 0
+        self._data_version = None
+        self._last_prune = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Begin polling; caches filled before this are dropped"""
+        if self._thread is not None:
+            return
+        conn = self.db.get_connection()
+        try:
+            self.last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM cache_journal").fetchone()[0]
+        finally:
+            self.db.release_connection(conn)
+        self.db.inventory_cache.invalidate()
+        self.db.sessions.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-sync", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+    
+    def poll(self) -> int:
+        """Apply journal rows committed by other processes; returns how many"""
+        conn = self.db.get_connection()
+        try:
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return 0
+            self._data_version = version
+            
+            rows = conn.execute("""
+                SELECT id, origin, kind, key FROM cache_journal
+                WHERE id > ? ORDER BY id
+            """, (self.last_id,)).fetchall()
+            
+            if time.monotonic() - self._last_prune > self.retention / 5:
+                self._last_prune = time.monotonic()
+                conn.execute("DELETE FROM cache_journal WHERE created_at < julianday('now') - ?",
+                             (self.retention / 86400,))
+                conn.commit()
+        finally:
+            self.db.release_connection(conn)
+        
+        if not rows:
+            return 0
+        if rows[0]['id'] > self.last_id + 1:
+            # Pruned before we saw them: anything could have changed
+            self.db.inventory_cache.invalidate()
+            self.db.sessions.clear()
+        self.last_id = rows[-1]['id']
+        
+        drugs, phones = set(), set()
+        for row in rows:
+            if row['origin'] == self.db.origin:
+                continue  # already applied by write-through
+            (drugs if row['kind'] == 'inventory' else phones).add(row['key'])
+        
+        if "*" in drugs:
+            self.db.inventory_cache.invalidate()
+        elif drugs:
+            self.db.inventory_cache.patch(sorted(drugs))
+        if "*" in phones:
+            self.db.sessions.clear()
+        elif phones:
+            self.db.sessions.discard(phones)
+        return len(drugs) + len(phones)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except sqlite3.Error as e:
+                print(f"⚠️ Cache sync poll failed, retrying: {e}")
+
+class ConversationRetention:
+    """
+    Keeps the conversations table down to what the bot actually reads
+    A message is archived once it is older than `keep_days` and is not among
+    its customer's last HISTORY_MESSAGES (ties on timestamp are kept), so
+    customer history never changes. Archived rows are copied into
+    archive/conversations-YYYY-MM.db beside the main database, keyed on
+    their original id, and only then deleted: a run interrupted in between
+    just repeats the copy. The rollups have no delete triggers, so the
+    analytics keep counting archived messages. Freed pages go back to the
+    filesystem through incremental_vacuum, a few thousand at a time; older
+    database files need enable_incremental_vacuum() once, offline.
+    """
+    
+    ARCHIVE_SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY,
+            phone_number TEXT NOT NULL,
+            message TEXT NOT NULL,
+            is_admin BOOLEAN,
+            timestamp TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_conversations_phone_ts ON conversations(phone_number, timestamp)",
+    )
+    
+    def __init__(self, db, keep_days: int = 30, interval: float = 3600.0,
+                 batch_size: int = 5000, vacuum_pages: int = 2000):
+        self.db = db
+        self.keep_days = keep_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.archive_dir = os.path.join(os.path.dirname(os.path.abspath(db.db_path)), "archive")
+        self._vacuum_hint_shown = False
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Run on a schedule; one worker process wins each interval"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+    
+    def archive_path(self, month: str) -> str:
+        """Archive file for a 'YYYY-MM' month"""
+        return os.path.join(self.archive_dir, f"conversations-{month}.db")
+    
+    def run(self) -> Dict:
+        """Archive and compact once"""
+        archived = self.archive()
+        return {"archived": archived, "pages_freed": self.compact()}
+    
+    def archive(self) -> int:
+        """Move archivable conversations into the monthly files; returns how many"""
+        cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - self.keep_days * 86400))
+        archives = {}
+        after, total = 0, 0
+        try:
+            while True:
+                conn = self.db.get_connection()
+                try:
+                    # Walks the primary key once; the subquery is a seek on idx_conversations_phone_ts
+                    rows = conn.execute("""
+                        SELECT id, phone_number, message, is_admin, timestamp
+                        FROM conversations c
+                        WHERE id > ? AND timestamp < ?
+                          AND timestamp < (
+                              SELECT timestamp FROM conversations
+                              WHERE phone_number = c.phone_number
+                              ORDER BY timestamp DESC
+                              LIMIT 1 OFFSET ?
+                          )
+                        ORDER BY id
+                        LIMIT ?
+                    """, (after, cutoff, CustomerSession.HISTORY_MESSAGES - 1, self.batch_size)).fetchall()
+                finally:
+                    self.db.release_connection(conn)
+                if not rows:
+                    break
+                
+                by_month = {}
+                for row in rows:
+                    by_month.setdefault(row['timestamp'][:7], []).append(tuple(row))
+                for month, batch in by_month.items():
+                    if month not in archives:
+                        archives[month] = self._open_archive(month)
+                    archives[month].executemany(
+                        "INSERT OR IGNORE INTO conversations VALUES (?, ?, ?, ?, ?)", batch)
+                    archives[month].commit()
+                
+                # Short write transactions: chat traffic keeps flowing between batches
+                conn = self.db.get_connection()
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.executemany("DELETE FROM conversations WHERE id = ?", [(row['id'],) for row in rows])
+                    conn.commit()
+                finally:
+                    self.db.release_connection(conn)
+                
+                after = rows[-1]['id']
+                total += len(rows)
+                CONVERSATIONS_ARCHIVED.inc(len(rows))
+        finally:
+            for archive in archives.values():
+                archive.close()
+        return total
+    
+    def compact(self) -> int:
+        """Return free pages to the filesystem in short steps; returns how many"""
+        conn = self.db.get_connection()
+        freed = 0
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # Switching needs a full VACUUM, which holds the write lock for the
+                # whole rewrite; that is an explicit offline step, never scheduled
+                if not self._vacuum_hint_shown:
+                    self._vacuum_hint_shown = True
+                    print(f"⚠️ {self.db.db_path} does not use incremental vacuum; stop the API and run "
+                          f"`python database.py enable-incremental-vacuum` to reclaim archived space")
+            else:
+                while not self._stop.is_set():
+                    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                    if not free:
+                        break
+                    conn.execute(f"PRAGMA incremental_vacuum({min(free, self.vacuum_pages)})").fetchall()
+                    freed += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # Shrink the WAL file too, once readers let go of it
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        finally:
+            self.db.release_connection(conn)
+        return freed
+    
+    def enable_incremental_vacuum(self) -> int:
+        """
+        One-off switch to incremental auto-vacuum; returns pages freed
+        Rewrites the whole file with VACUUM, so run it while nothing else
+        is writing (a fresh database, or the API stopped).
+        """
+        conn = self.db.get_connection()
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return 0
+            before = conn.execute("PRAGMA page_count").fetchone()[0]
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return before - conn.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            self.db.release_connection(conn)
+    
+    def _open_archive(self, month: str) -> sqlite3.Connection:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive = sqlite3.connect(self.archive_path(month), timeout=5.0)
+        for statement in self.ARCHIVE_SCHEMA:
+            archive.execute(statement)
+        return archive
+    
+    def _claim(self) -> bool:
+        """Take this interval's run, unless another worker already has"""
+        conn = self.db.get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT last_run FROM maintenance_runs WHERE task = 'retention'").fetchone()
+            if row and row['last_run'] > time.time() - self.interval:
+                conn.rollback()
+                return False
+            conn.execute("INSERT OR REPLACE INTO maintenance_runs (task, last_run) VALUES ('retention', ?)",
+                         (time.time(),))
+            conn.commit()
+            return True
+        finally:
+            self.db.release_connection(conn)
+    
+    def _run(self):
+        while not self._stop.wait(min(self.interval, 300.0)):
+            try:
+                if self._claim():
+                    result = self.run()
+                    print(f"🗄️ Retention: {result['archived']:,} conversations archived, "
+                          f"{result['pages_freed']:,} pages freed")
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ Retention run failed, retrying next interval: {e}")
+
+# Stock level below which an item is reported as low
+LOW_STOCK_LEVEL = 20
+
+# Versioned schema migrations, applied in order and tracked with PRAGMA user_version.
+# Append new entries; never edit one that has already shipped.
+MIGRATIONS = [
+    (1, "indexes for hot query paths", [
+        # get_customer_history: WHERE phone_number = ? ORDER BY timestamp DESC
+        "CREATE INDEX IF NOT EXISTS idx_conversations_phone_ts ON conversations(phone_number, timestamp)",
+        # peak hours / weekly message counts: WHERE timestamp >= ...
+        "CREATE INDEX IF NOT EXISTS idx_conversations_ts ON conversations(timestamp)",
+        # get_customer_history: WHERE phone_number = ? ORDER BY purchase_date DESC
+        "CREATE INDEX IF NOT EXISTS idx_purchases_phone_date ON purchases(phone_number, purchase_date)",
+        # analytics and weekly stats: WHERE purchase_date >= date('now', ...)
+        "CREATE INDEX IF NOT EXISTS idx_purchases_date ON purchases(purchase_date)",
+        # get_medication_reminders: WHERE completed = 0 AND treatment_end_date >= ?
+        "CREATE INDEX IF NOT EXISTS idx_purchases_active ON purchases(completed, treatment_end_date)",
+    ]),
+    (2, "full-text search index for inventory", [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS inventory_fts USING fts5(
+            drug_name, category, description,
+            content='inventory', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS inventory_fts_insert AFTER INSERT ON inventory BEGIN
+            INSERT INTO inventory_fts(rowid, drug_name, category, description)
+            VALUES (new.id, new.drug_name, new.category, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS inventory_fts_delete AFTER DELETE ON inventory BEGIN
+            INSERT INTO inventory_fts(inventory_fts, rowid, drug_name, category, description)
+            VALUES ('delete', old.id, old.drug_name, old.category, old.description);
+        END
+        """,
+        # Stock/price updates don't touch the indexed columns, so they skip this
+        """
+        CREATE TRIGGER IF NOT EXISTS inventory_fts_update
+        AFTER UPDATE OF drug_name, category, description ON inventory BEGIN
+            INSERT INTO inventory_fts(inventory_fts, rowid, drug_name, category, description)
+            VALUES ('delete', old.id, old.drug_name, old.category, old.description);
+            INSERT INTO inventory_fts(rowid, drug_name, category, description)
+            VALUES (new.id, new.drug_name, new.category, new.description);
+        END
+        """,
+        "INSERT INTO inventory_fts(inventory_fts) VALUES ('rebuild')",
+    ]),
+    (3, "let bulk imports pause search index triggers", [
+        # A row here means a bulk import owns the index and will rebuild it
+        "CREATE TABLE IF NOT EXISTS inventory_fts_paused (id INTEGER PRIMARY KEY CHECK (id = 1))",
+        "DROP TRIGGER IF EXISTS inventory_fts_insert",
+        "DROP TRIGGER IF EXISTS inventory_fts_delete",
+        "DROP TRIGGER IF EXISTS inventory_fts_update",
+        """
+        CREATE TRIGGER inventory_fts_insert AFTER INSERT ON inventory
+        WHEN NOT EXISTS (SELECT 1 FROM inventory_fts_paused) BEGIN
+            INSERT INTO inventory_fts(rowid, drug_name, category, description)
+            VALUES (new.id, new.drug_name, new.category, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER inventory_fts_delete AFTER DELETE ON inventory
+        WHEN NOT EXISTS (SELECT 1 FROM inventory_fts_paused) BEGIN
+            INSERT INTO inventory_fts(inventory_fts, rowid, drug_name, category, description)
+            VALUES ('delete', old.id, old.drug_name, old.category, old.description);
+        END
+        """,
+        # Upserts rewrite every column; only reindex when the text really changed
+        """
+        CREATE TRIGGER inventory_fts_update
+        AFTER UPDATE OF drug_name, category, description ON inventory
+        WHEN (old.drug_name IS NOT new.drug_name
+              OR old.category IS NOT new.category
+              OR old.description IS NOT new.description)
+         AND NOT EXISTS (SELECT 1 FROM inventory_fts_paused) BEGIN
+            INSERT INTO inventory_fts(inventory_fts, rowid, drug_name, category, description)
+            VALUES ('delete', old.id, old.drug_name, old.category, old.description);
+            INSERT INTO inventory_fts(rowid, drug_name, category, description)
+            VALUES (new.id, new.drug_name, new.category, new.description);
+        END
+        """,
+    ]),
+    (4, "medication reminder due-queue", [
+        # One row per active treatment; next_due_at advances as reminders go out
+        """
+        CREATE TABLE IF NOT EXISTS reminder_schedule (
+            purchase_id INTEGER PRIMARY KEY REFERENCES purchases(id),
+            phone_number TEXT NOT NULL,
+            drug_name TEXT NOT NULL,
+            dosage_frequency TEXT,
+            end_date DATE NOT NULL,
+            reminder_type TEXT NOT NULL,
+            next_due_at DATE NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_reminder_schedule_due ON reminder_schedule(next_due_at)",
+        # Every purchase, however it is recorded, starts with a daily reminder today
+        """
+        CREATE TRIGGER IF NOT EXISTS reminder_schedule_insert AFTER INSERT ON purchases BEGIN
+            INSERT INTO reminder_schedule (purchase_id, phone_number, drug_name, dosage_frequency,
+                                           end_date, reminder_type, next_due_at)
+            VALUES (new.id, new.phone_number, new.drug_name, new.dosage_frequency,
+                    COALESCE(new.treatment_end_date, date('now', 'localtime')),
+                    'daily', date('now', 'localtime'));
+        END
+        """,
+        # Backfill treatments still inside their reminder window
+        """
+        INSERT OR IGNORE INTO reminder_schedule (purchase_id, phone_number, drug_name, dosage_frequency,
+                                                 end_date, reminder_type, next_due_at)
+        SELECT id, phone_number, drug_name, dosage_frequency, end_date,
+            CASE WHEN next_day <= end_date THEN 'daily'
+                 WHEN next_day <= date(end_date, '+1 day') THEN 'completion'
+                 ELSE 'checkup' END,
+            CASE WHEN next_day <= end_date THEN next_day
+                 WHEN next_day <= date(end_date, '+1 day') THEN date(end_date, '+1 day')
+                 ELSE date(end_date, '+3 days') END
+        FROM (
+            SELECT id, phone_number, drug_name, dosage_frequency,
+                COALESCE(treatment_end_date, date(purchase_date, 'localtime')) AS end_date,
+                CASE WHEN last_reminder_sent >= date('now', 'localtime')
+                     THEN date('now', 'localtime', '+1 day')
+                     ELSE date('now', 'localtime') END AS next_day
+            FROM purchases
+            WHERE completed = 0
+        )
+        WHERE date(end_date, '+3 days') >= date('now', 'localtime')
+        """,
+    ]),
+    (5, "analytics rollups maintained on write", [
+        # Rollups only ever grow: archiving raw rows later must not change them
+        """
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day DATE NOT NULL,
+            drug_name TEXT NOT NULL,
+            orders INTEGER NOT NULL DEFAULT 0,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            prescriptions INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, drug_name)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS messages_hourly (
+            hour TEXT PRIMARY KEY,
+            customer_messages INTEGER NOT NULL DEFAULT 0,
+            admin_messages INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS customer_purchases (
+            phone_number TEXT PRIMARY KEY,
+            purchase_count INTEGER NOT NULL DEFAULT 0,
+            first_purchase DATE NOT NULL,
+            last_purchase DATE NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_customer_purchases_last ON customer_purchases(last_purchase)",
+        """
+        CREATE TRIGGER IF NOT EXISTS rollup_purchase_insert AFTER INSERT ON purchases BEGIN
+            INSERT INTO sales_daily (day, drug_name, orders, quantity, revenue, prescriptions, completed)
+            VALUES (date(new.purchase_date), new.drug_name, 1, COALESCE(new.quantity, 0),
+                    COALESCE(new.amount, 0), new.dosage_days > 0,
+                    new.dosage_days > 0 AND new.completed = 1)
+            ON CONFLICT (day, drug_name) DO UPDATE SET
+                orders = orders + 1,
+                quantity = quantity + excluded.quantity,
+                revenue = revenue + excluded.revenue,
+                prescriptions = prescriptions + excluded.prescriptions,
+                completed = completed + excluded.completed;
+            INSERT INTO customer_purchases (phone_number, purchase_count, first_purchase, last_purchase)
+            VALUES (new.phone_number, 1, date(new.purchase_date), date(new.purchase_date))
+            ON CONFLICT (phone_number) DO UPDATE SET
+                purchase_count = purchase_count + 1,
+                first_purchase = MIN(first_purchase, excluded.first_purchase),
+                last_purchase = MAX(last_purchase, excluded.last_purchase);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS rollup_purchase_completed
+        AFTER UPDATE OF completed ON purchases
+        WHEN new.dosage_days > 0 AND (old.completed = 1) IS NOT (new.completed = 1) BEGIN
+            UPDATE sales_daily
+            SET completed = completed + CASE WHEN new.completed = 1 THEN 1 ELSE -1 END
+            WHERE day = date(new.purchase_date) AND drug_name = new.drug_name;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS rollup_conversation_insert AFTER INSERT ON conversations BEGIN
+            INSERT INTO messages_hourly (hour, customer_messages, admin_messages)
+            VALUES (strftime('%Y-%m-%d %H:00', new.timestamp),
+                    NOT COALESCE(new.is_admin, 0), COALESCE(new.is_admin, 0) != 0)
+            ON CONFLICT (hour) DO UPDATE SET
+                customer_messages = customer_messages + excluded.customer_messages,
+                admin_messages = admin_messages + excluded.admin_messages;
+        END
+        """,
+        # Backfill from existing history
+        """
+        INSERT OR REPLACE INTO sales_daily (day, drug_name, orders, quantity, revenue, prescriptions, completed)
+        SELECT date(purchase_date), drug_name, COUNT(*), SUM(COALESCE(quantity, 0)),
+               SUM(COALESCE(amount, 0)), SUM(dosage_days > 0),
+               SUM(dosage_days > 0 AND completed = 1)
+        FROM purchases
+        GROUP BY date(purchase_date), drug_name
+        """,
+        """
+        INSERT OR REPLACE INTO customer_purchases (phone_number, purchase_count, first_purchase, last_purchase)
+        SELECT phone_number, COUNT(*), date(MIN(purchase_date)), date(MAX(purchase_date))
+        FROM purchases
+        GROUP BY phone_number
+        """,
+        """
+        INSERT OR REPLACE INTO messages_hourly (hour, customer_messages, admin_messages)
+        SELECT strftime('%Y-%m-%d %H:00', timestamp),
+               SUM(NOT COALESCE(is_admin, 0)), SUM(COALESCE(is_admin, 0) != 0)
+        FROM conversations
+        GROUP BY strftime('%Y-%m-%d %H:00', timestamp)
+        """,
+    ]),
+    (6, "index inventory by stock level", [
+        # Low-stock listings: WHERE quantity < ? ORDER BY quantity
+        "CREATE INDEX IF NOT EXISTS idx_inventory_quantity ON inventory(quantity)",
+    ]),
+    (7, "cache invalidation journal shared by worker processes", [
+        # kind is 'inventory' (key = drug name) or 'session' (key = phone number);
+        # key '*' means everything of that kind. AUTOINCREMENT keeps ids from
+        # being reused after pruning, so a reader can tell when it missed rows.
+        """
+        CREATE TABLE IF NOT EXISTS cache_journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            created_at REAL NOT NULL DEFAULT (julianday('now'))
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_cache_journal_created ON cache_journal(created_at)",
+    ]),
+    (8, "last run of each scheduled maintenance task", [
+        # Lets exactly one worker process claim each retention run
+        "CREATE TABLE IF NOT EXISTS maintenance_runs (task TEXT PRIMARY KEY, last_run REAL NOT NULL) WITHOUT ROWID",
+    ]),
+]
+
 class Database:
     def __init__(self, db_path: str = "database/pharmacy.db"):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path)
+        self.inventory_cache = InventoryCache(self._load_inventory, self._load_inventory_rows)
+        self.conversation_log = ConversationLog(self._write_conversations)
+        self.sessions = SessionCache()
+        # Tags this instance's journal rows so its own writes are not re-applied
+        self.origin = uuid.uuid4().hex
+        self.sync = CacheSync(self)
+        self.retention = ConversationRetention(self)
     
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return self.pool.acquire()
+    
+    def release_connection(self, conn):
+        self.pool.release(conn)
+    
+    def close(self):
+        """Stop background threads, flush the conversation log and close all pooled connections"""
+        self.retention.stop()
+        self.sync.stop()
+        self.conversation_log.close()
+        self.pool.close_all()
+    
+    def _journal(self, cursor, kind: str, keys):
+        """Record changed cache keys for other processes, in the caller's transaction"""
+        cursor.executemany(
+            "INSERT INTO cache_journal (origin, kind, key) VALUES (?, ?, ?)",
+            [(self.origin, kind, key) for key in keys]
+        )
     
     def initialize(self):
         """Create all necessary tables"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # Workers starting together take turns; the seed check below must not race
+        cursor.execute("BEGIN IMMEDIATE")
+        created = cursor.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0
+        
         # Inventory table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS inventory (
@@ -98,26 +1022,115 @@ class Database:
             ]
             
             cursor.executemany("""
-                INSERT INTO inventory (drug_name, quantity, price, category, description, dosage_days, dosage_frequency)
+                INSERT OR IGNORE INTO inventory (drug_name, quantity, price, category, description, dosage_days, dosage_frequency)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, initial_drugs)
         
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
+        if created:
+            # WAL is already on, so auto_vacuum only takes effect through VACUUM;
+            # cheap now, while the file is empty
+            self.retention.enable_incremental_vacuum()
+        
+        self.migrate()
+        # An import that died mid-way leaves the search index paused
+        self._resume_search_index()
+        self.inventory_cache.invalidate()
+    
+    def schema_version(self) -> int:
+        """Current schema version of the database file"""
+        conn = self.get_connection()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        self.release_connection(conn)
+        return version
+    
+    def migrate(self) -> int:
+        """Apply pending schema migrations in place, returns the new version"""
+        conn = self.get_connection()
+        
+        try:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            
+            for version, description, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Another worker may have applied it while we waited for the lock
+                    if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                        conn.rollback()
+                        current = version
+                        continue
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {version}")
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                
+                current = version
+                print(f"✅ Migration {version} applied: {description}")
+            
+            # Refresh planner statistics for any new indexes
+            conn.execute("PRAGMA optimize")
+        finally:
+            self.release_connection(conn)
+        
+        return current
     
+    @timed_query
     def log_conversation(self, phone_number: str, message: str, is_admin: bool):
-        """Log conversations"""
+        """Queue a conversation row; the write-behind log commits it in a batch"""
+        # Stamped now, in CURRENT_TIMESTAMP's format, not when the batch lands
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        self.conversation_log.append((phone_number, message, is_admin, timestamp))
+        self.sessions.update(phone_number, lambda session: session.add_message(message, timestamp))
+    
+    @timed_query
+    def _write_conversations(self, rows: List[tuple]):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO conversations (phone_number, message, is_admin)
-            VALUES (?, ?, ?)
-        """, (phone_number, message, is_admin))
-        conn.commit()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO conversations (phone_number, message, is_admin, timestamp)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+            self._journal(cursor, 'session', {row[0] for row in rows})
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            self.release_connection(conn)
     
+    @timed_query
     def get_customer_history(self, phone_number: str) -> Dict:
-        """Get customer history"""
+        """Get customer history (served from the customer's session)"""
+        session = self._session(phone_number)
+        with self.sessions.lock:
+            return {
+                "conversations": [dict(row) for row in session.conversations],
+                "purchases": [dict(row) for row in session.purchases]
+            }
+    
+    def _session(self, phone_number: str) -> CustomerSession:
+        session = self.sessions.get(phone_number)
+        if session is not None:
+            return session
+        marker = self.sessions.begin_load(phone_number)
+        session = self._load_session(phone_number)
+        self.sessions.finish_load(phone_number, marker, session)
+        return session
+    
+    @timed_query
+    def _load_session(self, phone_number: str) -> CustomerSession:
+        # Taken before the read: a batch that commits in between then shows
+        # up in both, and is dropped from `pending` below, rather than in neither
+        pending = self.conversation_log.pending(phone_number)
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -126,30 +1139,57 @@ class Database:
             FROM conversations
             WHERE phone_number = ?
             ORDER BY timestamp DESC
-            LIMIT 10
-        """, (phone_number,))
+            LIMIT ?
+        """, (phone_number, CustomerSession.HISTORY_MESSAGES))
         
         conversations = [dict(row) for row in cursor.fetchall()]
+        committed = [(row['message'], row['timestamp']) for row in conversations]
+        newer = []
+        for _, message, _, timestamp in pending:
+            if (message, timestamp) in committed:
+                committed.remove((message, timestamp))
+            else:
+                newer.append({"message": message, "timestamp": timestamp})
+        # Messages still in the write-behind log are the newest ones
+        conversations = (newer[::-1] + conversations)[:CustomerSession.HISTORY_MESSAGES]
         
         cursor.execute("""
             SELECT drug_name, quantity, amount, purchase_date, dosage_days, completed
             FROM purchases
             WHERE phone_number = ?
             ORDER BY purchase_date DESC
-            LIMIT 5
-        """, (phone_number,))
+            LIMIT ?
+        """, (phone_number, CustomerSession.HISTORY_PURCHASES))
         
         purchases = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
+        cursor.execute("""
+            SELECT drug_name, quantity FROM cart
+            WHERE phone_number = ?
+            ORDER BY added_date, id
+        """, (phone_number,))
         
-        return {
-            "conversations": conversations,
-            "purchases": purchases
-        }
+        cart = [[row['drug_name'], row['quantity']] for row in cursor.fetchall()]
+        
+        self.release_connection(conn)
+        return CustomerSession(conversations, purchases, cart)
     
     def get_inventory(self) -> List[Dict]:
-        """Get all inventory"""
+        """Get all inventory (served from the in-memory snapshot)"""
+        return [dict(row) for row in self.inventory_cache.snapshot().rows]
+    
+    def get_inventory_snapshot(self) -> InventorySnapshot:
+        """
+        Current read-only inventory snapshot, no copying
+        Its catalogue index is built here, so call this on the worker pool and
+        the event loop only ever reads prebuilt indexes.
+        """
+        snapshot = self.inventory_cache.snapshot()
+        snapshot.catalogue.build()
+        return snapshot
+    
+    @timed_query
+    def _load_inventory(self) -> List[Dict]:
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute("""
@@ -158,9 +1198,23 @@ class Database:
             ORDER BY drug_name
         """)
         inventory = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        self.release_connection(conn)
         return inventory
     
+    @timed_query
+    def _load_inventory_rows(self, drug_names: List[str]) -> List[Dict]:
+        conn = self.get_connection()
+        placeholders = ",".join("?" * len(drug_names))
+        cursor = conn.execute(f"""
+            SELECT drug_name, quantity, price, category, description, dosage_days, dosage_frequency
+            FROM inventory
+            WHERE drug_name IN ({placeholders})
+        """, list(drug_names))
+        rows = [dict(row) for row in cursor.fetchall()]
+        self.release_connection(conn)
+        return rows
+    
+    @timed_query
     def update_inventory(self, drug_name: str, quantity: int, price: float, 
                         category: str, description: str = "", dosage_days: int = 0, 
                         dosage_frequency: str = "as prescribed"):
@@ -179,24 +1233,114 @@ class Database:
                 dosage_frequency = excluded.dosage_frequency,
                 last_updated = CURRENT_TIMESTAMP
         """, (drug_name.lower(), quantity, price, category, description, dosage_days, dosage_frequency))
+        self._journal(cursor, 'inventory', [drug_name.lower()])
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
+        # Stock/price edits keep the catalogue index; new drugs or text edits rebuild it
+        self.inventory_cache.patch([drug_name.lower()])
     
-    def get_cart(self, phone_number: str) -> List[Dict]:
-        """Get customer's shopping cart"""
+    @timed_query
+    def bulk_upsert_inventory(self, rows, batch_size: int = 5000) -> int:
+        """
+        Upsert (drug_name, quantity, price, category, description, dosage_days,
+        dosage_frequency) tuples from any iterable, batch_size rows per transaction
+        When a full batch is mostly new drugs, per-row search index triggers
+        are paused and the index is rebuilt once at the end instead.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
+        written = 0
+        paused = False
+        
+        try:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    if not paused and self._count_new_drugs(cursor, batch) * 4 > len(batch):
+                        cursor.execute("INSERT OR IGNORE INTO inventory_fts_paused (id) VALUES (1)")
+                        conn.commit()
+                        paused = True
+                    written += self._upsert_inventory_batch(conn, cursor, batch)
+                    batch = []
+            if batch:
+                written += self._upsert_inventory_batch(conn, cursor, batch)
+        finally:
+            if paused:
+                self._resume_search_index(conn)
+            self.release_connection(conn)
+            if written:
+                self.inventory_cache.invalidate()
+        
+        return written
+    
+    def _upsert_inventory_batch(self, conn, cursor, batch: List[tuple]) -> int:
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.executemany("""
+                INSERT INTO inventory (drug_name, quantity, price, category, description, dosage_days, dosage_frequency)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(drug_name) DO UPDATE SET
+                    quantity = excluded.quantity,
+                    price = excluded.price,
+                    category = excluded.category,
+                    description = excluded.description,
+                    dosage_days = excluded.dosage_days,
+                    dosage_frequency = excluded.dosage_frequency,
+                    last_updated = CURRENT_TIMESTAMP
+            """, batch)
+            self._journal(cursor, 'inventory', ["*"])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(batch)
+    
+    def _count_new_drugs(self, cursor, batch: List[tuple]) -> int:
+        names = json.dumps([row[0] for row in batch])
         cursor.execute("""
-            SELECT c.drug_name, c.quantity, i.price, i.category, i.dosage_days, i.dosage_frequency
-            FROM cart c
-            JOIN inventory i ON c.drug_name = i.drug_name
-            WHERE c.phone_number = ?
-            ORDER BY c.added_date
-        """, (phone_number,))
-        cart = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+            SELECT COUNT(*) FROM json_each(?)
+            WHERE value NOT IN (SELECT drug_name FROM inventory)
+        """, (names,))
+        return cursor.fetchone()[0]
+    
+    def _resume_search_index(self, conn=None):
+        """Re-enable search index triggers and rebuild the index if they were paused"""
+        own = conn is None
+        if own:
+            conn = self.get_connection()
+        
+        try:
+            if conn.execute("SELECT 1 FROM inventory_fts_paused").fetchone():
+                # Rebuild and unpause atomically so no write slips between them
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("INSERT INTO inventory_fts(inventory_fts) VALUES ('rebuild')")
+                conn.execute("DELETE FROM inventory_fts_paused")
+                conn.commit()
+        finally:
+            if own:
+                self.release_connection(conn)
+    
+    @timed_query
+    def get_cart(self, phone_number: str) -> List[Dict]:
+        """Get customer's shopping cart, priced from the current inventory snapshot"""
+        session = self._session(phone_number)
+        with self.sessions.lock:
+            lines = [tuple(line) for line in session.cart]
+        snapshot = self.inventory_cache.snapshot()
+        cart = []
+        for drug_name, quantity in lines:
+            item = snapshot.get(drug_name)
+            if item is None:
+                continue  # no longer stocked, as the old inventory join dropped it
+            cart.append({
+                'drug_name': drug_name, 'quantity': quantity, 'price': item['price'],
+                'category': item['category'], 'dosage_days': item['dosage_days'],
+                'dosage_frequency': item['dosage_frequency']
+            })
         return cart
     
+    @timed_query
     def add_to_cart(self, phone_number: str, drug_name: str, quantity: int):
         """Add item to cart"""
         conn = self.get_connection()
@@ -208,7 +1352,7 @@ class Database:
         
         result = cursor.fetchone()
         if not result or result['quantity'] < quantity:
-            conn.close()
+            self.release_connection(conn)
             return False
         
         cursor.execute("""
@@ -217,11 +1361,14 @@ class Database:
             ON CONFLICT(phone_number, drug_name) DO UPDATE SET
                 quantity = quantity + excluded.quantity
         """, (phone_number, drug_name.lower(), quantity))
+        self._journal(cursor, 'session', [phone_number])
         
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
+        self.sessions.update(phone_number, lambda session: session.add_to_cart(drug_name.lower(), quantity))
         return True
     
+    @timed_query
     def clear_cart(self, phone_number: str):
         """Clear customer's cart"""
         conn = self.get_connection()
@@ -229,9 +1376,12 @@ class Database:
         cursor.execute("""
             DELETE FROM cart WHERE phone_number = ?
         """, (phone_number,))
+        self._journal(cursor, 'session', [phone_number])
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
+        self.sessions.update(phone_number, lambda session: session.cart.clear())
     
+    @timed_query
     def record_purchase(self, phone_number: str, drug_name: str, 
                        quantity: int = 1, amount: float = 0):
         """Record purchase with medication tracking"""
@@ -249,13 +1399,15 @@ class Database:
         
         # Calculate treatment end date
         treatment_end_date = (datetime.now() + timedelta(days=dosage_days)).date() if dosage_days > 0 else None
+        # Stamped here, in CURRENT_TIMESTAMP's format, so the session holds the stored value
+        purchase_date = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
         
         cursor.execute("""
             INSERT INTO purchases (phone_number, drug_name, quantity, amount, dosage_days, 
-                                 dosage_frequency, treatment_end_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+                                 dosage_frequency, treatment_end_date, purchase_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """, (phone_number, drug_name.lower(), quantity, amount, dosage_days, 
-              dosage_frequency, treatment_end_date))
+              dosage_frequency, treatment_end_date, purchase_date))
         
         # Update inventory
         cursor.execute("""
@@ -263,108 +1415,212 @@ class Database:
             SET quantity = quantity - ?
             WHERE drug_name = ?
         """, (quantity, drug_name.lower()))
+        self._journal(cursor, 'inventory', [drug_name.lower()])
+        self._journal(cursor, 'session', [phone_number])
         
         conn.commit()
-        conn.close()
+        self.release_connection(conn)
+        self.inventory_cache.patch([drug_name.lower()])
+        purchase = {"drug_name": drug_name.lower(), "quantity": quantity, "amount": amount,
+                    "purchase_date": purchase_date, "dosage_days": dosage_days, "completed": 0}
+        self.sessions.update(phone_number, lambda session: session.add_purchases([purchase]))
     
-    def get_medication_reminders(self) -> List[Dict]:
-        """Get customers who need medication reminders"""
+    @timed_query
+    def checkout(self, phone_number: str) -> Dict:
+        """
+        Turn the customer's cart into purchases in a single transaction
+        Stock is only decremented where enough remains. If any item is short,
+        nothing is written and the short items are reported instead.
+        Returns {"items": [...], "total": float, "short": [...]}
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        today = datetime.now().date()
-        
-        # Get active medications (not completed, within treatment period)
-        cursor.execute("""
-            SELECT 
-                id,
-                phone_number,
-                drug_name,
-                dosage_frequency,
-                dosage_days,
-                CAST(julianday(?) - julianday(purchase_date) AS INTEGER) as days_since_purchase,
-                treatment_end_date,
-                last_reminder_sent,
-                reminders_sent,
-                completed
-            FROM purchases
-            WHERE completed = 0
-            AND (treatment_end_date IS NULL OR treatment_end_date >= ?)
-            ORDER BY purchase_date DESC
-        """, (today, today))
-        
-        reminders = []
-        for row in cursor.fetchall():
-            purchase = dict(row)
-            days_since = purchase['days_since_purchase']
-            last_sent = purchase['last_reminder_sent']
+        try:
+            # Take the write lock up front so the cart and stock we read can't change
+            cursor.execute("BEGIN IMMEDIATE")
             
-            # Determine if reminder is needed
-            should_send = False
-            reminder_type = 'daily'
+            cursor.execute("""
+                SELECT c.drug_name, c.quantity, i.price, i.category, i.dosage_days, i.dosage_frequency
+                FROM cart c
+                JOIN inventory i ON c.drug_name = i.drug_name
+                WHERE c.phone_number = ?
+                ORDER BY c.added_date
+            """, (phone_number,))
+            items = [dict(row) for row in cursor.fetchall()]
             
-            # Daily reminders during treatment
-            if days_since <= purchase['dosage_days']:
-                if last_sent is None or last_sent != str(today):
-                    should_send = True
-                    reminder_type = 'daily'
+            if not items:
+                conn.rollback()
+                return {"items": [], "total": 0, "short": []}
             
-            # Follow-up after treatment completion
-            elif days_since == purchase['dosage_days'] + 1:
-                should_send = True
-                reminder_type = 'completion'
+            short = []
+            for item in items:
+                cursor.execute("""
+                    UPDATE inventory
+                    SET quantity = quantity - ?
+                    WHERE drug_name = ? AND quantity >= ?
+                """, (item['quantity'], item['drug_name'], item['quantity']))
+                
+                if cursor.rowcount == 0:
+                    cursor.execute("SELECT quantity FROM inventory WHERE drug_name = ?", (item['drug_name'],))
+                    short.append({
+                        'drug_name': item['drug_name'],
+                        'requested': item['quantity'],
+                        'available': cursor.fetchone()['quantity']
+                    })
             
-            # Final checkup 3 days after completion
-            elif days_since == purchase['dosage_days'] + 3:
-                should_send = True
-                reminder_type = 'checkup'
+            if short:
+                conn.rollback()
+                return {"items": items, "total": 0, "short": short}
             
-            if should_send:
-                reminders.append({
-                    'purchase_id': purchase['id'],
-                    'phone_number': purchase['phone_number'],
-                    'drug_name': purchase['drug_name'],
-                    'dosage_frequency': purchase['dosage_frequency'],
-                    'days_since_purchase': days_since,
-                    'reminder_type': reminder_type
-                })
-        
-        conn.close()
-        return reminders
-    
-    def mark_reminder_sent(self, purchase_id: int):
-        """Mark that reminder was sent"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+            today = datetime.now()
+            purchase_date = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+            cursor.executemany("""
+                INSERT INTO purchases (phone_number, drug_name, quantity, amount, dosage_days, 
+                                     dosage_frequency, treatment_end_date, purchase_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (phone_number, item['drug_name'], item['quantity'], item['price'] * item['quantity'],
+                 item['dosage_days'] or 0, item['dosage_frequency'] or 'as prescribed',
+                 (today + timedelta(days=item['dosage_days'])).date() if item['dosage_days'] else None,
+                 purchase_date)
+                for item in items
+            ])
+            
+            cursor.execute("DELETE FROM cart WHERE phone_number = ?", (phone_number,))
+            self._journal(cursor, 'inventory', [item['drug_name'] for item in items])
+            self._journal(cursor, 'session', [phone_number])
+            conn.commit()
+        finally:
+            self.release_connection(conn)
         
-        today = datetime.now().date()
+        self.inventory_cache.patch([item['drug_name'] for item in items])
         
-        cursor.execute("""
-            UPDATE purchases
-            SET last_reminder_sent = ?,
-                reminders_sent = reminders_sent + 1
-            WHERE id = ?
-        """, (today, purchase_id))
+        purchases = [{"drug_name": item['drug_name'], "quantity": item['quantity'],
+                      "amount": item['price'] * item['quantity'], "purchase_date": purchase_date,
+                      "dosage_days": item['dosage_days'] or 0, "completed": 0} for item in items]
         
-        conn.commit()
-        conn.close()
+        def checked_out(session: CustomerSession):
+            session.cart.clear()
+            session.add_purchases(purchases)
+        self.sessions.update(phone_number, checked_out)
+        
+        return {
+            "items": items,
+            "total": sum(item['quantity'] * item['price'] for item in items),
+            "short": []
+        }
     
-    def mark_treatment_completed(self, purchase_id: int):
-        """Mark treatment as completed"""
+    @timed_query
+    def get_due_reminders(self, today=None, limit: Optional[int] = None,
+                          after: Optional[tuple] = None) -> List[Dict]:
+        """
+        Reminders due on or before today, oldest first
+        A daily reminder runs every day of the course, then a completion
+        message the day after it ends and a check-up two days later.
+        after: (next_due_at, purchase_id) of the last reminder already read
+        """
+        today = str(today or datetime.now().date())
+        after_due, after_id = after or ("", 0)
+        conn = self.get_connection()
+        
+        try:
+            rows = conn.execute("""
+                SELECT purchase_id, phone_number, drug_name, dosage_frequency,
+                       reminder_type, next_due_at
+                FROM reminder_schedule
+                WHERE next_due_at <= ? AND (next_due_at, purchase_id) > (?, ?)
+                ORDER BY next_due_at, purchase_id
+                LIMIT ?
+            """, (today, after_due, after_id, -1 if limit is None else limit)).fetchall()
+        finally:
+            self.release_connection(conn)
+        
+        return [dict(row) for row in rows]
+    
+    @timed_query
+    def mark_reminders_sent(self, reminders: List[Dict], today=None) -> int:
+        """
+        Advance each sent reminder to its next due date in one transaction
+        Only reminders still at the (purchase_id, next_due_at, reminder_type)
+        they were read with are advanced, so marking twice is harmless.
+        Returns how many were advanced.
+        """
+        today = str(today or datetime.now().date())
+        params = [
+            {"today": today, "purchase_id": r['purchase_id'],
+             "due_at": r['next_due_at'], "reminder_type": r['reminder_type']}
+            for r in reminders
+        ]
+        if not params:
+            return 0
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            UPDATE purchases
-            SET completed = 1
-            WHERE id = ?
-        """, (purchase_id,))
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # Purchase bookkeeping first, while the schedule row still matches
+            cursor.executemany("""
+                UPDATE purchases
+                SET last_reminder_sent = :today,
+                    reminders_sent = reminders_sent + 1,
+                    completed = CASE WHEN :reminder_type = 'checkup' THEN 1 ELSE completed END
+                WHERE id = :purchase_id AND EXISTS (
+                    SELECT 1 FROM reminder_schedule
+                    WHERE purchase_id = :purchase_id
+                    AND next_due_at = :due_at AND reminder_type = :reminder_type
+                )
+            """, params)
+            marked = cursor.rowcount
+            
+            # The check-up is the last reminder of a course
+            cursor.executemany("""
+                DELETE FROM reminder_schedule
+                WHERE purchase_id = :purchase_id AND next_due_at = :due_at
+                AND reminder_type = :reminder_type AND reminder_type = 'checkup'
+            """, params)
+            
+            cursor.executemany("""
+                UPDATE reminder_schedule
+                SET reminder_type = CASE
+                        WHEN reminder_type = 'daily' AND date(:today, '+1 day') <= end_date THEN 'daily'
+                        WHEN reminder_type = 'daily' THEN 'completion'
+                        ELSE 'checkup' END,
+                    next_due_at = CASE
+                        WHEN reminder_type = 'daily' THEN date(:today, '+1 day')
+                        ELSE MAX(date(end_date, '+3 days'), date(:today, '+1 day')) END
+                WHERE purchase_id = :purchase_id AND next_due_at = :due_at
+                AND reminder_type = :reminder_type
+            """, params)
+            
+            # Check-ups mark purchases completed; those customers' sessions are stale
+            phones = []
+            completed = [p['purchase_id'] for p in params if p['reminder_type'] == 'checkup']
+            if completed:
+                cursor.execute("""
+                    SELECT DISTINCT phone_number FROM purchases
+                    WHERE id IN (SELECT value FROM json_each(?))
+                """, (json.dumps(completed),))
+                phones = [row['phone_number'] for row in cursor.fetchall()]
+                self._journal(cursor, 'session', phones)
+            
+            conn.commit()
+        finally:
+            self.release_connection(conn)
         
-        conn.commit()
-        conn.close()
+        self.sessions.discard(phones)
+        return marked
     
+    @timed_query
     def get_predictive_analytics(self) -> Dict:
-        """Generate predictive analytics and insights"""
+        """
+        Generate predictive analytics and insights
+        Reads the sales_daily, messages_hourly and customer_purchases rollups,
+        so the cost depends on the catalogue and window, not on history size.
+        """
+        self.conversation_log.flush()  # count messages still in the write-behind log
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -372,9 +1628,9 @@ class Database:
         
         # 1. Demand Forecasting (top selling drugs)
         cursor.execute("""
-            SELECT drug_name, COUNT(*) as purchase_count, SUM(quantity) as total_qty
-            FROM purchases
-            WHERE purchase_date >= date('now', '-30 days')
+            SELECT drug_name, SUM(orders) as purchase_count, SUM(quantity) as total_qty
+            FROM sales_daily
+            WHERE day >= date('now', '-30 days')
             GROUP BY drug_name
             ORDER BY purchase_count DESC
             LIMIT 5
@@ -386,42 +1642,39 @@ class Database:
             SELECT 
                 i.drug_name,
                 i.quantity as current_stock,
-                COUNT(p.id) as sales_last_7days,
-                ROUND(CAST(i.quantity AS FLOAT) / NULLIF(COUNT(p.id), 0), 1) as days_until_stockout
+                s.sales as sales_last_7days,
+                ROUND(CAST(i.quantity AS FLOAT) / s.sales, 1) as days_until_stockout
             FROM inventory i
-            LEFT JOIN purchases p ON i.drug_name = p.drug_name 
-                AND p.purchase_date >= date('now', '-7 days')
+            JOIN (
+                SELECT drug_name, SUM(orders) as sales
+                FROM sales_daily
+                WHERE day >= date('now', '-7 days')
+                GROUP BY drug_name
+            ) s ON s.drug_name = i.drug_name
             WHERE i.quantity < 50
-            GROUP BY i.drug_name
-            HAVING COUNT(p.id) > 0
             ORDER BY days_until_stockout ASC
             LIMIT 5
         """)
         analytics['stockout_risk'] = [dict(row) for row in cursor.fetchall()]
         
-        # 3. Customer Retention Metrics
+        # 3. Customer Retention Metrics (active in 30 days, bought more than once)
         cursor.execute("""
             SELECT 
-                COUNT(DISTINCT phone_number) as total_customers,
-                COUNT(DISTINCT CASE WHEN purchase_count > 1 THEN phone_number END) as returning_customers,
-                ROUND(100.0 * COUNT(DISTINCT CASE WHEN purchase_count > 1 THEN phone_number END) / 
-                      COUNT(DISTINCT phone_number), 1) as retention_rate
-            FROM (
-                SELECT phone_number, COUNT(*) as purchase_count
-                FROM purchases
-                WHERE purchase_date >= date('now', '-30 days')
-                GROUP BY phone_number
-            )
+                COUNT(*) as total_customers,
+                COALESCE(SUM(purchase_count > 1), 0) as returning_customers,
+                COALESCE(ROUND(100.0 * SUM(purchase_count > 1) / COUNT(*), 1), 0) as retention_rate
+            FROM customer_purchases
+            WHERE last_purchase >= date('now', '-30 days')
         """)
         analytics['retention_metrics'] = dict(cursor.fetchone())
         
         # 4. Revenue Trends (weekly comparison)
         cursor.execute("""
             SELECT 
-                SUM(CASE WHEN purchase_date >= date('now', '-7 days') THEN amount ELSE 0 END) as this_week,
-                SUM(CASE WHEN purchase_date >= date('now', '-14 days') 
-                    AND purchase_date < date('now', '-7 days') THEN amount ELSE 0 END) as last_week
-            FROM purchases
+                COALESCE(SUM(CASE WHEN day >= date('now', '-7 days') THEN revenue END), 0) as this_week,
+                COALESCE(SUM(CASE WHEN day < date('now', '-7 days') THEN revenue END), 0) as last_week
+            FROM sales_daily
+            WHERE day >= date('now', '-14 days')
         """)
         revenue = cursor.fetchone()
         analytics['revenue_trend'] = dict(revenue)
@@ -435,12 +1688,12 @@ class Database:
         # 5. Peak Hours Analysis
         cursor.execute("""
             SELECT 
-                CAST(strftime('%H', timestamp) AS INTEGER) as hour,
-                COUNT(*) as message_count
-            FROM conversations
-            WHERE timestamp >= datetime('now', '-7 days')
-            AND is_admin = 0
-            GROUP BY hour
+                CAST(substr(hour, 12, 2) AS INTEGER) as hour,
+                SUM(customer_messages) as message_count
+            FROM messages_hourly
+            WHERE hour >= strftime('%Y-%m-%d %H:00', 'now', '-7 days')
+            GROUP BY 1
+            HAVING message_count > 0
             ORDER BY message_count DESC
             LIMIT 3
         """)
@@ -449,21 +1702,21 @@ class Database:
         # 6. Medication Adherence Rate
         cursor.execute("""
             SELECT 
-                COUNT(*) as total_prescriptions,
-                SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END) as completed_treatments,
-                ROUND(100.0 * SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END) / COUNT(*), 1) as adherence_rate
-            FROM purchases
-            WHERE dosage_days > 0
-            AND purchase_date >= date('now', '-30 days')
+                SUM(prescriptions) as total_prescriptions,
+                SUM(completed) as completed_treatments,
+                ROUND(100.0 * SUM(completed) / SUM(prescriptions), 1) as adherence_rate
+            FROM sales_daily
+            WHERE day >= date('now', '-30 days')
         """)
         adherence = cursor.fetchone()
         analytics['adherence_metrics'] = dict(adherence) if adherence['total_prescriptions'] else {
             'total_prescriptions': 0, 'completed_treatments': 0, 'adherence_rate': 0
         }
         
-        conn.close()
+        self.release_connection(conn)
         return analytics
     
+    @timed_query
     def get_inventory_analysis(self) -> Dict:
         """Generate comprehensive inventory analysis"""
         conn = self.get_connection()
@@ -485,9 +1738,9 @@ class Database:
         cursor.execute("""
             SELECT drug_name, quantity, price, category
             FROM inventory
-            WHERE quantity < 20
+            WHERE quantity < ?
             ORDER BY quantity ASC
-        """)
+        """, (LOW_STOCK_LEVEL,))
         analysis['low_stock'] = [dict(row) for row in cursor.fetchall()]
         
         # High value items
@@ -512,73 +1765,129 @@ class Database:
         """)
         analysis['by_category'] = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
+        self.release_connection(conn)
         return analysis
     
-    def get_weekly_stats(self) -> Dict:
-        """Get weekly statistics"""
+    @timed_query
+    def get_weekly_stats(self, low_stock_limit: int = 3) -> Dict:
+        """
+        Get statistics for the last 7 calendar days
+        Only indexed range reads over the rollup tables, plus the lowest-stock
+        items straight off idx_inventory_quantity.
+        """
+        self.conversation_log.flush()  # count messages still in the write-behind log
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT COUNT(*) as count
-            FROM purchases
-            WHERE purchase_date >= datetime('now', '-7 days')
+            SELECT COALESCE(SUM(orders), 0) as count, COALESCE(SUM(revenue), 0) as revenue
+            FROM sales_daily
+            WHERE day >= date('now', '-6 days')
         """)
-        total_purchases = cursor.fetchone()['count']
+        sales = cursor.fetchone()
         
         cursor.execute("""
-            SELECT COUNT(DISTINCT phone_number) as count
-            FROM purchases
-            WHERE purchase_date >= datetime('now', '-7 days')
-        """)
-        unique_customers = cursor.fetchone()['count']
-        
-        cursor.execute("""
-            SELECT drug_name, COUNT(*) as count
-            FROM purchases
-            WHERE purchase_date >= datetime('now', '-7 days')
+            SELECT drug_name, SUM(orders) as count
+            FROM sales_daily
+            WHERE day >= date('now', '-6 days')
             GROUP BY drug_name
             ORDER BY count DESC
             LIMIT 1
         """)
         top_result = cursor.fetchone()
-        top_drug = top_result['drug_name'].title() if top_result else "N/A"
         
         cursor.execute("""
             SELECT COUNT(*) as count
-            FROM conversations
-            WHERE timestamp >= datetime('now', '-7 days')
+            FROM customer_purchases
+            WHERE last_purchase >= date('now', '-6 days')
         """)
-        total_messages = cursor.fetchone()['count']
+        unique_customers = cursor.fetchone()['count']
         
-        # Total revenue this week
         cursor.execute("""
-            SELECT SUM(amount) as total
-            FROM purchases
-            WHERE purchase_date >= datetime('now', '-7 days')
+            SELECT COALESCE(SUM(customer_messages + admin_messages), 0) as count
+            FROM messages_hourly
+            WHERE hour >= date('now', '-6 days')
         """)
-        total_revenue = cursor.fetchone()['total'] or 0
+        total_messages = cursor.fetchone()['count']
+        
+        cursor.execute("""
+            SELECT drug_name, quantity, COUNT(*) OVER () as total
+            FROM inventory
+            WHERE quantity < ?
+            ORDER BY quantity ASC
+            LIMIT ?
+        """, (LOW_STOCK_LEVEL, low_stock_limit))
+        low_stock = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
+        self.release_connection(conn)
         
         return {
-            "total_purchases": total_purchases,
+            "total_purchases": sales['count'],
             "unique_customers": unique_customers,
-            "top_drug": top_drug,
+            "top_drug": top_result['drug_name'].title() if top_result else "N/A",
             "total_messages": total_messages,
-            "total_revenue": round(total_revenue, 2)
+            "total_revenue": round(sales['revenue'], 2),
+            "low_stock_count": low_stock[0]['total'] if low_stock else 0,
+            "low_stock": [{'drug_name': r['drug_name'], 'quantity': r['quantity']} for r in low_stock]
         }
     
-    def search_inventory(self, query: str) -> List[Dict]:
-        """Search inventory"""
+    def _fts_query(self, query: str) -> Optional[str]:
+        """Turn free text into an FTS5 query with prefix and typo expansion"""
+        spelling = self.inventory_cache.snapshot().catalogue.spelling
+        clauses = []
+        
+        for word in tokenize(query):
+            if word in STOP_WORDS:
+                continue
+            variants = [word]
+            if word not in spelling.terms:
+                variants += spelling.corrections(word)
+                if len(variants) == 1 and not spelling.has_prefix(word):
+                    continue  # matches nothing, e.g. "something" in "something for malaria"
+            clauses.append(" OR ".join(f'"{variant}"*' for variant in variants))
+        
+        if not clauses:
+            return None
+        return " OR ".join(f"({clause})" for clause in clauses)
+    
+    @timed_query
+    def search_inventory(self, query: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Search inventory by name, category and description, best matches first
+        Returns every match unless limit is given, then only the top `limit` by BM25.
+        """
+        fts_query = self._fts_query(query)
+        if not fts_query:
+            return []
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT drug_name, quantity, price, category, description, dosage_days, dosage_frequency
-            FROM inventory
-            WHERE drug_name LIKE ? OR category LIKE ? OR description LIKE ?
-        """, (f"%{query}%", f"%{query}%", f"%{query}%"))
+            SELECT i.drug_name, i.quantity, i.price, i.category, i.description,
+                   i.dosage_days, i.dosage_frequency
+            FROM inventory_fts
+            JOIN inventory i ON i.id = inventory_fts.rowid
+            WHERE inventory_fts MATCH ?
+            ORDER BY bm25(inventory_fts, 10.0, 4.0, 1.0)
+            LIMIT ?
+        """, (fts_query, -1 if limit is None else limit))  # negative means no limit
         results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
\ No newline at end of file
+        self.release_connection(conn)
+        return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    parser.add_argument("command", choices=["enable-incremental-vacuum"])
+    parser.add_argument("--db", default="database/pharmacy.db", help="database file")
+    args = parser.parse_args()
+    
+    # Stop the API first: VACUUM rewrites the file under an exclusive lock
+    db = Database(args.db)
+    db.initialize()
+    start = time.perf_counter()
+    freed = db.retention.enable_incremental_vacuum()
+    db.close()
+    print(f"✅ {args.db} uses incremental vacuum ({freed:,} pages freed in {time.perf_counter() - start:.1f}s)")
@@ -0,0 +1,145 @@
+import bisect
+import re
+from typing import Dict, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+QUANTITY_RE = re.compile(r"^(\d+)x?$")
+
+# Words allowed between a quantity and the drug name: "2 packs of paracetamol"
+FILLER_WORDS = {"x", "of", "pack", "packs", "tab", "tabs", "tablet", "tablets",
+                "bottle", "bottles", "sachet", "sachets", "strip", "strips", "pcs"}
+
+# Question words that carry no search meaning: "do you have something for malaria"
+STOP_WORDS = {"a", "an", "and", "any", "are", "can", "do", "does", "for", "get", "have",
+              "how", "i", "is", "it", "me", "much", "my", "need", "of", "or", "please",
+              "some", "something", "the", "to", "want", "what", "with", "you"}
+
+# Shortest word that may stand alone for a longer drug name: "syrup" finds
+# "cough syrup", but the "c" of "vitamin c" must come with "vitamin"
+MIN_PARTIAL_LENGTH = 2
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+class DrugMatcher:
+    """
+    Token trie over drug names for pulling (quantity, drug) pairs out of a message
+    Matching walks the message once and each lookup costs O(tokens in the
+    drug name), so it does not depend on catalogue size. Multi-word names
+    ("vitamin c", "cough syrup") match as a whole; a single word that belongs
+    to exactly one name ("syrup") still resolves to it, unless it is a lone
+    letter.
+    """
+
+    _END = object()
+
+    def __init__(self, drug_names):
+        self.trie: Dict = {}
+        self.by_token: Dict[str, str] = {}
+        ambiguous = set()
+
+        for name in drug_names:
+            tokens = tokenize(name)
+            if not tokens:
+                continue
+
+            node = self.trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[self._END] = name
+
+            for token in set(tokens):
+                if len(token) < MIN_PARTIAL_LENGTH and tokens != [token]:
+                    continue
+                if token in self.by_token and self.by_token[token] != name:
+                    ambiguous.add(token)
+                else:
+                    self.by_token[token] = name
+
+        # Exact full-name matches always win over partial ones
+        for token in ambiguous:
+            exact = self.trie.get(token, {}).get(self._END)
+            if exact:
+                self.by_token[token] = exact
+            else:
+                del self.by_token[token]
+
+    def match_at(self, tokens: List[str], start: int) -> Optional[Tuple[str, int]]:
+        """Longest drug name starting at tokens[start], returns (name, tokens used)"""
+        node = self.trie
+        best = None
+        for i in range(start, len(tokens)):
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            if self._END in node:
+                best = (node[self._END], i - start + 1)
+
+        if best is None and start < len(tokens) and tokens[start] in self.by_token:
+            best = (self.by_token[tokens[start]], 1)
+        return best
+
+    def extract(self, message: str) -> List[Dict]:
+        """All (quantity, drug) pairs in message order, e.g. "2 paracetamol and 1 vitamin c" """
+        tokens = tokenize(message)
+        items = []
+        i = 0
+
+        while i < len(tokens):
+            quantity = QUANTITY_RE.match(tokens[i])
+            if not quantity:
+                i += 1
+                continue
+
+            j = i + 1
+            while j < len(tokens) and tokens[j] in FILLER_WORDS:
+                j += 1
+
+            found = self.match_at(tokens, j)
+            if found and int(quantity.group(1)) > 0:
+                drug_name, used = found
+                items.append({'drug_name': drug_name, 'quantity': int(quantity.group(1))})
+                i = j + used
+            else:
+                i += 1
+
+        return items
+
+def _deletes(word: str):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+class SpellingIndex:
+    """
+    Typo correction for search terms ("paracetmol" -> "paracetamol")
+    A SymSpell-style deletion index: every term is stored under each of its
+    one-letter deletions, so a lookup is a handful of dict probes whatever
+    the vocabulary size. Covers one missing, extra, swapped or wrong letter.
+    """
+
+    MIN_LENGTH = 4  # shorter words give too many false corrections
+
+    def __init__(self, terms):
+        self.terms = set(terms)
+        self.sorted_terms = sorted(self.terms)
+        self.deletes: Dict[str, List[str]] = {}
+        for term in self.terms:
+            if len(term) >= self.MIN_LENGTH:
+                for variant in _deletes(term):
+                    self.deletes.setdefault(variant, []).append(term)
+
+    def has_prefix(self, prefix: str) -> bool:
+        i = bisect.bisect_left(self.sorted_terms, prefix)
+        return i < len(self.sorted_terms) and self.sorted_terms[i].startswith(prefix)
+
+    def corrections(self, word: str) -> List[str]:
+        """Known terms within one edit of word"""
+        if len(word) < self.MIN_LENGTH:
+            return []
+
+        candidates = set(self.deletes.get(word, ()))           # missing letter
+        for variant in _deletes(word):
+            if variant in self.terms:                           # extra letter
+                candidates.add(variant)
+            candidates.update(self.deletes.get(variant, ()))    # wrong / swapped letter
+        candidates.discard(word)
+        return sorted(candidates)
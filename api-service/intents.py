@@ -0,0 +1,234 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from catalogue import CONDITIONS, CatalogueIndex
+from drug_matcher import tokenize
+
+# Drugs customers ask for by name, with what they treat (checked in this order)
+DRUG_PURPOSES = {
+    "paracetamol": "fever and pain",
+    "ibuprofen": "pain and inflammation",
+    "amoxicillin": "bacterial infections",
+    "chloroquine": "malaria",
+    "artemether": "malaria",
+    "coartem": "malaria",
+    "vitamin": "health supplements",
+    "cough": "cough and cold",
+}
+
+# Keyword intents; a word matches at the start of a word ("pay" -> "payment")
+INTENT_WORDS = {
+    "price": ["price", "cost", "how much", "expensive"],
+    "stock": ["available", "in stock", "have", "sell", "stock"],
+    "cart": ["cart", "basket", "added", "items"],
+    "checkout": ["checkout", "pay", "payment", "order", "buy now"],
+    "medical": ["sick", "ill", "symptom", "diagnose", "what should i take", "treatment"],
+}
+
+# Greetings must be whole words so "which" or "this" is not a "hi"
+GREETINGS = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening", "greetings", "hola"]
+
+# Highest priority first; a condition with nothing in stock falls through
+INTENT_ORDER = ("greeting", "drug", "condition", "price", "stock", "cart", "checkout", "medical")
+
+# In-stock products suggested for a condition
+CONDITION_SUGGESTIONS = 5
+
+# Products listed in a routed price or stock reply
+ROUTED_PRODUCTS = 5
+
+# Longer messages are open-ended enough to go to the LLM
+ROUTED_MAX_WORDS = 12
+
+# Whole words that ask for the cart view; "items" or "added" alone are too
+# common in product questions to skip the LLM on
+ROUTED_CART_WORDS = {"cart", "basket"}
+
+def _alternation(words) -> str:
+    # Longest first so "payment" is not cut short by "pay"
+    return "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+# One pass over the message; the shared \b lets mid-word positions fail fast
+INTENT_RE = re.compile(r"\b(?:" + "|".join(
+    [rf"(?P<greeting>(?:{_alternation(GREETINGS)})\b)",
+     rf"(?P<drug>{_alternation(DRUG_PURPOSES)})",
+     rf"(?P<condition>{_alternation(CONDITIONS)})"]
+    + [rf"(?P<{intent}>{_alternation(words)})" for intent, words in INTENT_WORDS.items()]
+) + ")")
+
+# Position of each (intent, subject) in the cascade, for ordering matches
+_RANK = {intent: i for i, intent in enumerate(INTENT_ORDER)}
+_SUBJECT_RANK = {**{drug: i for i, drug in enumerate(DRUG_PURPOSES)},
+                 **{condition: i for i, condition in enumerate(CONDITIONS)}}
+
+REPLIES = {
+    "greeting": ("Hello! Welcome to Ejide Pharmacy! 😊\n\n"
+                 "I can help you:\n"
+                 "• Find medications and check prices\n"
+                 "• Add items to cart: 'I want [qty] [drug]'\n"
+                 "• Answer general pharmacy questions\n\n"
+                 "What are you looking for today?"),
+    "price": ("I can check prices for you! 💰\n\n"
+              "Which medication? Just ask:\n"
+              "'How much is paracetamol?'"),
+    "stock": ("Let me check our inventory! 📦\n\n"
+              "What medication do you need?\n"
+              "You can ask about specific drugs or conditions."),
+    "cart": ("Your cart is ready! 🛒\n\n"
+             "To add more: 'I want [qty] [drug]'\n"
+             "To checkout: Reply 'checkout'"),
+    "cart_empty": ("Your cart is empty. 🛒\n\n"
+                   "To add items, say:\n"
+                   "'I want 2 paracetamol'\n"
+                   "'Add 3 ibuprofen'"),
+    "checkout": ("Great! To complete your order:\n"
+                 "Reply 'checkout' and I'll send payment details."),
+    "checkout_empty": ("Your cart is empty. Add items first! 🛒\n\n"
+                       "Example: 'I want 2 paracetamol'"),
+    "medical": ("I understand you're not feeling well. 🏥\n\n"
+                "I can show you available medications, but for medical advice, "
+                "please consult our pharmacist or a doctor.\n\n"
+                "Visit us or call to speak with a professional. Your health matters! 😊"),
+    "default": ("I'm here to help! 🏥\n\n"
+                "You can:\n"
+                "• Ask about medications: 'Do you have paracetamol?'\n"
+                "• Check prices: 'How much is ibuprofen?'\n"
+                "• Add to cart: 'I want 2 paracetamol'\n"
+                "• Ask about conditions: 'What do you have for malaria?'\n\n"
+                "What would you like to know?"),
+}
+
+def classify(message: str) -> List[Tuple[str, str]]:
+    """(intent, matched word) pairs found in the message, highest priority first"""
+    found = {(match.lastgroup, match.group(match.lastgroup))
+             for match in INTENT_RE.finditer(message.lower())}
+    return sorted(found, key=lambda hit: (_RANK[hit[0]], _SUBJECT_RANK.get(hit[1], 0)))
+
+def stock_line(item: Dict) -> str:
+    return f"{item['drug_name'].title()}: {item['quantity']} units @ ₦{item['price']:,.0f}"
+
+def format_cart_summary(cart: List[dict]) -> str:
+    """Format cart items with total"""
+    if not cart:
+        return "🛒 Your cart is empty."
+    
+    summary = "🛒 *YOUR CART:*\n"
+    total = 0
+    
+    for item in cart:
+        item_total = item['quantity'] * item['price']
+        total += item_total
+        summary += f"• {item['drug_name'].title()} x{item['quantity']} = ₦{item_total:,.2f}\n"
+    
+    summary += f"\n💰 *TOTAL: ₦{total:,.2f}*\n"
+    summary += "\nReady to checkout? Reply 'checkout'"
+    
+    return summary
+
+def _in_stock(positions, inventory: List[Dict], limit: int) -> List[Dict]:
+    rows = []
+    for position in positions:
+        item = inventory[position]
+        if item['quantity'] > 0:
+            rows.append(item)
+            if len(rows) >= limit:
+                break
+    return rows
+
+def fallback_reply(message: str, inventory: List[Dict], cart: Optional[List[Dict]] = None,
+                   catalogue: Optional[CatalogueIndex] = None) -> str:
+    """
+    Rule-based reply used when no LLM provider answers
+    One regex pass classifies the message; drug and condition answers come
+    from the catalogue index and the live stock in `inventory`. Pass the
+    snapshot's catalogue to avoid indexing the rows on every call.
+    """
+    catalogue = catalogue or CatalogueIndex(inventory)
+    for intent, word in classify(message):
+        reply = answer(intent, word, inventory, cart, catalogue)
+        if reply is not None:
+            return reply
+    return REPLIES["default"]
+
+def answer(intent: str, word: str, inventory: List[Dict], cart: Optional[List[Dict]],
+           catalogue: CatalogueIndex) -> Optional[str]:
+    """Reply for one classified intent, or None when it has nothing to say"""
+    if intent == "drug":
+        purpose = DRUG_PURPOSES[word]
+        rows = _in_stock(catalogue.containing(word), inventory, 1)
+        if rows:
+            return (f"Yes! We have {word.title()} 💊\n\n"
+                    f"{stock_line(rows[0])}\n\n"
+                    f"Used for {purpose}. To order:\n"
+                    f"Reply: 'I want [quantity] {word}'")
+        return (f"Sorry, {word.title()} is currently out of stock. 😔\n\n"
+                f"We have other options for {purpose}. "
+                f"Would you like recommendations?")
+
+    if intent == "condition":
+        rows = _in_stock(catalogue.for_condition(word), inventory, CONDITION_SUGGESTIONS)
+        if not rows:
+            return None
+        lines = "".join(f"{i}. {stock_line(item)}\n" for i, item in enumerate(rows, 1))
+        return f"For {word}, we have:\n\n{lines}\nTo order, say: 'I want [qty] [drug name]' 🛒"
+
+    if intent in ("cart", "checkout") and not cart:
+        return REPLIES[f"{intent}_empty"]
+    return REPLIES[intent]
+
+def route(message: str, inventory: List[Dict], cart: Optional[List[Dict]] = None,
+          catalogue: Optional[CatalogueIndex] = None) -> Optional[Tuple[str, str]]:
+    """
+    Fast path ahead of the LLM for questions with an exact answer
+    Price and stock checks for named products, cart views and condition
+    queries are answered from the inventory snapshot and cart with
+    templated replies. Returns (intent, reply), or None for anything
+    open-ended, which then goes to the LLM as before.
+    """
+    tokens = tokenize(message)
+    if not inventory or len(tokens) > ROUTED_MAX_WORDS:
+        return None
+    hits = classify(message)
+    intents = {intent for intent, _ in hits}
+    if "medical" in intents or "checkout" in intents:
+        return None
+
+    catalogue = catalogue or CatalogueIndex(inventory)
+    products = [inventory[position] for position in catalogue.products(message)]
+    if products:
+        if "price" in intents:
+            return "price", _price_reply(products)
+        if "stock" in intents:
+            return "stock", _stock_reply(products)
+        return None
+
+    for intent, word in hits:
+        if intent == "condition":
+            reply = answer(intent, word, inventory, cart, catalogue)
+            return ("condition", reply) if reply is not None else None
+    if "cart" in intents and ROUTED_CART_WORDS.intersection(tokens):
+        return "cart", format_cart_summary(cart)
+    return None
+
+def _listing(products: List[Dict], line) -> str:
+    # In-stock rows first, keeping catalogue order within each group
+    ranked = sorted(products, key=lambda item: item['quantity'] <= 0)
+    text = "".join(f"• {line(item)}\n" for item in ranked[:ROUTED_PRODUCTS])
+    if len(ranked) > ROUTED_PRODUCTS:
+        text += f"…and {len(ranked) - ROUTED_PRODUCTS} more. Tell me which one you need.\n"
+    return text
+
+def _price_reply(products: List[Dict]) -> str:
+    def line(item):
+        stock = f"{item['quantity']} in stock" if item['quantity'] > 0 else "out of stock"
+        return f"{item['drug_name'].title()}: ₦{item['price']:,.0f} ({stock})"
+    return (f"💰 *Prices:*\n{_listing(products, line)}\n"
+            f"To order, say: 'I want [qty] [drug name]' 🛒")
+
+def _stock_reply(products: List[Dict]) -> str:
+    if not any(item['quantity'] > 0 for item in products):
+        names = ", ".join(item['drug_name'].title() for item in products[:ROUTED_PRODUCTS])
+        return (f"Sorry, {names} {'is' if len(products) == 1 else 'are'} currently out of stock. 😔\n\n"
+                f"Would you like recommendations?")
+    return (f"Yes! In stock now 💊\n\n{_listing(products, stock_line)}\n"
+            f"To order, say: 'I want [qty] [drug name]' 🛒")
@@ -0,0 +1,90 @@
+import csv
+import io
+import math
+from typing import Dict, Iterator, List, Tuple
+
+from database import Database
+
+REQUIRED_COLUMNS = ("drug_name", "quantity", "price")
+OPTIONAL_COLUMNS = ("category", "description", "dosage_days", "dosage_frequency")
+
+# Keep the report bounded for badly broken files; the count stays exact
+MAX_REPORTED_ERRORS = 1000
+
+class ImportReport:
+    """Outcome of a CSV import: rows written plus a per-row error list"""
+
+    def __init__(self):
+        self.imported = 0
+        self.error_count = 0
+        self.errors: List[Dict] = []
+
+    def add_error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": line, "error": message})
+
+def _column_index(header: List[str]) -> Dict[str, int]:
+    columns = {name.strip().lower(): i for i, name in enumerate(header)}
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"missing required column(s): {', '.join(missing)}")
+    return columns
+
+def parse_inventory_rows(lines, report: ImportReport) -> Iterator[Tuple]:
+    """
+    Validate CSV rows one at a time, yielding inventory tuples in
+    update_inventory column order; bad rows go to the report instead
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("file is empty")
+    columns = _column_index(header)
+
+    name_i, qty_i, price_i = (columns[name] for name in REQUIRED_COLUMNS)
+    cat_i, desc_i, days_i, freq_i = (columns.get(name) for name in OPTIONAL_COLUMNS)
+    width = len(header)
+
+    for row in reader:
+        line = reader.line_num
+        if not row or not any(field.strip() for field in row):
+            continue
+        if len(row) < width:
+            row = row + [""] * (width - len(row))
+
+        try:
+            drug_name = row[name_i].strip().lower()
+            if not drug_name:
+                raise ValueError("drug_name is empty")
+
+            quantity = int(row[qty_i])
+            price = float(row[price_i])
+            if not math.isfinite(price):
+                raise ValueError("price must be a finite number")
+            if quantity < 0 or price < 0:
+                raise ValueError("quantity and price must not be negative")
+
+            category = (row[cat_i].strip() if cat_i is not None else "") or "general"
+            description = row[desc_i].strip() if desc_i is not None else ""
+            dosage_days = int(row[days_i] or 0) if days_i is not None else 0
+            dosage_frequency = (row[freq_i].strip() if freq_i is not None else "") or "as prescribed"
+        except ValueError as e:
+            report.add_error(line, str(e))
+            continue
+
+        yield (drug_name, quantity, price, category, description, dosage_days, dosage_frequency)
+
+def open_csv(binary_file) -> io.TextIOWrapper:
+    """Text view over an uploaded file, tolerating the BOM Excel adds"""
+    return io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+
+def import_inventory(db: Database, lines, batch_size: int = 5000) -> ImportReport:
+    """
+    Stream CSV text lines into inventory
+    Parsing, validation and upserts are pipelined in batches, so memory
+    stays flat and the write lock is released between batches.
+    """
+    report = ImportReport()
+    report.imported = db.bulk_upsert_inventory(parse_inventory_rows(lines, report), batch_size)
+    return report
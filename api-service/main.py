@@ -1,13 +1,20 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
 import sqlite3
-import csv
-import io
+import os
 from ai_handler import MetaAIHandler
-from database import Database
+from database import Database, InventorySnapshot
+from intents import format_cart_summary, route
+from inventory_import import import_inventory, open_csv
+import metrics
+from metrics import CHAT_ROUTES, CHAT_STAGE_SECONDS, MetricsMiddleware
 
 app = FastAPI(title="Ejide Pharmacy API")
 
@@ -19,11 +26,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Initialize
 db = Database()
 ai_handler = MetaAIHandler()
 
+# Bounded worker pool for blocking SQLite calls (keeps them off the event loop)
+DB_WORKERS = int(os.getenv("DB_WORKERS", "8"))
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="sqlite")
+
+async def run_db(func, *args):
+    """Run a blocking database call on the SQLite worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(func, *args))
+
 class ChatMessage(BaseModel):
     phone_number: str
     message: str
@@ -32,15 +49,28 @@ class ChatMessage(BaseModel):
 
 @app.on_event("startup")
 async def startup():
-    db.initialize()
+    await run_db(db.initialize)
+    # Writes from other worker processes (uvicorn --workers N) invalidate our caches
+    db.sync.start()
+    # Conversations older than this (beyond each customer's recent history) move to monthly archives
+    db.retention.keep_days = int(os.getenv("CONVERSATION_RETENTION_DAYS", "30"))
+    db.retention.start()
     print("✅ Database initialized with medication tracking")
 
+@app.on_event("shutdown")
+async def shutdown():
+    await ai_handler.aclose()
+    db_executor.shutdown(wait=True)
+    db.close()
+
 @app.post("/chat")
 async def chat(msg: ChatMessage):
     """Main chat endpoint - handles all incoming messages"""
     
     # Log conversation
-    db.log_conversation(msg.phone_number, msg.message, msg.is_admin)
+    with CHAT_STAGE_SECONDS.labels("log_conversation").time():
+        # Only queues the row, so no need to hop onto the SQLite pool
+        db.log_conversation(msg.phone_number, msg.message, msg.is_admin)
     
     message_lower = msg.message.lower().strip()
     
@@ -48,19 +78,19 @@ async def chat(msg: ChatMessage):
     if msg.is_admin:
         # Inventory management
         if message_lower.startswith(("add drug", "update drug", "add inventory")):
-            return handle_admin_inventory(msg.message, msg.phone_number)
+            return await run_db(handle_admin_inventory, msg.message, msg.phone_number)
         
         # Analytics commands
         elif message_lower in ["analytics", "show analytics", "predictive insights", "insights"]:
-            return generate_analytics_report()
+            return await run_db(generate_analytics_report)
         
         # Inventory analysis
         elif message_lower in ["inventory report", "show inventory", "stock report", "inventory analysis"]:
-            return generate_inventory_report()
+            return await run_db(generate_inventory_report)
         
         # Weekly report
         elif message_lower in ["weekly report", "week report", "weekly summary"]:
-            return generate_weekly_report()
+            return await run_db(generate_weekly_report)
         
         # Help command
         elif message_lower == "help":
@@ -68,80 +98,76 @@ async def chat(msg: ChatMessage):
     
     # Check for cart/checkout commands
     if message_lower.startswith(("checkout", "check out")):
-        return handle_checkout(msg.phone_number, msg.message)
+        return await run_db(handle_checkout, msg.phone_number, msg.message)
     
-    # Get context
-    customer_history = db.get_customer_history(msg.phone_number)
-    inventory = db.get_inventory()
-    cart = db.get_cart(msg.phone_number)
+    # Get context (independent lookups run concurrently on the worker pool)
+    with CHAT_STAGE_SECONDS.labels("context_lookup").time():
+        (customer_history, cart), snapshot = await asyncio.gather(
+            run_db(load_customer, msg.phone_number),
+            run_db(db.get_inventory_snapshot),
+        )
+    
+    # Check if customer wants to add to cart
+    with CHAT_STAGE_SECONDS.labels("cart_parse").time():
+        cart_actions = parse_cart_actions(msg.message, snapshot)
+    
+    # Questions with an exact answer (prices, stock, cart, conditions) skip the LLM
+    if not msg.is_admin and not cart_actions:
+        with CHAT_STAGE_SECONDS.labels("route").time():
+            routed = route(msg.message, snapshot.rows, cart, snapshot.catalogue)
+        if routed is not None:
+            intent, reply = routed
+            CHAT_ROUTES.labels(intent).inc()
+            return {"reply": reply}
+    CHAT_ROUTES.labels("llm").inc()
     
     # Generate AI response
-    ai_response = ai_handler.generate_response(
-        message=msg.message,
-        customer_history=customer_history,
-        inventory=inventory,
-        cart=cart,
-        is_admin=msg.is_admin
-    )
+    with CHAT_STAGE_SECONDS.labels("generate_response").time():
+        ai_response = await ai_handler.generate_response(
+            message=msg.message,
+            customer_history=customer_history,
+            inventory=snapshot.rows,
+            cart=cart,
+            is_admin=msg.is_admin,
+            catalogue=snapshot.catalogue
+        )
     
-    # Check if customer wants to add to cart
-    cart_action = parse_cart_action(msg.message, inventory)
-    if cart_action:
-        db.add_to_cart(msg.phone_number, cart_action['drug_name'], cart_action['quantity'])
-        cart = db.get_cart(msg.phone_number)
+    if cart_actions:
+        with CHAT_STAGE_SECONDS.labels("cart_update").time():
+            for action in cart_actions:
+                await run_db(db.add_to_cart, msg.phone_number, action['drug_name'], action['quantity'])
+            cart = await run_db(db.get_cart, msg.phone_number)
         cart_summary = format_cart_summary(cart)
         ai_response += f"\n\n{cart_summary}"
     
     return {"reply": ai_response}
 
-def parse_cart_action(message: str, inventory: List[dict]) -> Optional[dict]:
-    """Parse if customer wants to add items to cart"""
-    message_lower = message.lower()
-    
-    # Patterns: "add 2 paracetamol", "3 ibuprofen", "I want 5 chloroquine"
-    words = message_lower.split()
-    
-    for i, word in enumerate(words):
-        if word.isdigit() and i + 1 < len(words):
-            quantity = int(word)
-            potential_drug = words[i + 1]
-            
-            for item in inventory:
-                if potential_drug in item['drug_name'].lower():
-                    return {
-                        'drug_name': item['drug_name'],
-                        'quantity': quantity
-                    }
-    
-    return None
+def load_customer(phone_number: str) -> tuple:
+    """History and cart, both served by one session load"""
+    return db.get_customer_history(phone_number), db.get_cart(phone_number)
 
-def format_cart_summary(cart: List[dict]) -> str:
-    """Format cart items with total"""
-    if not cart:
-        return "🛒 Your cart is empty."
-    
-    summary = "🛒 *YOUR CART:*\n"
-    total = 0
-    
-    for item in cart:
-        item_total = item['quantity'] * item['price']
-        total += item_total
-        summary += f"• {item['drug_name'].title()} x{item['quantity']} = ₦{item_total:,.2f}\n"
-    
-    summary += f"\n💰 *TOTAL: ₦{total:,.2f}*\n"
-    summary += "\nReady to checkout? Reply 'checkout'"
-    
-    return summary
+def parse_cart_actions(message: str, snapshot: InventorySnapshot) -> List[dict]:
+    """Parse which items the customer wants to add to cart"""
+    # Patterns: "add 2 paracetamol", "3 ibuprofen", "I want 5 chloroquine and 1 vitamin c"
+    return snapshot.catalogue.matcher.extract(message)
 
 def handle_checkout(phone_number: str, message: str) -> dict:
     """Handle customer checkout"""
-    cart = db.get_cart(phone_number)
+    # Record purchases, decrement stock and clear the cart atomically
+    order = db.checkout(phone_number)
+    cart = order['items']
     
     if not cart:
         return {"reply": "Your cart is empty. Add items first!\n\nExample: 'I want 2 paracetamol'"}
     
-    # Calculate total
-    total = sum(item['quantity'] * item['price'] for item in cart)
+    if order['short']:
+        reply = "😔 *NOT ENOUGH STOCK*\n\n"
+        for item in order['short']:
+            reply += f"• {item['drug_name'].title()}: you asked for {item['requested']}, only {item['available']} left\n"
+        reply += "\nYour order has not been placed. Reply 'help' for assistance."
+        return {"reply": reply}
+    
+    total = order['total']
     
     # Generate order summary
     order_id = f"EJD{datetime.now().strftime('%Y%m%d%H%M%S')}"
@@ -184,18 +210,6 @@ def handle_checkout(phone_number: str, message: str) -> dict:
     receipt += "📞 Reply 'help' for assistance\n\n"
     receipt += "Thank you for choosing Ejide Pharmacy! 🏥"
     
-    # Record purchases
-    for item in cart:
-        db.record_purchase(
-            phone_number, 
-            item['drug_name'], 
-            item['quantity'], 
-            item['price'] * item['quantity']
-        )
-    
-    # Clear cart
-    db.clear_cart(phone_number)
-    
     return {"reply": receipt}
 
 def get_account_details() -> str:
@@ -366,13 +380,9 @@ def generate_weekly_report() -> dict:
     report += f"📨 *ENGAGEMENT:*\n"
     report += f"Messages: {stats['total_messages']}\n\n"
     
-    # Get low stock items
-    inventory = db.get_inventory()
-    low_stock = [i for i in inventory if i['quantity'] < 20]
-    
-    if low_stock:
-        report += f"⚠️ *LOW STOCK:* {len(low_stock)} items\n"
-        for item in low_stock[:3]:
+    if stats['low_stock_count']:
+        report += f"⚠️ *LOW STOCK:* {stats['low_stock_count']} items\n"
+        for item in stats['low_stock']:
             report += f"  • {item['drug_name'].title()}: {item['quantity']}\n"
     
     return {"reply": report}
@@ -404,106 +414,148 @@ drug_name,quantity,price,category,description,dosage_days,dosage_frequency"""
 async def upload_inventory_csv(file: UploadFile = File(...)):
     """Upload inventory via CSV"""
     try:
-        contents = await file.read()
-        decoded = contents.decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(decoded))
-        
-        added_count = 0
-        errors = []
-        
-        for row in csv_reader:
-            try:
-                drug_name = row['drug_name'].strip().lower()
-                quantity = int(row['quantity'])
-                price = float(row['price'])
-                category = row.get('category', 'general').strip()
-                description = row.get('description', '').strip()
-                dosage_days = int(row.get('dosage_days', 0))
-                dosage_frequency = row.get('dosage_frequency', 'as prescribed').strip()
-                
-                db.update_inventory(drug_name, quantity, price, category, description, dosage_days, dosage_frequency)
-                added_count += 1
-                
-            except Exception as e:
-                errors.append(f"Row {added_count + 1}: {str(e)}")
+        # Parsed straight from the spooled upload, never decoded into memory whole
+        report = await run_db(import_inventory, db, open_csv(file.file))
         
         response = f"✅ *CSV Upload Complete!*\n\n"
-        response += f"✓ Added/Updated: {added_count} items\n"
+        response += f"✓ Added/Updated: {report.imported} items\n"
         
-        if errors:
-            response += f"\n⚠️ Errors ({len(errors)}):\n"
-            for error in errors[:5]:
-                response += f"• {error}\n"
+        if report.error_count:
+            response += f"\n⚠️ Errors ({report.error_count}):\n"
+            for error in report.errors[:5]:
+                response += f"• Row {error['row']}: {error['error']}\n"
         
-        return {"reply": response}
+        return {
+            "reply": response,
+            "imported": report.imported,
+            "error_count": report.error_count,
+            "errors": report.errors
+        }
         
     except Exception as e:
         return {"reply": f"❌ CSV Upload Failed: {str(e)}"}
 
+# Reminders are only marked sent once the WhatsApp side acknowledges delivery
+REMINDER_PAGE_SIZE = 100
+REMINDER_PAGE_MAX = 500
+
+class ReminderAck(BaseModel):
+    ack_ids: List[str]
+
 @app.get("/medication-reminders")
-async def get_medication_reminders():
-    """Get medication reminders for automated system"""
-    reminders_list = db.get_medication_reminders()
-    
-    reminders = []
-    for reminder in reminders_list:
-        phone = reminder['phone_number']
-        drug = reminder['drug_name']
-        reminder_type = reminder['reminder_type']
-        dosage = reminder.get('dosage_frequency', 'as prescribed')
-        
-        if reminder_type == 'daily':
-            message = (
-                f"💊 *MEDICATION REMINDER*\n\n"
-                f"Time to take your {drug.title()}!\n"
-                f"Dosage: {dosage}\n\n"
-                f"✅ Reply 'took it' to confirm\n"
-                f"❌ Reply 'missed' if you missed a dose\n\n"
-                f"Stay consistent for best results! 💪"
-            )
-        elif reminder_type == 'completion':
-            message = (
-                f"🎉 *TREATMENT MILESTONE*\n\n"
-                f"You've completed your {drug.title()} treatment course!\n\n"
-                f"How are you feeling?\n"
-                f"• Much better 😊\n"
-                f"• Some improvement 🤔\n"
-                f"• No change 😟\n\n"
-                f"Your feedback helps us serve you better!"
-            )
-        else:  # checkup
-            message = (
-                f"🏥 *HEALTH CHECK-IN*\n\n"
-                f"It's been 3 days since you completed {drug.title()}.\n\n"
-                f"Quick checkup:\n"
-                f"• Are your symptoms gone?\n"
-                f"• Any side effects?\n"
-                f"• Need any other medication?\n\n"
-                f"We're here to help! 😊"
-            )
-        
-        reminders.append({
-            "phone_number": phone,
-            "message": message,
+async def get_medication_reminders(limit: int = REMINDER_PAGE_SIZE, cursor: Optional[str] = None):
+    """
+    One page of due medication reminders
+    Pass next_cursor back as cursor for the following page; nothing is
+    marked as sent until it is acknowledged via /medication-reminders/ack.
+    """
+    limit = max(1, min(limit, REMINDER_PAGE_MAX))
+    try:
+        after = parse_reminder_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return await run_db(build_reminder_page, limit, after)
+
+@app.post("/medication-reminders/ack")
+async def acknowledge_medication_reminders(ack: ReminderAck):
+    """Mark delivered reminders as sent; acknowledging twice is harmless"""
+    reminders, invalid = [], []
+    for ack_id in ack.ack_ids:
+        try:
+            reminders.append(parse_ack_id(ack_id))
+        except ValueError:
+            invalid.append(ack_id)
+    
+    acknowledged = await run_db(db.mark_reminders_sent, reminders)
+    return {"acknowledged": acknowledged, "invalid": invalid}
+
+def build_reminder_page(limit: int, after: Optional[tuple]) -> dict:
+    """Build messages for one page of due reminders"""
+    due = db.get_due_reminders(limit=limit, after=after)
+    reminders = [
+        {
+            "phone_number": reminder['phone_number'],
+            "message": reminder_message(reminder),
             "purchase_id": reminder['purchase_id'],
-            "reminder_type": reminder_type
-        })
-        
-        # Mark reminder as sent
-        db.mark_reminder_sent(reminder['purchase_id'])
-        
-        # Mark as completed if checkup
-        if reminder_type == 'checkup':
-            db.mark_treatment_completed(reminder['purchase_id'])
-    
-    return {"reminders": reminders}
+            "reminder_type": reminder['reminder_type'],
+            "ack_id": make_ack_id(reminder)
+        }
+        for reminder in due
+    ]
+    
+    next_cursor = None
+    if len(due) == limit:
+        last = due[-1]
+        next_cursor = f"{last['next_due_at']}:{last['purchase_id']}"
+    
+    return {"reminders": reminders, "next_cursor": next_cursor}
+
+def parse_reminder_cursor(cursor: str) -> tuple:
+    due_at, purchase_id = cursor.split(":")
+    return due_at, int(purchase_id)
+
+def make_ack_id(reminder: dict) -> str:
+    """Identifies one reminder occurrence, not just the purchase"""
+    return f"{reminder['purchase_id']}:{reminder['next_due_at']}:{reminder['reminder_type']}"
+
+def parse_ack_id(ack_id: str) -> dict:
+    purchase_id, due_at, reminder_type = ack_id.split(":")
+    if reminder_type not in ("daily", "completion", "checkup"):
+        raise ValueError(f"unknown reminder type: {reminder_type}")
+    return {"purchase_id": int(purchase_id), "next_due_at": due_at, "reminder_type": reminder_type}
+
+def reminder_message(reminder: dict) -> str:
+    """WhatsApp text for one scheduled reminder"""
+    drug = reminder['drug_name']
+    reminder_type = reminder['reminder_type']
+    dosage = reminder.get('dosage_frequency') or 'as prescribed'
+    
+    if reminder_type == 'daily':
+        return (
+            f"💊 *MEDICATION REMINDER*\n\n"
+            f"Time to take your {drug.title()}!\n"
+            f"Dosage: {dosage}\n\n"
+            f"✅ Reply 'took it' to confirm\n"
+            f"❌ Reply 'missed' if you missed a dose\n\n"
+            f"Stay consistent for best results! 💪"
+        )
+    elif reminder_type == 'completion':
+        return (
+            f"🎉 *TREATMENT MILESTONE*\n\n"
+            f"You've completed your {drug.title()} treatment course!\n\n"
+            f"How are you feeling?\n"
+            f"• Much better 😊\n"
+            f"• Some improvement 🤔\n"
+            f"• No change 😟\n\n"
+            f"Your feedback helps us serve you better!"
+        )
+    else:  # checkup
+        return (
+            f"🏥 *HEALTH CHECK-IN*\n\n"
+            f"It's been 3 days since you completed {drug.title()}.\n\n"
+            f"Quick checkup:\n"
+            f"• Are your symptoms gone?\n"
+            f"• Any side effects?\n"
+            f"• Need any other medication?\n\n"
+            f"We're here to help! 😊"
+        )
 
 @app.get("/generate-weekly-report")
 async def api_generate_weekly_report():
     """API endpoint for weekly report generation"""
-    result = generate_weekly_report()
+    result = await run_db(generate_weekly_report)
     return {"report": result["reply"]}
 
+@app.get("/stats")
+async def get_stats():
+    """Runtime statistics for the AI pipeline"""
+    return {"ai": ai_handler.get_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     return {
@@ -0,0 +1,134 @@
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from metrics import LLM_OUTCOMES, LLM_REQUEST_SECONDS
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker driven by recent call outcomes
+    closed    -> calls flow; trips open when too many recent calls failed
+    open      -> calls are skipped until the cooldown (or Retry-After) passes
+    half_open -> a single trial call decides whether to close or re-open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, failure_rate: float = 0.5,
+                 window: int = 20, window_seconds: float = 60.0, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.failure_rate = failure_rate
+        self.window_seconds = window_seconds
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_until = 0.0
+        self.trial_in_flight = False
+        self.outcomes = deque(maxlen=window)  # (timestamp, ok)
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted right now"""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if time.monotonic() < self.opened_until:
+                return False
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = False
+
+        # Half-open: let exactly one trial call through
+        if self.trial_in_flight:
+            return False
+        self.trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.outcomes.append((time.monotonic(), True))
+        if self.state != self.CLOSED:
+            self.state = self.CLOSED
+            self.trial_in_flight = False
+            self.outcomes.clear()
+
+    def release_trial(self):
+        """A half-open trial call was abandoned without an outcome"""
+        self.trial_in_flight = False
+
+    def record_failure(self, retry_after: Optional[float] = None):
+        now = time.monotonic()
+        self.outcomes.append((now, False))
+
+        if retry_after is not None:
+            # Rate limited: the provider told us exactly how long to back off
+            self._open(now, max(retry_after, 1.0))
+            return
+
+        if self.state == self.HALF_OPEN:
+            self._open(now, self.cooldown)
+            return
+
+        recent = [ok for ts, ok in self.outcomes if now - ts <= self.window_seconds]
+        failures = recent.count(False)
+        if failures >= self.failure_threshold and failures / len(recent) >= self.failure_rate:
+            self._open(now, self.cooldown)
+
+    def _open(self, now: float, duration: float):
+        self.state = self.OPEN
+        self.opened_until = now + duration
+        self.trial_in_flight = False
+
+
+class ProviderHealth:
+    """Circuit breaker, latency history and outcome counters for one LLM provider"""
+
+    def __init__(self, name: str, default_hedge_delay: float = 2.0,
+                 min_hedge_delay: float = 0.25, latency_samples: int = 100):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.latencies = deque(maxlen=latency_samples)
+        self.outcomes: Dict[str, int] = {}
+
+    def available(self) -> bool:
+        return self.breaker.allow()
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.outcomes["ok"] = self.outcomes.get("ok", 0) + 1
+        LLM_OUTCOMES.labels(self.name, "ok").inc()
+        LLM_REQUEST_SECONDS.labels(self.name).observe(latency)
+        self.breaker.record_success()
+
+    def record_failure(self, kind: str, retry_after: Optional[float] = None):
+        """kind: error, rate_limited, timeout, unavailable, empty"""
+        self.outcomes[kind] = self.outcomes.get(kind, 0) + 1
+        LLM_OUTCOMES.labels(self.name, kind).inc()
+        self.breaker.record_failure(retry_after)
+
+    def record_cancelled(self):
+        """Call cancelled because another provider answered first"""
+        LLM_OUTCOMES.labels(self.name, "cancelled").inc()
+        self.breaker.release_trial()
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < 10:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def hedge_delay(self) -> float:
+        """How long to wait on this provider before starting a backup"""
+        p95 = self.p95()
+        if p95 is None:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, p95)
+
+    def stats(self) -> Dict:
+        p95 = self.p95()
+        return {
+            "state": self.breaker.state,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "outcomes": dict(self.outcomes),
+        }
@@ -3,8 +3,16 @@ Quick test script to verify AI handler is working
 Run this to test all three options: LM Studio, HuggingFace, and Fallback
 """
 
+import asyncio
 from ai_handler import MetaAIHandler
 
+async def ask(handler, **kwargs):
+    """Run one request and release the HTTP client before the loop closes"""
+    try:
+        return await handler.generate_response(**kwargs)
+    finally:
+        await handler.aclose()
+
 def test_ai():
     print("🧪 Testing Ejide Pharmacy AI Handler")
     print("=" * 50)
@@ -48,12 +56,13 @@ def test_ai():
         print("-" * 50)
         
         try:
-            response = handler.generate_response(
+            response = asyncio.run(ask(
+                handler,
                 message=message,
                 customer_history=customer_history,
                 inventory=inventory,
                 is_admin=False
-            )
+            ))
             
             print(f"✅ Response received:")
             print(f"{response}")
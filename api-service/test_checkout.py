@@ -0,0 +1,88 @@
+"""
+Concurrency test for Database.checkout
+Many customers race to check out the last few units of one drug. Exactly
+as many orders as there are units may succeed, stock may never go
+negative, and losing customers keep their carts untouched.
+"""
+
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import Database
+
+CUSTOMERS = 20
+
+
+def setup_db(tmp: str, stock: int) -> Database:
+    db = Database(os.path.join(tmp, "pharmacy.db"))
+    db.initialize()
+    db.update_inventory("lastdrug", stock, 1000, "test", dosage_days=3, dosage_frequency="Once daily")
+    return db
+
+
+def race_checkouts(db: Database, phones):
+    start = threading.Barrier(len(phones))
+
+    def checkout(phone):
+        start.wait()
+        return phone, db.checkout(phone)
+
+    with ThreadPoolExecutor(max_workers=len(phones)) as pool:
+        return dict(pool.map(checkout, phones))
+
+
+def count(db: Database, sql: str, *params) -> int:
+    conn = db.get_connection()
+    value = conn.execute(sql, params).fetchone()[0]
+    db.release_connection(conn)
+    return value
+
+
+def test_parallel_checkouts_never_oversell():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = setup_db(tmp, stock=3)
+        phones = [f"2348000000{i:02d}" for i in range(CUSTOMERS)]
+        for phone in phones:
+            assert db.add_to_cart(phone, "lastdrug", 1)
+
+        results = race_checkouts(db, phones)
+
+        winners = [phone for phone, order in results.items() if not order['short']]
+        losers = [phone for phone, order in results.items() if order['short']]
+        print(f"\n🛒 {len(winners)} checkouts succeeded, {len(losers)} rejected")
+
+        assert len(winners) == 3
+        assert db.get_inventory_snapshot().get("lastdrug")['quantity'] == 0
+        assert count(db, "SELECT quantity FROM inventory WHERE drug_name = 'lastdrug'") == 0
+        assert count(db, "SELECT COUNT(*) FROM purchases WHERE drug_name = 'lastdrug'") == 3
+
+        for phone in winners:
+            assert results[phone]['total'] == 1000
+            assert db.get_cart(phone) == []
+        for phone in losers:
+            assert results[phone]['short'][0]['available'] == 0
+            assert len(db.get_cart(phone)) == 1
+        db.close()
+
+
+def test_short_item_rolls_back_whole_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = setup_db(tmp, stock=5)
+        assert db.add_to_cart("234800000001", "paracetamol", 2)
+        assert db.add_to_cart("234800000001", "lastdrug", 5)
+        db.update_inventory("lastdrug", 4, 1000, "test")
+
+        order = db.checkout("234800000001")
+
+        assert order['short'] == [{'drug_name': 'lastdrug', 'requested': 5, 'available': 4}]
+        assert count(db, "SELECT COUNT(*) FROM purchases") == 0
+        assert count(db, "SELECT quantity FROM inventory WHERE drug_name = 'paracetamol'") == 150
+        assert len(db.get_cart("234800000001")) == 2
+        db.close()
+
+
+if __name__ == "__main__":
+    test_parallel_checkouts_never_oversell()
+    test_short_item_rolls_back_whole_order()
@@ -0,0 +1,96 @@
+"""
+Write-behind conversation log test
+Concurrent writers only queue rows. Batches land by size or by time, a
+customer's history includes messages that have not been committed yet,
+nothing is lost on close, and a failed batch is retried rather than dropped.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from database import ConversationLog, Database
+
+
+def count(db: Database) -> int:
+    conn = db.get_connection()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+    finally:
+        db.release_connection(conn)
+
+
+def test_bursts_are_batched_and_flushed_on_close():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        batches = []
+        write = db.conversation_log._write
+        db.conversation_log._write = lambda rows: (batches.append(len(rows)), write(rows))
+
+        def burst(worker: int):
+            for i in range(250):
+                db.log_conversation(f"23480000{worker:04d}", f"message {i}", False)
+
+        threads = [threading.Thread(target=burst, args=(w,)) for w in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        history = db.get_customer_history("234800000003")['conversations']
+        assert [row['message'] for row in history] == [f"message {i}" for i in range(249, 239, -1)]
+
+        db.close()
+        assert sum(batches) == 2000
+        assert len(batches) < 100  # batched, not one transaction per message
+
+        reopened = Database(db.db_path)
+        assert count(reopened) == 2000
+        assert reopened.get_weekly_stats()['total_messages'] == 2000
+        reopened.close()
+
+
+def test_time_and_size_triggers():
+    written = []
+    log = ConversationLog(written.extend, batch_size=50, flush_interval=0.05)
+
+    log.append(("234800000001", "hello", False, "2026-01-01 10:00:00"))
+    assert log.pending("234800000001")
+    deadline = time.monotonic() + 2
+    while not written and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(written) == 1 and not log.pending("234800000001")
+
+    log.flush_interval = 60  # only a full batch can trigger a flush now
+    for i in range(50):
+        log.append(("234800000002", f"m{i}", False, "2026-01-01 10:00:00"))
+    deadline = time.monotonic() + 2
+    while len(written) < 51 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(written) == 51
+    log.close()
+
+
+def test_failed_batch_is_retried():
+    written, failures = [], [1]
+
+    def flaky(rows):
+        if failures:
+            failures.pop()
+            raise sqlite3.OperationalError("database is locked")
+        written.extend(rows)
+
+    log = ConversationLog(flaky, flush_interval=0.01)
+    for i in range(3):
+        log.append(("234800000001", f"m{i}", False, "2026-01-01 10:00:00"))
+    deadline = time.monotonic() + 2
+    while not written and time.monotonic() < deadline:
+        time.sleep(0.01)
+    log.close()
+    assert [row[1] for row in written] == ["m0", "m1", "m2"]
+    # Writes after close go straight through
+    log.append(("234800000001", "late", False, "2026-01-01 10:00:01"))
+    assert written[-1][1] == "late"
@@ -0,0 +1,67 @@
+"""
+Cart request parsing test
+DrugMatcher pulls every (quantity, drug) pair out of a message, matching
+multi-word names whole and a distinctive single word to its one drug.
+Lone letters never stand in for a name, in cart parsing or in routing.
+"""
+
+from catalogue import CatalogueIndex
+from database import InventorySnapshot
+from drug_matcher import DrugMatcher
+from intents import route
+from main import parse_cart_actions
+
+NAMES = ["amoxicillin", "cough syrup", "paracetamol", "paracetamol extra", "vitamin b complex", "vitamin c"]
+
+
+def extract(message):
+    return [(item['quantity'], item['drug_name']) for item in DrugMatcher(NAMES).extract(message)]
+
+
+def test_several_items_in_one_message():
+    assert extract("I want 2 paracetamol and 1 vitamin c") == [(2, "paracetamol"), (1, "vitamin c")]
+    assert extract("add 5 amoxicillin, 3x cough syrup") == [(5, "amoxicillin"), (3, "cough syrup")]
+
+
+def test_multi_word_names_and_fillers():
+    assert extract("3 cough syrup") == [(3, "cough syrup")]
+    assert extract("2 packs of paracetamol") == [(2, "paracetamol")]
+    # Longest name wins, exact name beats a shared word
+    assert extract("1 paracetamol extra") == [(1, "paracetamol extra")]
+    assert extract("4 vitamin b complex") == [(4, "vitamin b complex")]
+
+
+def test_single_words():
+    # A word belonging to one name resolves to it
+    assert extract("2 syrup") == [(2, "cough syrup")]
+    # A word shared by several names is too vague
+    assert extract("2 vitamin") == []
+    # A lone letter is never a drug: "2 c" is not two vitamin c
+    assert extract("2 c") == []
+    assert extract("0 paracetamol") == []
+
+
+def test_lone_letters_are_not_products():
+    inventory = [{"drug_name": name, "quantity": 10, "price": 500} for name in NAMES]
+    assert route("do you sell c", inventory) is None
+    assert route("do you sell vitamin c", inventory)[0] == "stock"
+
+
+def test_matcher_lives_on_the_snapshot():
+    rows = [{"drug_name": name, "quantity": 10, "price": 500} for name in NAMES]
+    snapshot = InventorySnapshot(1, rows)
+    assert parse_cart_actions("2 syrup", snapshot) == [{'drug_name': "cough syrup", 'quantity': 2}]
+
+    # A stock-only snapshot shares the catalogue, and with it the matcher
+    restocked = InventorySnapshot(2, [dict(row, quantity=0) for row in rows], snapshot.catalogue)
+    assert restocked.catalogue.matcher is snapshot.catalogue.matcher
+    assert CatalogueIndex(rows).matcher is not snapshot.catalogue.matcher
+
+
+if __name__ == "__main__":
+    test_several_items_in_one_message()
+    test_multi_word_names_and_fillers()
+    test_single_words()
+    test_lone_letters_are_not_products()
+    test_matcher_lives_on_the_snapshot()
+    print("✅ Drug matcher tests passed")
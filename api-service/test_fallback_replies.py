@@ -0,0 +1,119 @@
+"""
+Rule-based fallback golden replies
+Pins the exact text customers get when no LLM provider answers, for each
+intent, against a fixed inventory. Replies come from the structured
+inventory and cart, so a stock change shows up without rebuilding the
+catalogue index. Also pins which messages the router answers itself and
+which still go to the LLM.
+"""
+
+from catalogue import CatalogueIndex
+from intents import classify, fallback_reply, route
+
+INVENTORY = [
+    {"drug_name": "amoxicillin", "quantity": 0, "price": 1500, "category": "antibiotic"},
+    {"drug_name": "coartem", "quantity": 40, "price": 2500, "category": "malaria"},
+    {"drug_name": "cough syrup", "quantity": 12, "price": 1200, "category": "cold/flu"},
+    {"drug_name": "ibuprofen", "quantity": 30, "price": 800, "category": "pain"},
+    {"drug_name": "paracetamol", "quantity": 100, "price": 500, "category": "fever/pain"},
+    {"drug_name": "vitamin c", "quantity": 25, "price": 700, "category": "supplement"},
+]
+CART = [{"drug_name": "coartem", "quantity": 1, "price": 2500}]
+
+# (message, has cart, reply)
+GOLDEN = [
+    ('Hi there', False, "Hello! Welcome to Ejide Pharmacy! 😊\n\nI can help you:\n• Find medications and check prices\n• Add items to cart: 'I want [qty] [drug]'\n• Answer general pharmacy questions\n\nWhat are you looking for today?"),
+    ('do you have paracetamol?', False, "Yes! We have Paracetamol 💊\n\nParacetamol: 100 units @ ₦500\n\nUsed for fever and pain. To order:\nReply: 'I want [quantity] paracetamol'"),
+    ('How much is ibuprofen', False, "Yes! We have Ibuprofen 💊\n\nIbuprofen: 30 units @ ₦800\n\nUsed for pain and inflammation. To order:\nReply: 'I want [quantity] ibuprofen'"),
+    # Out of stock is not "Yes! We have ... 0 units"
+    ('price of amoxicillin please', False, 'Sorry, Amoxicillin is currently out of stock. 😔\n\nWe have other options for bacterial infections. Would you like recommendations?'),
+    # "something" is not a greeting
+    ('I need something for malaria', False, "For malaria, we have:\n\n1. Coartem: 40 units @ ₦2,500\n\nTo order, say: 'I want [qty] [drug name]' 🛒"),
+    ('I have a cold', False, "For cold, we have:\n\n1. Cough Syrup: 12 units @ ₦1,200\n2. Vitamin C: 25 units @ ₦700\n\nTo order, say: 'I want [qty] [drug name]' 🛒"),
+    ('what do you have for cough and catarrh', False, "Yes! We have Cough 💊\n\nCough Syrup: 12 units @ ₦1,200\n\nUsed for cough and cold. To order:\nReply: 'I want [quantity] cough'"),
+    ('I have fever and headache', False, "For fever, we have:\n\n1. Paracetamol: 100 units @ ₦500\n2. Ibuprofen: 30 units @ ₦800\n\nTo order, say: 'I want [qty] [drug name]' 🛒"),
+    ('how much', False, "I can check prices for you! 💰\n\nWhich medication? Just ask:\n'How much is paracetamol?'"),
+    ('is it available', False, 'Let me check our inventory! 📦\n\nWhat medication do you need?\nYou can ask about specific drugs or conditions.'),
+    ('show my cart', False, "Your cart is empty. 🛒\n\nTo add items, say:\n'I want 2 paracetamol'\n'Add 3 ibuprofen'"),
+    ('show my cart', True, "Your cart is ready! 🛒\n\nTo add more: 'I want [qty] [drug]'\nTo checkout: Reply 'checkout'"),
+    ('I want to pay', False, "Your cart is empty. Add items first! 🛒\n\nExample: 'I want 2 paracetamol'"),
+    ('I want to pay', True, "Great! To complete your order:\nReply 'checkout' and I'll send payment details."),
+    ('I feel sick', False, "I understand you're not feeling well. 🏥\n\nI can show you available medications, but for medical advice, please consult our pharmacist or a doctor.\n\nVisit us or call to speak with a professional. Your health matters! 😊"),
+    # Nor is "which"
+    ('which one is best', False, "I'm here to help! 🏥\n\nYou can:\n• Ask about medications: 'Do you have paracetamol?'\n• Check prices: 'How much is ibuprofen?'\n• Add to cart: 'I want 2 paracetamol'\n• Ask about conditions: 'What do you have for malaria?'\n\nWhat would you like to know?"),
+]
+
+
+def test_golden_replies():
+    for message, has_cart, expected in GOLDEN:
+        reply = fallback_reply(message, INVENTORY, CART if has_cart else None)
+        assert reply == expected, message
+
+
+def test_priority_follows_the_cascade():
+    assert classify("hi, how much is paracetamol")[0] == ("greeting", "hi")
+    # Drugs are checked in table order, not message order
+    assert classify("ibuprofen or paracetamol")[0] == ("drug", "paracetamol")
+    assert [intent for intent, _ in classify("price of my cart items")] == ["price", "cart", "cart"]
+
+
+def test_live_stock_with_a_reused_catalogue():
+    inventory = [dict(row) for row in INVENTORY]
+    catalogue = CatalogueIndex(inventory)
+    assert fallback_reply("fever", inventory, catalogue=catalogue).startswith("For fever")
+
+    # Same catalogue, new stock levels: the index is reused, the reply is not stale
+    inventory = [dict(row, quantity=0) for row in INVENTORY]
+    postings = catalogue.postings
+    assert fallback_reply("fever", inventory, catalogue=catalogue) == fallback_reply("zzz", inventory)
+    assert catalogue.postings is postings
+    assert fallback_reply("paracetamol", inventory, catalogue=catalogue).startswith("Sorry, Paracetamol")
+
+
+def test_conditions_suggest_by_category():
+    # Every in-stock product in a treating category, not just drugs named in a table
+    inventory = INVENTORY + [{"drug_name": "lumefantrine", "quantity": 5, "price": 3000, "category": "malaria"}]
+    reply = fallback_reply("anything for malaria?", inventory)
+    assert "1. Coartem" in reply and "2. Lumefantrine" in reply
+
+
+# (message, routed intent or None for the LLM)
+ROUTES = [
+    ("How much is ibuprofen?", "price"),
+    ("price of vitamin c", "price"),
+    ("do you have amoxicillin", "stock"),
+    ("is coartem in stock", "stock"),
+    ("any syrup available", "stock"),
+    ("show my cart", "cart"),
+    ("what do you have for malaria", "condition"),
+    ("what items do you have for malaria", "condition"),  # "items" is not the cart
+    ("what's in my basket", "cart"),
+    ("items added today", None),
+    ("hello", None),
+    ("paracetamol", None),                       # no question asked
+    ("do you have tablets", None),               # form word alone names nothing
+    ("I want to pay for paracetamol", None),
+    ("I have fever and headache, what should I take", None),
+    ("How much is paracetamol? My son is 4 and has had a high temperature since yesterday", None),
+]
+
+
+def test_router_answers_only_exact_questions():
+    for message, expected in ROUTES:
+        routed = route(message, INVENTORY, CART)
+        assert (routed[0] if routed else None) == expected, message
+
+
+def test_routed_replies():
+    assert route("how much is coartem", INVENTORY)[1] == (
+        "💰 *Prices:*\n• Coartem: ₦2,500 (40 in stock)\n\n"
+        "To order, say: 'I want [qty] [drug name]' 🛒")
+    assert route("do you have amoxicillin?", INVENTORY)[1] == (
+        "Sorry, Amoxicillin is currently out of stock. 😔\n\nWould you like recommendations?")
+    assert route("show my cart", INVENTORY, CART)[1].startswith("🛒 *YOUR CART:*\n• Coartem x1")
+
+    many = [{"drug_name": f"paracetamol {mg}mg", "quantity": mg % 3, "price": mg} for mg in range(100, 800, 100)]
+    reply = route("price of paracetamol", many)[1]
+    # Five of the seven are in stock, and those are listed first
+    assert reply.count("• ") == 5 and "…and 2 more" in reply
+    assert "(out of stock)" not in reply
@@ -0,0 +1,92 @@
+"""
+Connection reuse test for MetaAIHandler's pooled HTTP client
+Points Groq and HuggingFace at a local keep-alive stub server and checks
+that repeated calls share one TCP connection instead of reconnecting.
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ai_handler import MetaAIHandler
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    client_ports = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.client_ports.append(self.client_address[1])
+
+        if self.path.startswith("/hf"):
+            body = [{"generated_text": "HuggingFace says hi 😊"}]
+        else:
+            body = {"choices": [{"message": {"content": "Groq says hi 😊"}}]}
+        data = json.dumps(body).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    StubLLMHandler.client_ports = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+async def ask_many(handler: MetaAIHandler, count: int):
+    try:
+        for i in range(count):
+            # Distinct messages so the response cache never short-circuits a call
+            await handler.generate_response(f"question {i}", {}, [])
+    finally:
+        await handler.aclose()
+
+
+def test_connections_are_reused():
+    server, base_url = start_stub()
+    try:
+        handler = MetaAIHandler()
+        handler.GROQ_API_URL = f"{base_url}/groq"
+        handler.GROQ_API_KEY = "test-key"
+
+        asyncio.run(ask_many(handler, 10))
+
+        ports = StubLLMHandler.client_ports
+        print(f"\n🔌 {len(ports)} requests over {len(set(ports))} connection(s)")
+        assert len(ports) == 10
+        assert len(set(ports)) == 1
+    finally:
+        server.shutdown()
+
+
+def test_fallback_provider_shares_the_pool():
+    server, base_url = start_stub()
+    try:
+        handler = MetaAIHandler()
+        handler.use_groq = False
+        handler.use_huggingface = True
+        handler.hf_api_url = f"{base_url}/hf"
+        handler.hf_token = "test-token"
+
+        asyncio.run(ask_many(handler, 5))
+
+        ports = StubLLMHandler.client_ports
+        assert len(ports) == 5
+        assert len(set(ports)) == 1
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    test_fallback_provider_shares_the_pool()
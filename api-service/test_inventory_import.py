@@ -0,0 +1,102 @@
+"""
+Streaming CSV import test
+Bad rows are reported by line number without stopping the import, and
+the search index stays in step whether triggers ran per row or the index
+was rebuilt after a large insert.
+"""
+
+import io
+import os
+import tempfile
+
+import pytest
+
+from database import Database
+from inventory_import import import_inventory
+
+CSV = """drug_name,quantity,price,category,description
+Zincovit,40,1500,supplement,zinc and multivitamin tablets
+Malarone,ten,3000,malaria,atovaquone proguanil
+,5,100,general,no name
+Coartem,25,-1,malaria,artemether lumefantrine
+Fansidar,10,nan,malaria,sulfadoxine pyrimethamine
+Quinine,10,inf,malaria,quinine sulphate
+Paracetamol,300,450,fever/pain,pain relief
+"""
+
+
+def test_bad_rows_are_reported_and_skipped():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+
+        report = import_inventory(db, io.StringIO(CSV))
+
+        assert report.imported == 2
+        assert [error["row"] for error in report.errors] == [3, 4, 5, 6, 7]
+        assert db.get_inventory_snapshot().get("zincovit")["quantity"] == 40
+        assert db.get_inventory_snapshot().get("paracetamol")["quantity"] == 300
+        assert db.get_inventory_snapshot().get("malarone") is None
+        db.close()
+
+
+def test_large_import_keeps_search_in_step():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        lines = ["drug_name,quantity,price,category,description"]
+        lines += [f"bulkdrug{i},{i},100,herbal,ginger root extract {i}" for i in range(500)]
+
+        report = import_inventory(db, io.StringIO("\n".join(lines)), batch_size=100)
+
+        assert report.imported == 500
+        assert len(db.search_inventory("ginger", limit=1000)) == 500
+        conn = db.get_connection()
+        assert conn.execute("SELECT COUNT(*) FROM inventory_fts_paused").fetchone()[0] == 0
+        db.release_connection(conn)
+
+        # Re-import with new text: rows already exist, so triggers reindex them
+        lines = [line.replace("ginger root", "turmeric") for line in lines]
+        import_inventory(db, io.StringIO("\n".join(lines)), batch_size=100)
+        assert db.search_inventory("ginger") == []
+        assert len(db.search_inventory("turmeric", limit=1000)) == 500
+        db.close()
+
+
+def test_failed_batch_keeps_earlier_batches_and_resumes_search():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        lines = ["drug_name,quantity,price,category,description"]
+        lines += [f"bulkdrug{i},{i},100,herbal,ginger root extract {i}" for i in range(300)]
+
+        journal, batches = db._journal, []
+
+        def failing_journal(cursor, kind, keys):
+            batches.append(kind)
+            if len(batches) == 2:
+                raise RuntimeError("disk full")
+            journal(cursor, kind, keys)
+
+        db._journal = failing_journal
+        with pytest.raises(RuntimeError, match="disk full"):
+            import_inventory(db, io.StringIO("\n".join(lines)), batch_size=100)
+        db._journal = journal
+
+        # First batch committed and searchable; the failed one left nothing behind
+        assert len(db.search_inventory("ginger", limit=1000)) == 100
+        assert db.get_inventory_snapshot().get("bulkdrug150") is None
+        conn = db.get_connection()
+        assert conn.execute("SELECT COUNT(*) FROM inventory_fts_paused").fetchone()[0] == 0
+        db.release_connection(conn)
+
+        # Triggers are back on for later writes
+        db.update_inventory("turmeric tea", 5, 200, "herbal", "turmeric and ginger")
+        assert [row['drug_name'] for row in db.search_inventory("turmeric")] == ["turmeric tea"]
+        db.close()
+
+
+if __name__ == "__main__":
+    test_bad_rows_are_reported_and_skipped()
+    test_large_import_keeps_search_in_step()
+    test_failed_batch_keeps_earlier_batches_and_resumes_search()
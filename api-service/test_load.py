@@ -0,0 +1,83 @@
+"""
+Load test for the /chat pipeline
+Fires hundreds of concurrent customer messages at the app while every LLM
+call is artificially slow, and checks that p99 latency stays close to a
+single LLM round-trip instead of growing with the queue.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+import pytest
+
+import main
+from ai_handler import MetaAIHandler
+from database import Database
+
+LLM_DELAY = 0.5        # seconds per simulated Groq call
+CONCURRENT_CHATS = 200
+
+
+async def slow_groq(request: httpx.Request) -> httpx.Response:
+    """Stub Groq endpoint that takes LLM_DELAY seconds to answer"""
+    await asyncio.sleep(LLM_DELAY)
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": "We have Paracetamol in stock 💊"}}]
+    })
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(concurrency: int):
+    """Send `concurrency` chats at once and return per-request latencies"""
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+        async def one_chat(i: int) -> float:
+            start = time.perf_counter()
+            response = await client.post("/chat", json={
+                "phone_number": f"234800000{i:04d}",
+                "message": "Which paracetamol is best for a child?",
+                "is_admin": False,
+                "timestamp": "",
+            })
+            assert response.status_code == 200
+            return time.perf_counter() - start
+
+        return await asyncio.gather(*(one_chat(i) for i in range(concurrency)))
+
+
+def test_chat_latency_under_slow_llm():
+    with tempfile.TemporaryDirectory() as tmp, pytest.MonkeyPatch.context() as patch:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        handler = MetaAIHandler(http_client=httpx.AsyncClient(transport=httpx.MockTransport(slow_groq)))
+        handler.GROQ_API_KEY = "test-key"
+        patch.setattr(main, "db", db)
+        patch.setattr(main, "ai_handler", handler)
+
+        try:
+            single = asyncio.run(run_load(1))[0]
+            latencies = asyncio.run(run_load(CONCURRENT_CHATS))
+        finally:
+            db.close()
+
+        p50 = percentile(latencies, 50)
+        p99 = percentile(latencies, 99)
+        print(f"\n📊 {CONCURRENT_CHATS} concurrent chats, LLM delay {LLM_DELAY}s")
+        print(f"   single: {single * 1000:.0f}ms  p50: {p50 * 1000:.0f}ms  p99: {p99 * 1000:.0f}ms")
+
+        # Serialised on the event loop this would take CONCURRENT_CHATS * LLM_DELAY
+        assert p99 < LLM_DELAY * 4
+        assert p99 < single * 4
+
+
+if __name__ == "__main__":
+    test_chat_latency_under_slow_llm()
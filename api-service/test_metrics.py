@@ -0,0 +1,101 @@
+"""
+/metrics endpoint test
+Sends a chat through the app with a stubbed LLM, then checks the scrape
+has per-stage, SQL, provider and cache series in valid Prometheus text,
+and that recording an observation is cheap enough to leave on.
+"""
+
+import asyncio
+import os
+import re
+import tempfile
+import time
+
+import httpx
+import pytest
+
+import main
+import metrics
+from ai_handler import MetaAIHandler
+from database import Database
+
+SAMPLE_LINE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? [0-9.e+-]+$')
+
+
+async def groq(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": "We have Paracetamol 💊"}}]})
+
+
+async def chat_then_scrape() -> str:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for _ in range(2):
+            response = await client.post("/chat", json={
+                "phone_number": "234800000001", "message": "Which paracetamol is best for a child?",
+                "is_admin": False, "timestamp": "",
+            })
+            assert response.status_code == 200
+        # Answered by the local router, no LLM call
+        routed = await client.post("/chat", json={
+            "phone_number": "234800000001", "message": "How much is paracetamol?",
+            "is_admin": False, "timestamp": "",
+        })
+        assert routed.json()["reply"].startswith("💰")
+        scrape = await client.get("/metrics")
+        assert scrape.headers["content-type"].startswith("text/plain")
+        return scrape.text
+
+
+def value(text: str, series: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{series} missing from /metrics")
+
+
+def test_scrape_covers_the_chat_pipeline():
+    with tempfile.TemporaryDirectory() as tmp, pytest.MonkeyPatch.context() as patch:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        handler = MetaAIHandler(http_client=httpx.AsyncClient(transport=httpx.MockTransport(groq)))
+        handler.GROQ_API_KEY = "test-key"
+        patch.setattr(main, "db", db)
+        patch.setattr(main, "ai_handler", handler)
+        hits_before = metrics.CACHE_LOOKUPS.labels("response", "hit").value
+
+        try:
+            text = asyncio.run(chat_then_scrape())
+        finally:
+            db.close()
+
+    for line in text.splitlines():
+        assert line.startswith("# ") or SAMPLE_LINE.match(line), line
+
+    for stage in ("log_conversation", "context_lookup", "build_context", "llm", "cart_parse"):
+        assert value(text, f'pharmacy_chat_stage_seconds_count{{stage="{stage}"}}') >= 1
+    assert value(text, 'pharmacy_db_query_seconds_count{query="log_conversation"}') >= 2
+    assert value(text, 'pharmacy_llm_outcomes_total{provider="groq",outcome="ok"}') >= 1
+    assert value(text, 'pharmacy_cache_lookups_total{cache="response",result="hit"}') >= hits_before + 1
+    assert value(text, 'pharmacy_http_request_seconds_count{method="POST",route="/chat",status="200"}') >= 3
+    assert value(text, 'pharmacy_chat_routes_total{route="llm"}') >= 2
+    assert value(text, 'pharmacy_chat_routes_total{route="price"}') >= 1
+
+
+def test_observation_overhead():
+    histogram = metrics.Histogram("test_overhead_seconds", "overhead probe", ("stage",))
+    child = histogram.labels("probe")
+    runs = 100_000
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        child.observe(0.003)
+    per_call = (time.perf_counter() - start) / runs
+
+    print(f"\n⏱️ {per_call * 1e6:.2f}µs per observation")
+    assert per_call < 10e-6
+    metrics.REGISTRY.remove(histogram)
+
+
+if __name__ == "__main__":
+    test_scrape_covers_the_chat_pipeline()
+    test_observation_overhead()
@@ -0,0 +1,161 @@
+"""
+Provider scheduling test
+Drives MetaAIHandler against mock Groq and HuggingFace endpoints. Failures
+of either provider trip its circuit breaker, a half-open trial always
+resolves (so a provider is never disabled for good), slow calls are
+hedged, and the reply deadline falls back to the rule-based answer.
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from ai_handler import MetaAIHandler
+from provider_health import CircuitBreaker
+
+INVENTORY = [{"drug_name": "paracetamol", "quantity": 150, "price": 500,
+              "category": "fever/pain", "description": "For fever and pain relief"}]
+
+
+def groq_reply(text: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+
+def make_handler(route, groq: bool = True, huggingface: bool = True) -> MetaAIHandler:
+    """Handler whose HTTP calls go to route(provider, request) -> Response"""
+    async def dispatch(request: httpx.Request) -> httpx.Response:
+        provider = "huggingface" if request.url.host == "hf.test" else "groq"
+        return await route(provider, request)
+
+    handler = MetaAIHandler(http_client=httpx.AsyncClient(transport=httpx.MockTransport(dispatch)))
+    handler.stream_responses = False
+    handler.GROQ_API_URL = "https://groq.test/chat"
+    handler.GROQ_API_KEY = "test-key" if groq else None
+    handler.use_huggingface = huggingface
+    handler.hf_api_url = "https://hf.test/model"
+    handler.hf_token = "test-token"
+    return handler
+
+
+def run(handler: MetaAIHandler, coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await handler.aclose()
+    return asyncio.run(main())
+
+
+def test_breaker_cycle():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=0.05)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == breaker.OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow()  # one trial at a time
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED and breaker.allow()
+
+    breaker.record_failure(retry_after=0.01)  # honoured at once, at least 1s
+    assert breaker.state == breaker.OPEN and breaker.opened_until - time.monotonic() > 0.9
+
+
+def test_huggingface_failures_trip_and_recover():
+    statuses = [503, 503, 500, 429, 200, 200]
+
+    async def route(provider, request):
+        status = statuses.pop(0)
+        if status == 429:
+            return httpx.Response(429, headers={"retry-after": "5"})
+        if status == 200:
+            return httpx.Response(200, json=[{"generated_text": "HuggingFace says hi 😊"}])
+        return httpx.Response(status, text="busy")
+
+    handler = make_handler(route, groq=False)
+    health = handler.providers["huggingface"]
+    health.breaker.failure_threshold = 3
+
+    async def calls():
+        replies = []
+        for _ in range(3):
+            replies.append(await handler._schedule_providers("CUSTOMER: hi"))
+        assert health.breaker.state == health.breaker.OPEN
+        replies.append(await handler._schedule_providers("CUSTOMER: hi"))  # skipped while open
+
+        health.breaker.opened_until = 0  # cooldown over: a failed trial re-opens...
+        replies.append(await handler._schedule_providers("CUSTOMER: hi"))
+        assert health.breaker.state == health.breaker.OPEN
+        assert health.breaker.opened_until - time.monotonic() > 4  # ...for Retry-After
+
+        health.breaker.opened_until = 0  # ...and the next trial is still allowed
+        replies.append(await handler._schedule_providers("CUSTOMER: hi"))
+        return replies
+
+    replies = run(handler, calls())
+    assert replies == [None] * 5 + ["HuggingFace says hi 😊"]
+    assert health.breaker.state == health.breaker.CLOSED
+    assert health.outcomes == {"unavailable": 2, "error": 1, "rate_limited": 1, "ok": 1}
+
+
+def test_slow_primary_is_hedged():
+    async def route(provider, request):
+        if provider == "groq":
+            await asyncio.sleep(1.0)
+            return groq_reply("Groq says hi 😊")
+        return httpx.Response(200, json=[{"generated_text": "HuggingFace says hi 😊"}])
+
+    handler = make_handler(route)
+    handler.providers["groq"].default_hedge_delay = 0.05
+
+    reply = run(handler, handler._schedule_providers("CUSTOMER: hi"))
+    assert reply == "HuggingFace says hi 😊"
+    assert handler.scheduler_stats == {"hedged": 1, "deadline_fallbacks": 0}
+    assert handler.providers["groq"].outcomes == {}  # cancelled, not a failure
+    assert handler.providers["huggingface"].outcomes == {"ok": 1}
+
+
+def test_deadline_falls_back_to_rules():
+    async def route(provider, request):
+        await asyncio.sleep(1.0)
+        return groq_reply("too late")
+
+    handler = make_handler(route, huggingface=False)
+    handler.reply_deadline = 0.1
+
+    reply = run(handler, handler.generate_response("how much is paracetamol", {}, INVENTORY))
+    assert "Paracetamol" in reply and "500" in reply
+    assert handler.scheduler_stats["deadline_fallbacks"] == 1
+    assert handler.providers["groq"].outcomes == {"timeout": 1}
+
+
+def test_every_finished_call_is_recorded():
+    handler = make_handler(None)
+    handler.providers["groq"].default_hedge_delay = 0
+    release = asyncio.Event()
+
+    async def answer(context):
+        await release.wait()
+        return "hi 😊"
+
+    async def both_finish_together():
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        return await handler._schedule_providers("CUSTOMER: hi")
+
+    handler._generate_groq_response = answer
+    handler._generate_huggingface = answer
+    # A half-open trial that succeeds second must still close its breaker
+    handler.providers["huggingface"].breaker.state = CircuitBreaker.OPEN
+
+    assert run(handler, both_finish_together()) == "hi 😊"
+    for health in handler.providers.values():
+        assert health.outcomes == {"ok": 1}
+        assert health.breaker.state == CircuitBreaker.CLOSED and not health.breaker.trial_in_flight
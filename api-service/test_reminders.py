@@ -0,0 +1,117 @@
+"""
+Medication reminder queue test
+Walks a checked-out course of treatment day by day: a daily reminder for
+each day of the course, a completion message the day after, a check-up
+three days after, then nothing. Marking a reminder twice must not skip
+ahead, and a sender that crashes mid-run gets exactly the unacknowledged
+reminders again.
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import date, timedelta
+
+import httpx
+import pytest
+
+import main
+from database import Database
+
+
+def run_days(db: Database, start: date, days: int):
+    sent = []
+    for offset in range(days):
+        today = start + timedelta(days=offset)
+        due = db.get_due_reminders(today)
+        assert db.mark_reminders_sent(due, today) == len(due)
+        # A second cron tick the same day finds nothing new
+        assert db.get_due_reminders(today) == []
+        sent.append([r['reminder_type'] for r in due])
+    return sent
+
+
+def test_course_of_reminders():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        db.update_inventory("coartem", 10, 2500, "malaria", dosage_days=2, dosage_frequency="Twice daily")
+        assert db.add_to_cart("234800000001", "coartem", 1)
+        assert not db.checkout("234800000001")['short']
+
+        sent = run_days(db, date.today(), 7)
+
+        assert sent == [["daily"], ["daily"], ["daily"], ["completion"], [], ["checkup"], []]
+        conn = db.get_connection()
+        purchase = conn.execute("SELECT completed, reminders_sent FROM purchases").fetchone()
+        schedule = conn.execute("SELECT COUNT(*) FROM reminder_schedule").fetchone()[0]
+        db.release_connection(conn)
+        assert (purchase['completed'], purchase['reminders_sent']) == (1, 5)
+        assert schedule == 0
+        db.close()
+
+
+def test_marking_twice_is_harmless():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        db.record_purchase("234800000002", "paracetamol", 1, 500)
+        today = date.today()
+
+        due = db.get_due_reminders(today)
+        assert len(due) == 1
+        assert db.mark_reminders_sent(due, today) == 1
+        assert db.mark_reminders_sent(due, today) == 0
+
+        tomorrow = db.get_due_reminders(today + timedelta(days=1))
+        assert [r['next_due_at'] for r in tomorrow] == [str(today + timedelta(days=1))]
+        db.close()
+
+
+async def crash_after_first_page(client: httpx.AsyncClient):
+    """Page through the feed, acknowledging only the first page"""
+    page = (await client.get("/medication-reminders", params={"limit": 2})).json()
+    ack_ids = [r['ack_id'] for r in page['reminders']]
+    first = await client.post("/medication-reminders/ack", json={"ack_ids": ack_ids})
+    again = await client.post("/medication-reminders/ack", json={"ack_ids": ack_ids})
+
+    rest = []
+    cursor = page['next_cursor']
+    while cursor:
+        page = (await client.get("/medication-reminders", params={"limit": 2, "cursor": cursor})).json()
+        rest += [r['purchase_id'] for r in page['reminders']]
+        cursor = page['next_cursor']
+
+    # The sender crashes here; a fresh run starts without a cursor
+    retry = (await client.get("/medication-reminders")).json()
+    return first.json(), again.json(), rest, [r['purchase_id'] for r in retry['reminders']]
+
+
+def test_paged_feed_resumes_after_crash():
+    with tempfile.TemporaryDirectory() as tmp, pytest.MonkeyPatch.context() as patch:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        patch.setattr(main, "db", db)
+        for i in range(5):
+            db.record_purchase(f"23480000000{i}", "paracetamol", 1, 500)
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await crash_after_first_page(client)
+
+        try:
+            first, again, rest, retry = asyncio.run(run())
+        finally:
+            db.close()
+
+        assert first == {"acknowledged": 2, "invalid": []}
+        assert again == {"acknowledged": 0, "invalid": []}
+        assert rest == [3, 4, 5]
+        assert retry == [3, 4, 5]
+
+
+if __name__ == "__main__":
+    test_course_of_reminders()
+    test_marking_twice_is_harmless()
+    test_paged_feed_resumes_after_crash()
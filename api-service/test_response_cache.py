@@ -0,0 +1,82 @@
+"""
+Response cache test
+Repeated questions against the same stock and prices reuse the provider
+reply; a stock or price change shown in the prompt, a different customer
+message or an expired entry goes back to the provider. The cache is an
+LRU bounded by max_size.
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from ai_handler import MetaAIHandler, ResponseCache
+
+INVENTORY = [
+    {"drug_name": "paracetamol", "quantity": 150, "price": 500, "category": "fever/pain", "description": ""},
+    {"drug_name": "ibuprofen", "quantity": 120, "price": 600, "category": "pain", "description": ""},
+]
+
+
+def test_repeats_hit_until_the_prompt_changes():
+    calls = []
+
+    async def groq(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": f"Reply number {len(calls)}"}}]})
+
+    handler = MetaAIHandler(http_client=httpx.AsyncClient(transport=httpx.MockTransport(groq)))
+    handler.GROQ_API_KEY = "test-key"
+    handler.stream_responses = False
+
+    async def ask(message, inventory):
+        return await handler.generate_response(message, {}, inventory)
+
+    async def conversation():
+        try:
+            first = await ask("Do you have paracetamol?", INVENTORY)
+            # Case and spacing do not make a new question
+            again = await ask("do you have   PARACETAMOL?", INVENTORY)
+            other = await ask("Do you have ibuprofen?", INVENTORY)
+            sold_one = [dict(INVENTORY[0], quantity=149), INVENTORY[1]]
+            after_sale = await ask("Do you have paracetamol?", sold_one)
+            return first, again, other, after_sale
+        finally:
+            await handler.aclose()
+
+    first, again, other, after_sale = asyncio.run(conversation())
+    assert first == again == "Reply number 1"
+    assert other == "Reply number 2"
+    assert after_sale == "Reply number 3"
+    assert len(calls) == 3
+    assert handler.response_cache.stats()["hits"] == 1
+
+
+def test_entries_expire():
+    cache = ResponseCache(ttl=0.05)
+    cache.put(b"key", "reply")
+    assert cache.get(b"key") == "reply"
+    time.sleep(0.06)
+    assert cache.get(b"key") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["size"]) == (1, 1, 1, 0)
+
+
+def test_least_recently_used_is_evicted():
+    cache = ResponseCache(max_size=2)
+    cache.put(b"a", "A")
+    cache.put(b"b", "B")
+    assert cache.get(b"a") == "A"  # b is now the oldest
+    cache.put(b"c", "C")
+    assert cache.get(b"b") is None
+    assert (cache.get(b"a"), cache.get(b"c")) == ("A", "C")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_key_covers_role_and_prompt_background():
+    context = "INVENTORY:\n- Paracetamol: 150 units @ ₦500\n\nCUSTOMER: price?"
+    key = ResponseCache.make_key(False, "price?", context)
+    assert key == ResponseCache.make_key(False, "Price ?", context.replace("price?", "Price ?"))
+    assert key != ResponseCache.make_key(True, "price?", context)
+    assert key != ResponseCache.make_key(False, "price?", context.replace("150", "149"))
@@ -0,0 +1,161 @@
+"""
+Conversation retention test
+Archiving moves old messages into monthly archive files without changing
+anything the bot reads: every customer's recent history, the hourly message
+rollup and the weekly stats are identical before and after. Every message
+survives in exactly one place, runs are idempotent, freed pages are
+returned to the filesystem, and only one worker claims each run.
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+import pytest
+
+from database import Database
+
+OLD, NEWER = "2025-03", "2025-04"
+
+
+def stamp(days_ago: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - days_ago * 86400))
+
+
+def fill(db: Database):
+    rows = []
+    # A regular: 40 old messages over two months and a couple this week
+    for i in range(40):
+        month = OLD if i < 25 else NEWER
+        rows.append(("234800000001", f"old message {i} " + "x" * 200, False, f"{month}-{i % 25 + 1:02d} 10:00:00"))
+    rows += [("234800000001", f"recent {i}", False, stamp(1 + i)) for i in range(2)]
+    # Went quiet long ago: their last 10 messages stay hot however old they are
+    rows += [("234800000002", f"lapsed {i}", False, f"{OLD}-0{i + 1} 09:00:00") for i in range(6)]
+    rows += [("234800000099", f"admin {i}", True, f"{NEWER}-0{i + 1} 08:00:00") for i in range(3)]
+    db._write_conversations(rows)
+    return len(rows)
+
+
+def snapshot(db: Database):
+    conn = db.get_connection()
+    try:
+        hourly = [tuple(row) for row in conn.execute("SELECT * FROM messages_hourly ORDER BY 1")]
+    finally:
+        db.release_connection(conn)
+    db.sessions.clear()
+    histories = {phone: db.get_customer_history(phone)['conversations']
+                 for phone in ("234800000001", "234800000002", "234800000099")}
+    return hourly, histories, db.get_weekly_stats()
+
+
+def count(path: str) -> int:
+    archive = sqlite3.connect(path)
+    try:
+        return archive.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+    finally:
+        archive.close()
+
+
+def test_archive_keeps_what_the_bot_reads():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        total = fill(db)
+        before = snapshot(db)
+
+        result = db.retention.run()
+        assert snapshot(db) == before
+
+        # The regular's 40 old rows minus the 8 still in their last 10; nothing
+        # from the lapsed customer or the admin (fewer than 10 each)
+        assert result['archived'] == 32
+        conn = db.get_connection()
+        assert conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0] == total - 32
+        db.release_connection(conn)
+        assert count(db.retention.archive_path(OLD)) == 25
+        assert count(db.retention.archive_path(NEWER)) == 7
+        assert result['pages_freed'] > 0
+
+        # Nothing left to do
+        assert db.retention.run() == {"archived": 0, "pages_freed": 0}
+        db.close()
+
+
+class FailingDelete:
+    """A pooled connection whose DELETE batch fails"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def executemany(self, *args):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def test_interrupted_run_is_repeated_safely():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        fill(db)
+
+        # The first batch is copied, then its delete fails
+        acquire, calls = db.get_connection, []
+
+        def get_connection():
+            calls.append(None)
+            return FailingDelete(acquire()) if len(calls) == 2 else acquire()
+
+        db.get_connection = get_connection
+        with pytest.raises(sqlite3.OperationalError):
+            db.retention.archive()
+        db.get_connection = acquire
+        assert count(db.retention.archive_path(OLD)) == 25
+
+        assert db.retention.archive() == 32
+        assert count(db.retention.archive_path(OLD)) + count(db.retention.archive_path(NEWER)) == 32
+        db.close()
+
+
+def test_existing_database_switches_only_on_request():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        # A file from before retention existed
+        conn = db.get_connection()
+        conn.execute("PRAGMA auto_vacuum = NONE")
+        conn.execute("VACUUM")
+        db.release_connection(conn)
+        fill(db)
+        db.retention.archive()
+
+        def auto_vacuum():
+            conn = db.get_connection()
+            try:
+                return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            finally:
+                db.release_connection(conn)
+
+        # The scheduled run never rewrites the whole file
+        assert db.retention.compact() == 0
+        assert auto_vacuum() == 0
+
+        assert db.retention.enable_incremental_vacuum() > 0
+        assert auto_vacuum() == 2
+        db.close()
+
+
+def test_one_worker_claims_each_run():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pharmacy.db")
+        first, second = Database(path), Database(path)
+        first.initialize()
+        assert first.retention._claim()
+        assert not second.retention._claim()
+
+        second.retention.interval = 0
+        assert second.retention._claim()
+        first.close()
+        second.close()
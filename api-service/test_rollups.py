@@ -0,0 +1,101 @@
+"""
+Analytics rollup test
+Rollups maintained by triggers must always equal a fresh aggregation of
+the raw purchases and conversations, whether rows arrived through
+checkout, record_purchase, logging or the migration backfill.
+"""
+
+import os
+import tempfile
+
+from database import Database
+
+ROLLUPS = {
+    "sales_daily": """
+        SELECT date(purchase_date), drug_name, COUNT(*), SUM(quantity), SUM(amount),
+               SUM(dosage_days > 0), SUM(dosage_days > 0 AND completed = 1)
+        FROM purchases GROUP BY 1, 2 ORDER BY 1, 2
+    """,
+    "customer_purchases": """
+        SELECT phone_number, COUNT(*), date(MIN(purchase_date)), date(MAX(purchase_date))
+        FROM purchases GROUP BY 1 ORDER BY 1
+    """,
+    "messages_hourly": """
+        SELECT strftime('%Y-%m-%d %H:00', timestamp), SUM(is_admin = 0), SUM(is_admin = 1)
+        FROM conversations GROUP BY 1 ORDER BY 1
+    """,
+}
+
+
+def assert_rollups_match(db: Database):
+    conn = db.get_connection()
+    try:
+        for table, expected in ROLLUPS.items():
+            rollup = [tuple(row) for row in conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2")]
+            raw = [tuple(row) for row in conn.execute(expected)]
+            assert rollup == raw, table
+    finally:
+        db.release_connection(conn)
+
+
+def fill(db: Database):
+    db.update_inventory("coartem", 40, 2500, "malaria", dosage_days=3, dosage_frequency="Twice daily")
+    for i in range(4):
+        phone = f"23480000000{i}"
+        db.log_conversation(phone, "hello", False)
+        db.add_to_cart(phone, "coartem", 2)
+        db.add_to_cart(phone, "paracetamol", 1)
+        assert not db.checkout(phone)['short']
+    db.record_purchase("234800000000", "coartem", 1, 2500)
+    db.log_conversation("234800000099", "weekly report", True)
+
+    conn = db.get_connection()
+    conn.execute("UPDATE purchases SET completed = 1 WHERE drug_name = 'coartem' AND phone_number < '234800000002'")
+    conn.commit()
+    db.release_connection(conn)
+
+
+def test_rollups_track_writes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        fill(db)
+
+        assert_rollups_match(db)
+
+        stats = db.get_weekly_stats()
+        assert stats['total_purchases'] == 9
+        assert stats['unique_customers'] == 4
+        assert stats['top_drug'] == "Coartem"
+        assert stats['total_messages'] == 5
+        assert stats['total_revenue'] == 4 * (2 * 2500 + 500) + 2500
+
+        analytics = db.get_predictive_analytics()
+        assert analytics['retention_metrics']['returning_customers'] == 4
+        assert analytics['adherence_metrics']['completed_treatments'] == 3
+        assert analytics['peak_hours'][0]['message_count'] == 4
+        db.close()
+
+
+def test_backfill_matches_history():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        fill(db)
+
+        # Pretend the history predates the rollups
+        conn = db.get_connection()
+        for table in ROLLUPS:
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("PRAGMA user_version = 4")
+        conn.commit()
+        db.release_connection(conn)
+
+        db.migrate()
+        assert_rollups_match(db)
+        db.close()
+
+
+if __name__ == "__main__":
+    test_rollups_track_writes()
+    test_backfill_matches_history()
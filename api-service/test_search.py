@@ -0,0 +1,78 @@
+"""
+Inventory search test
+search_inventory finds drugs through typos and prefixes, ranks name
+matches above category and description matches, and stays in step with
+inventory through the FTS triggers when rows are updated or deleted.
+"""
+
+import os
+import tempfile
+
+from database import Database
+
+
+def names(rows):
+    return [row['drug_name'] for row in rows]
+
+
+def make_db(tmp: str) -> Database:
+    db = Database(os.path.join(tmp, "pharmacy.db"))
+    db.initialize()
+    db.update_inventory("panadol extra", 30, 900, "fever/pain", "Paracetamol with caffeine")
+    return db
+
+
+def test_typos_and_prefixes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_db(tmp)
+        assert names(db.search_inventory("paracetmol"))[0] == "paracetamol"
+        assert names(db.search_inventory("ibuprofin")) == ["ibuprofen"]
+        assert names(db.search_inventory("amox")) == ["amoxicillin"]
+        assert names(db.search_inventory("cough syr")) == ["cough syrup"]
+        # Words that match nothing are dropped rather than emptying the result
+        assert set(names(db.search_inventory("something for malaria"))) == {"chloroquine", "artemether", "coartem"}
+        assert db.search_inventory("zzzz") == []
+        db.close()
+
+
+def test_name_matches_rank_first():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_db(tmp)
+        # Both mention paracetamol; only one is named after it
+        assert names(db.search_inventory("paracetamol")) == ["paracetamol", "panadol extra"]
+        # Category and description matches count too, a name match the most
+        assert set(names(db.search_inventory("pain"))) == {"paracetamol", "ibuprofen", "panadol extra"}
+        assert len(db.search_inventory("malaria", limit=2)) == 2
+        db.close()
+
+
+def test_every_match_without_a_limit():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_db(tmp)
+        db.bulk_upsert_inventory((f"antimalarial {i}", 10, 100, "malaria", "", 3, "Once daily") for i in range(30))
+        # 30 new rows plus chloroquine, artemether and coartem
+        assert len(db.search_inventory("malaria")) == 33
+        assert len(db.search_inventory("malaria", limit=5)) == 5
+        db.close()
+
+
+def test_triggers_follow_updates_and_deletes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_db(tmp)
+        db.update_inventory("panadol extra", 30, 900, "analgesic", "Headache tablets")
+        assert names(db.search_inventory("caffeine")) == []
+        assert names(db.search_inventory("analgesc")) == ["panadol extra"]
+
+        conn = db.get_connection()
+        conn.execute("DELETE FROM inventory WHERE drug_name = 'panadol extra'")
+        conn.commit()
+        db.release_connection(conn)
+        db.inventory_cache.invalidate()
+        assert db.search_inventory("headache") == []
+
+        conn = db.get_connection()
+        fts_rows = conn.execute("SELECT COUNT(*) FROM inventory_fts").fetchone()[0]
+        inventory_rows = conn.execute("SELECT COUNT(*) FROM inventory").fetchone()[0]
+        db.release_connection(conn)
+        assert fts_rows == inventory_rows
+        db.close()
@@ -0,0 +1,107 @@
+"""
+Customer session cache test
+A multi-message exchange (chat, add to cart, view cart, checkout) loads the
+session once and then stays correct by write-through alone: every read
+matches what a cold Database sees on disk. Sessions are bounded, expire
+when idle, and a load racing a write is never cached.
+"""
+
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from database import CustomerSession, Database, SessionCache
+
+PHONE = "234800000001"
+
+
+def cold_read(path: str):
+    fresh = Database(path)
+    try:
+        return fresh.get_customer_history(PHONE), fresh.get_cart(PHONE)
+    finally:
+        fresh.close()
+
+
+def test_exchange_is_served_by_write_through():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pharmacy.db")
+        db = Database(path)
+        db.initialize()
+        db.update_inventory("coartem", 40, 2500, "malaria", dosage_days=3, dosage_frequency="Twice daily")
+        db.record_purchase(PHONE, "paracetamol", 2, 1000)
+
+        loads = []
+        load = db._load_session
+        db._load_session = lambda phone: loads.append(phone) or load(phone)
+
+        db.log_conversation(PHONE, "do you have coartem?", False)
+        db.get_customer_history(PHONE)
+        assert db.add_to_cart(PHONE, "coartem", 1)
+        assert db.add_to_cart(PHONE, "paracetamol", 2)
+        assert db.add_to_cart(PHONE, "coartem", 1)
+        db.log_conversation(PHONE, "add 1 more coartem", False)
+        assert [(i['drug_name'], i['quantity']) for i in db.get_cart(PHONE)] == [("coartem", 2), ("paracetamol", 2)]
+
+        # Price changes reach the cached cart through the inventory snapshot
+        db.update_inventory("coartem", 40, 3000, "malaria", dosage_days=3, dosage_frequency="Twice daily")
+        assert db.get_cart(PHONE)[0]['price'] == 3000
+
+        db.conversation_log.flush()
+        assert (db.get_customer_history(PHONE), db.get_cart(PHONE)) == cold_read(path)
+
+        assert not db.checkout(PHONE)['short']
+        db.log_conversation(PHONE, "thanks", False)
+        history, cart = db.get_customer_history(PHONE), db.get_cart(PHONE)
+        assert cart == []
+        assert {p['drug_name'] for p in history['purchases'][:2]} == {"coartem", "paracetamol"}
+
+        db.conversation_log.flush()
+        cold_history, cold_cart = cold_read(path)
+        assert cold_cart == cart
+        assert history['conversations'] == cold_history['conversations']
+        # Same second purchases have no defined order in SQL; compare as sets
+        key = lambda p: tuple(sorted(p.items()))
+        assert sorted(map(key, history['purchases'])) == sorted(map(key, cold_history['purchases']))
+
+        assert loads == [PHONE]
+        db.close()
+
+
+def test_checkup_drops_the_session():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "pharmacy.db"))
+        db.initialize()
+        db.record_purchase(PHONE, "paracetamol", 1, 500)
+        today = date.today()
+        for offset in range(10):
+            day = today + timedelta(days=offset)
+            db.mark_reminders_sent(db.get_due_reminders(day), day)
+            if offset == 0:
+                assert db.get_customer_history(PHONE)['purchases'][0]['completed'] == 0
+
+        assert db.get_customer_history(PHONE)['purchases'][0]['completed'] == 1
+        db.close()
+
+
+def test_bounded_lru_with_idle_expiry():
+    cache = SessionCache(max_size=2, idle_ttl=0.05)
+
+    def install(phone):
+        cache.finish_load(phone, cache.begin_load(phone), CustomerSession([], [], []))
+
+    for phone in ("a", "b", "c"):
+        install(phone)
+    assert len(cache) == 2 and cache.get("a") is None
+
+    time.sleep(0.06)
+    assert cache.get("b") is None and cache.get("c") is None
+
+
+def test_load_racing_a_write_is_not_cached():
+    cache = SessionCache()
+    marker = cache.begin_load(PHONE)
+    cache.update(PHONE, lambda session: session.cart.clear())  # commits while we read
+    cache.finish_load(PHONE, marker, CustomerSession([], [], [["coartem", 1]]))
+    assert cache.get(PHONE) is None
@@ -0,0 +1,126 @@
+"""
+Streaming reply test against a local SSE stub
+The stub streams a long Groq-style completion a few characters at a time.
+The handler should clean artifacts that arrive split across chunks, stop
+at a sentence end once the reply is long enough (or a word end when
+there is none), and hang up before the stub has sent everything.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ai_handler import MetaAIHandler
+
+SENTENCE = "Paracetamol is available at ₦500 per pack. "
+FULL_REPLY = "Assistant: Hello! 😊\n\n\n\n" + SENTENCE * 60
+
+
+class StubSSEHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"  # body ends when the connection closes
+    chunks = []
+    sent = 0
+    aborted = threading.Event()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        assert request["stream"] is True
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        try:
+            for chunk in self.chunks:
+                event = {"choices": [{"delta": {"content": chunk}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+                StubSSEHandler.sent += 1
+                time.sleep(0.002)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            StubSSEHandler.aborted.set()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(text: str, chunk_size: int = 7):
+    StubSSEHandler.chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    StubSSEHandler.sent = 0
+    StubSSEHandler.aborted = threading.Event()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSSEHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+
+async def ask(handler: MetaAIHandler) -> str:
+    try:
+        return await handler.generate_response("Do you have paracetamol?", {}, [])
+    finally:
+        await handler.aclose()
+
+
+def make_handler(url: str) -> MetaAIHandler:
+    handler = MetaAIHandler()
+    handler.GROQ_API_URL = url
+    handler.GROQ_API_KEY = "test-key"
+    handler.reply_soft_chars = 200
+    handler.reply_max_chars = 400
+    return handler
+
+
+def test_stream_stops_at_sentence_after_soft_limit():
+    server, url = start_stub(FULL_REPLY)
+    try:
+        handler = make_handler(url)
+        reply = asyncio.run(ask(handler))
+
+        print(f"\n✂️ {len(reply)} chars kept, {StubSSEHandler.sent}/{len(StubSSEHandler.chunks)} chunks sent")
+        assert reply.startswith("Hello! 😊\n\nParacetamol")
+        assert "Assistant:" not in reply
+        assert "\n\n\n" not in reply
+        assert 200 <= len(reply) <= 400
+        assert reply.endswith(".")
+        assert handler.stream_stats["cut_early"] == 1
+
+        # The stub notices the hang-up instead of streaming all 60 sentences
+        assert StubSSEHandler.aborted.wait(5)
+        assert StubSSEHandler.sent < len(StubSSEHandler.chunks)
+    finally:
+        server.shutdown()
+
+
+def test_reply_without_sentences_stops_between_words():
+    words = "paracetamol ibuprofen and vitamin c for fever " * 40
+    server, url = start_stub(words)
+    try:
+        handler = make_handler(url)
+        reply = asyncio.run(ask(handler))
+
+        assert len(reply) <= 400
+        assert words.startswith(reply)
+        assert words[len(reply)] == " "  # the last word is whole
+        assert handler.stream_stats["cut_early"] == 1
+    finally:
+        server.shutdown()
+
+
+def test_short_stream_is_read_to_the_end():
+    server, url = start_stub("AI: Yes, we have Paracetamol in stock 💊")
+    try:
+        handler = make_handler(url)
+        reply = asyncio.run(ask(handler))
+
+        assert reply == "Yes, we have Paracetamol in stock 💊"
+        assert handler.stream_stats["cut_early"] == 0
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_stream_stops_at_sentence_after_soft_limit()
+    test_reply_without_sentences_stops_between_words()
+    test_short_stream_is_read_to_the_end()
@@ -0,0 +1,178 @@
+"""
+Multi-process test
+Starts several worker processes on one fresh pharmacy.db at the same
+time, as uvicorn --workers would. Startup must not double-apply
+migrations or seed data. Every worker warms its own inventory snapshot
+and customer session, then the others write through their own Database.
+All views must converge within a few poll intervals, and racing
+checkouts across processes must never oversell.
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+
+from database import Database
+
+WORKERS = 3
+PHONE = "234800000001"
+
+
+def serve(path: str, pipe):
+    """Worker process: run Database calls sent over the pipe"""
+    db = Database(path)
+    db.initialize()
+    db.sync.start()
+    pipe.send("ready")
+    while True:
+        command, args = pipe.recv()
+        if command == "stop":
+            break
+        target = db
+        for attribute in command.split("."):
+            target = getattr(target, attribute)
+        pipe.send(target(*args))
+    db.close()
+    pipe.send("stopped")
+
+
+class Workers:
+    def __init__(self, path: str, count: int):
+        context = multiprocessing.get_context("spawn")
+        self.pipes, self.processes = [], []
+        for _ in range(count):
+            parent, child = context.Pipe()
+            process = context.Process(target=serve, args=(path, child), daemon=True)
+            process.start()
+            self.pipes.append(parent)
+            self.processes.append(process)
+        assert [pipe.recv() for pipe in self.pipes] == ["ready"] * count
+
+    def call(self, worker: int, command: str, *args):
+        self.pipes[worker].send((command, args))
+        return self.pipes[worker].recv()
+
+    def call_all(self, command: str, *args):
+        """Same call on every worker at once"""
+        for pipe in self.pipes:
+            pipe.send((command, args))
+        return [pipe.recv() for pipe in self.pipes]
+
+    def stop(self):
+        for pipe in self.pipes:
+            pipe.send(("stop", ()))
+            assert pipe.recv() == "stopped"
+        for process in self.processes:
+            process.join(timeout=10)
+
+
+def converge(workers: Workers, view, expected, timeout: float = 5.0):
+    """Wait until view(worker) == expected on every worker"""
+    deadline = time.monotonic() + timeout
+    while True:
+        seen = [view(worker) for worker in range(WORKERS)]
+        if all(value == expected for value in seen):
+            return
+        assert time.monotonic() < deadline, seen
+        time.sleep(0.02)
+
+
+def price(workers: Workers, worker: int, drug: str):
+    return {row['drug_name']: row['price'] for row in workers.call(worker, "get_inventory")}.get(drug)
+
+
+def test_workers_share_one_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pharmacy.db")
+        workers = Workers(path, WORKERS)
+        try:
+            # Concurrent startup: one schema, one copy of the seed data
+            assert workers.call_all("schema_version") == [Database(path).schema_version()] * WORKERS
+            assert [len(rows) for rows in workers.call_all("get_inventory")] == [8] * WORKERS
+
+            # Warm every worker's snapshot and session
+            workers.call_all("get_cart", PHONE)
+            workers.call_all("get_customer_history", PHONE)
+
+            workers.call(0, "update_inventory", "paracetamol", 150, 999, "fever/pain")
+            assert workers.call(1, "add_to_cart", PHONE, "coartem", 2)
+            workers.call(2, "log_conversation", PHONE, "hello from worker 2", False)
+            workers.call(2, "conversation_log.flush")
+
+            converge(workers, lambda w: price(workers, w, "paracetamol"), 999)
+            converge(workers, lambda w: [(i['drug_name'], i['quantity'], i['price'])
+                                         for i in workers.call(w, "get_cart", PHONE)], [("coartem", 2, 2000)])
+            converge(workers, lambda w: workers.call(w, "get_customer_history", PHONE)['conversations'][0]['message'],
+                     "hello from worker 2")
+
+            # Racing checkouts from every process for more than is in stock
+            workers.call(0, "update_inventory", "vitamin c", 5, 300, "supplement")
+            phones = [f"23490000000{i}" for i in range(WORKERS)]
+            for worker, phone in enumerate(phones):
+                converge(workers, lambda w: price(workers, w, "vitamin c"), 300)
+                assert workers.call(worker, "add_to_cart", phone, "vitamin c", 2)
+            for pipe, phone in zip(workers.pipes, phones):
+                pipe.send(("checkout", (phone,)))
+            orders = [pipe.recv() for pipe in workers.pipes]
+            sold = sum(item['quantity'] for order in orders if not order['short'] for item in order['items'])
+            assert sold == 4
+
+            stock = lambda w: {r['drug_name']: r['quantity'] for r in workers.call(w, "get_inventory")}["vitamin c"]
+            converge(workers, stock, 1)
+        finally:
+            workers.stop()
+
+
+def test_missed_journal_rows_drop_the_caches():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pharmacy.db")
+        reader, writer = Database(path), Database(path)
+        reader.initialize()
+        reader.sync.start()
+        reader.sync.stop()  # poll by hand from here
+        writer.get_inventory()
+
+        assert reader.get_cart(PHONE) == []
+        writer.add_to_cart(PHONE, "coartem", 1)
+        conn = writer.get_connection()
+        conn.execute("DELETE FROM cache_journal")
+        conn.commit()
+        writer.release_connection(conn)
+        writer.add_to_cart(PHONE, "ibuprofen", 1)
+
+        reader.sync.poll()
+        assert [item['drug_name'] for item in reader.get_cart(PHONE)] == ["coartem", "ibuprofen"]
+        reader.close()
+        writer.close()
+
+
+def test_remote_catalogue_edits_reach_derived_indexes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pharmacy.db")
+        reader, writer = Database(path), Database(path)
+        reader.initialize()
+        reader.sync.start()
+        reader.sync.stop()  # poll by hand from here
+        assert reader.search_inventory("analgesc") == []
+        catalogue = reader.get_inventory_snapshot().catalogue
+        assert catalogue.built  # on the caller's (worker pool) thread, not lazily in chat
+        local_catalogue = writer.get_inventory_snapshot().catalogue
+
+        # Stock and price changes keep the catalogue index, locally and remotely
+        writer.update_inventory("paracetamol", 140, 550, "fever/pain", "For fever and pain relief", 3, "3 times daily")
+        assert writer.get_inventory_snapshot().catalogue is local_catalogue
+        assert writer.get_inventory_snapshot().get("paracetamol")['price'] == 550
+        reader.sync.poll()
+        assert reader.get_inventory_snapshot().catalogue is catalogue
+        assert reader.get_inventory_snapshot().get("paracetamol")['price'] == 550
+
+        writer.update_inventory("paracetamol", 140, 550, "analgesic", "For fever and pain relief", 3, "3 times daily")
+        reader.sync.poll()
+        assert writer.get_inventory_snapshot().catalogue is not local_catalogue
+        assert reader.get_inventory_snapshot().catalogue is not catalogue
+        assert reader.get_inventory_snapshot().catalogue.built
+        assert [row['drug_name'] for row in reader.search_inventory("analgesc")] == ["paracetamol"]
+        assert [row['drug_name'] for row in writer.search_inventory("analgesc")] == ["paracetamol"]
+        reader.close()
+        writer.close()
@@ -119,22 +119,39 @@ function scheduleAutomatedTasks() {
     cron.schedule('0 9,19 * * *', async () => {
         console.log('💊 Running medication reminder checks...');
         
+        let sent = 0;
+        let cursor = null;
+        
         try {
-            const response = await axios.get(`${API_URL}/medication-reminders`);
-            const reminders = response.data.reminders;
-            
-            for (const reminder of reminders) {
-                const chatId = reminder.phone_number + '@c.us';
-                await client.sendMessage(chatId, reminder.message);
-                console.log(`✅ ${reminder.reminder_type} reminder sent to ${reminder.phone_number}`);
+            // Page through due reminders; each one is acknowledged right after
+            // delivery, so a crash mid-run loses none and repeats at most one
+            do {
+                const params = { limit: 50 };
+                if (cursor) params.cursor = cursor;
+                const response = await axios.get(`${API_URL}/medication-reminders`, { params });
                 
-                // Add delay to avoid rate limiting
-                await new Promise(resolve => setTimeout(resolve, 2000));
-            }
+                for (const reminder of response.data.reminders) {
+                    try {
+                        const chatId = reminder.phone_number + '@c.us';
+                        await client.sendMessage(chatId, reminder.message);
+                        await axios.post(`${API_URL}/medication-reminders/ack`, { ack_ids: [reminder.ack_id] });
+                        sent++;
+                        console.log(`✅ ${reminder.reminder_type} reminder sent to ${reminder.phone_number}`);
+                    } catch (error) {
+                        // Left unacknowledged, so the next run retries it
+                        console.error(`❌ Reminder to ${reminder.phone_number} failed:`, error.message);
+                    }
+                    
+                    // Add delay to avoid rate limiting
+                    await new Promise(resolve => setTimeout(resolve, 2000));
+                }
+                
+                cursor = response.data.next_cursor;
+            } while (cursor);
             
-            console.log(`✅ Sent ${reminders.length} medication reminders`);
+            console.log(`✅ Sent ${sent} medication reminders`);
         } catch (error) {
-            console.error('❌ Error sending medication reminders:', error.message);
+            console.error(`❌ Error sending medication reminders (${sent} sent):`, error.message);
         }
     });
     